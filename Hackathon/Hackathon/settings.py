@@ -43,6 +43,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware',
+    'novathon.profiling.ProfilingMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -59,6 +60,152 @@ import os
 MEDIA_URL = '/media/'  # URL prefix for serving media files
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')  # Physical directory to store files
 
+# Memory-mapped full-precision case embeddings used for exact re-ranking
+CASE_FILES_VECTOR_STORE = os.path.join(BASE_DIR, 'vector_store', 'case_files')
+
+# case_files is partitioned by year. None keeps every year loaded; a list such
+# as [2023, 2024] keeps only those resident. Other years are loaded on demand
+# when a search filters on them, and unfiltered searches skip them until then.
+# At most CASE_FILES_ON_DEMAND_PARTITIONS such years stay loaded; the least
+# recently searched one is released when another is loaded.
+CASE_FILES_PRELOAD_YEARS = None
+CASE_FILES_ON_DEMAND_PARTITIONS = 4
+
+# Cases whose embeddings reach this cosine similarity in the precomputed
+# neighbour graph (manage.py build_knn_graph) are flagged as near-duplicates
+CASE_FILES_NEAR_DUPLICATE_SIMILARITY = 0.98
+
+# Query/document embedding backend: 'ollama' (HTTP), 'onnx' (in-process CPU,
+# needs onnxruntime + tokenizers and an ONNX export of the model) or 'fake'
+# (deterministic vectors for tests). All produce mxbai-embed-large vectors.
+# The ollama backend talks to LLM['HOST'] unless EMBEDDER has its own HOST.
+EMBEDDER = {
+    'BACKEND': 'ollama',
+    'MODEL': 'mxbai-embed-large',
+    'ONNX_MODEL_PATH': os.path.join(BASE_DIR, 'models', 'mxbai-embed-large', 'model.onnx'),
+    'TOKENIZER_PATH': os.path.join(BASE_DIR, 'models', 'mxbai-embed-large', 'tokenizer.json'),
+    'BATCH_SIZE': 32,
+    'MAX_LENGTH': 512,
+}
+
+# Source for the in-memory IPC section index used to answer "IPC 420" style queries
+IPC_SECTIONS_CSV = os.path.join(BASE_DIR, 'novathon', 'data', 'ipc_sections.csv')
+
+# Chat models served by Ollama. MODELS maps each task to a model; setting
+# CHAT_MODEL routes every task to that single model so only one stays
+# resident. PINNED models are sent keep_alive=-1 and never unload; others use
+# KEEP_ALIVE (per model) or DEFAULT_KEEP_ALIVE. A load_duration above
+# RELOAD_THRESHOLD_SECONDS counts as a reload in /llm/metrics/.
+# CONCURRENCY bounds simultaneous Ollama calls from one process. Ollama reuses
+# a shared system-prompt prefix per parallel slot, so keep OLLAMA_NUM_PARALLEL
+# small on CPU hosts for better prefix reuse. With USAGE_LEDGER every call is
+# appended to the LLMUsage table; manage.py llm_usage summarizes it.
+LLM = {
+    'HOST': 'http://localhost:11434',
+    'MODELS': {
+        'legal_analysis': 'llama3.2:latest',
+        'summarize': 'llama2-uncensored:7b',
+    },
+    'CHAT_MODEL': None,
+    'PINNED': ['llama3.2:latest'],
+    'KEEP_ALIVE': {
+        'mxbai-embed-large': '30m',
+        'llama2-uncensored:7b': '10m',
+    },
+    'DEFAULT_KEEP_ALIVE': '5m',
+    'RELOAD_THRESHOLD_SECONDS': 0.5,
+    'CONCURRENCY': 2,
+    'USAGE_LEDGER': True,
+    # Token budget for the retrieved context packed into each task's prompt
+    'CONTEXT_TOKENS': {
+        'legal_analysis': 1024,
+        'summarize': 3072,
+    },
+    # Map-reduce summaries (/summarize/): chunk size for the map step, how
+    # long chunk summaries stay cached and how many cases one request may name
+    'SUMMARY': {
+        'CHUNK_TOKENS': 1536,
+        'CACHE_TTL_SECONDS': 60 * 60 * 24 * 7,
+        'MAX_CASES': 20,
+    },
+}
+
+# Background jobs (/jobs/, get-file-text ?async=1) run by manage.py run_jobs.
+# Workers poll the CaseJob table; a job running longer than
+# STALE_AFTER_SECONDS is assumed orphaned and queued again, up to MAX_ATTEMPTS.
+# A job that fails is retried after RETRY_BACKOFF_SECONDS, doubling with each
+# attempt, so an Ollama outage does not use up its attempts at once.
+# /jobs/<id>/stream/ holds a WSGI worker while it is open, so each stream is a
+# short long-poll of at most STREAM_SECONDS; the client (EventSource does this
+# by itself) reconnects after STREAM_RETRY_MS until the job is done or failed.
+JOBS = {
+    'POLL_INTERVAL_SECONDS': 1.0,
+    'STALE_AFTER_SECONDS': 60 * 30,
+    'MAX_ATTEMPTS': 3,
+    'RETRY_BACKOFF_SECONDS': 30,
+    'STREAM_SECONDS': 15,
+    'STREAM_RETRY_MS': 1000,
+}
+
+# Time budget for /legal-analysis/. Embedding and search get at most their
+# caps; the LLM gets whatever is left of TOTAL_SECONDS (clients may ask for
+# less with "timeout"). When the LLM overruns, the retrieved sections come
+# back with "partial": true; with DEFER_RESULTS the analysis keeps running
+# and can be fetched from the returned analysis_url for RESULT_TTL_SECONDS.
+# Deferred results live in the default cache, so use a shared CACHES backend
+# when running several worker processes. The LLM stage runs on its own pool
+# of LLM_WORKERS threads, deferred analyses included; when all are busy the
+# request gets the sections without an analysis instead of queueing. A
+# deferred Ollama call is abandoned DEFERRED_LLM_SECONDS after the deadline.
+LEGAL_ANALYSIS_DEADLINE = {
+    'TOTAL_SECONDS': 30,
+    'EMBED_SECONDS': 3,
+    'SEARCH_SECONDS': 3,
+    'DEFER_RESULTS': True,
+    'RESULT_TTL_SECONDS': 600,
+    'DEFERRED_LLM_SECONDS': 120,
+    'WORKERS': 16,
+    'LLM_WORKERS': 4,
+}
+
+# Case PDF downloads: None streams from Django, 'x-sendfile' (Apache/lighttpd)
+# or 'x-accel-redirect' (nginx) hands the transfer to the web server.
+# For nginx, map CASE_FILE_ACCEL_REDIRECT_PREFIX to BASE_DIR as an internal location.
+CASE_FILE_SENDFILE = None
+CASE_FILE_ACCEL_REDIRECT_PREFIX = '/protected/'
+CASE_FILE_CACHE_MAX_AGE = 60 * 60 * 24 * 30
+
+# Start-up warm-up for server processes (WSGI workers, runserver). When
+# enabled, each process connects to Milvus, loads the collections and indexes
+# and has Ollama load the embedding and chat models while Hackathon/wsgi.py
+# loads the application, before it accepts requests. Each step can be switched
+# off on its own; management commands, tests and shells never warm up. With
+# gunicorn, do not combine it with --preload (the Milvus connection would be
+# opened before forking).
+STARTUP_WARMUP = {
+    'ENABLED': os.environ.get('NOVATHON_WARMUP') == '1',
+    'MILVUS': True,
+    'INDEXES': True,
+    'EMBEDDER': True,
+    'CHAT_MODELS': True,
+}
+
+# Per-request profiling. When enabled, requests under PATHS that send
+# "X-Profile-Token: <TOKEN>" or fall within SAMPLE_RATE are profiled and a
+# file named after the request id (X-Request-ID or generated) is written to
+# DIR. PROFILER is 'cprofile' (pstats .prof) or 'pyinstrument' (speedscope
+# flame graph; pip install pyinstrument). Profilers only see the request
+# thread, so profiled requests run their stages inline rather than on the
+# stage pools, without stage time limits. Disabled, the middleware is unloaded.
+REQUEST_PROFILING = {
+    'ENABLED': False,
+    'TOKEN': os.environ.get('REQUEST_PROFILING_TOKEN'),
+    'SAMPLE_RATE': 0.0,
+    'PATHS': ['/legal-analysis/', '/get-file-text/'],
+    'PROFILER': 'cprofile',
+    'DIR': os.path.join(BASE_DIR, 'profiles'),
+}
+
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
@@ -17,11 +17,22 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import path
 from novathon import views
-from novathon.views import get_file_text,legal_analysis_view
+from novathon.views import get_file_text,export_case_files_view,legal_analysis_view,legal_analysis_result_view,download_case_file,facets_view,facet_typeahead_view,similar_cases_view,llm_metrics_view,summarize_case_files_view,submit_job_view,job_status_view,job_stream_view
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('search_case_files/', views.search_case_files_view, name='search_case_files'),
+    path('search_case_files/export/', export_case_files_view, name='export_case_files'),
     path('get-file-text/<str:case_id>/', get_file_text, name='get_file_text'),
+    path('jobs/', submit_job_view, name='submit_job'),
+    path('jobs/<int:job_id>/', job_status_view, name='job_status'),
+    path('jobs/<int:job_id>/stream/', job_stream_view, name='job_stream'),
+    path('summarize/', summarize_case_files_view, name='summarize_case_files'),
+    path('case-files/<str:case_id>/download/', download_case_file, name='download_case_file'),
+    path('similar-cases/<str:case_id>/', similar_cases_view, name='similar_cases'),
+    path('facets/', facets_view, name='facets'),
+    path('facets/typeahead/', facet_typeahead_view, name='facet_typeahead'),
     path('legal-analysis/', legal_analysis_view, name='legal_analysis'),
+    path('legal-analysis/results/<str:result_id>/', legal_analysis_result_view, name='legal_analysis_result'),
+    path('llm/metrics/', llm_metrics_view, name='llm_metrics'),
 ]
 
@@ -14,3 +14,10 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'Hackathon.settings')
 
 application = get_wsgi_application()
+
+# Opt-in: load Milvus collections and models before serving traffic. Only
+# server processes load this module, so other commands never warm up.
+from novathon.warmup import should_warm_up, warm_up_process  # noqa: E402
+
+if should_warm_up():
+    warm_up_process()
@@ -1,59 +1,101 @@
-import pandas as pd
-import ollama
-from pymilvus import Collection, connections
+import json
+import threading
 import numpy as np
+from django.conf import settings
+from . import milvus_connection
+from .embedders import fit_dimension, get_embedder
+from .field_stats import open_field_stats, stats_path
+from .name_index import get_name_index
+from .index_planner import DEFAULT_PROFILE, get_index_params, plan_search_params
+from .partitions import OnDemandPartitions, load_partitions, year_partition, year_partitions
+from .vector_store import DEFAULT_CASE_FILES_STORE, open_vector_store
 
-class OllamaEmbedding:
-    def __init__(self, model_name='mxbai-embed-large'):
-        self.model_name = model_name
-    
-    def encode(self, texts):
-        """
-        Generate embeddings using Ollama
-        
-        :param texts: Single text or list of texts
-        :return: Embedding vector(s)
-        """
-        # Handle single text input
-        if isinstance(texts, str):
-            texts = [texts]
-        
-        embeddings = []
-        for text in texts:
-            response = ollama.embeddings(
-                model=self.model_name,
-                prompt=text
-            )
-            # Ensure the embedding is exactly 768 dimensions
-            embedding = response['embedding']
-            if len(embedding) != 768:
-                # Pad or truncate to exactly 768 dimensions
-                embedding = np.array(embedding)
-                if len(embedding) > 768:
-                    embedding = embedding[:768]
-                else:
-                    embedding = np.pad(embedding, (0, 768 - len(embedding)), mode='constant')
-            
-            embeddings.append(embedding.tolist())
-        
-        # Return single embedding if only one text, otherwise return list
-        return embeddings[0] if len(embeddings) == 1 else embeddings
+# How many ANN candidates to fetch per requested result in two-stage search
+RERANK_OVERSAMPLE = 10
+
+# Filters matching at most this many rows are ranked exactly in NumPy instead
+# of going through the ANN index, which can miss rows under a narrow filter
+EXACT_SCAN_MAX_ROWS = 2000
+
+# Prefix/fuzzy name matches beyond this many ids are filtered by the matching
+# stored names instead of a `case_file_id in [...]` list; a query matching
+# more than MAX_NAME_FILTER_VALUES distinct names is rejected as too broad
+MAX_ID_FILTER = 2000
+MAX_NAME_FILTER_VALUES = 200
+
+# Rows per Milvus query_iterator round trip when exporting
+EXPORT_BATCH_SIZE = 1000
+
+# Year partitions outside preload_years kept loaded after an on-demand search
+DEFAULT_ON_DEMAND_PARTITIONS = 4
+
+OUTPUT_FIELDS = ['case_file_id', 'year', 'criminal_name', 'police_station', 'crime_type', 'case_details']
+
+
+class NameFilterTooBroad(ValueError):
+    """A prefix or fuzzy name filter matches more distinct names than one expression can list"""
 
 class CaseFileSearcher:
-    def __init__(self, embedding_model='mxbai-embed-large'):
-        # Initialize Ollama embedding model
-        self.embedding_model = OllamaEmbedding(embedding_model)
+    def __init__(self, embedder=None, vector_store_path=DEFAULT_CASE_FILES_STORE, preload_years=None,
+                 max_on_demand=DEFAULT_ON_DEMAND_PARTITIONS):
+        # Embedding backend (Ollama, in-process ONNX or fake) from settings.EMBEDDER
+        self.embedding_model = embedder or get_embedder()
+        
+        # Full-precision embeddings for exact re-ranking (shared via mmap)
+        self.vector_store_path = vector_store_path
+        
+        # Years kept loaded; None loads every partition
+        self.preload_years = preload_years
+        self.max_on_demand = max_on_demand
         
         # Milvus connection setup
         self.connect_to_milvus()
         
     def connect_to_milvus(self):
         # Connect to Milvus
-        connections.connect(host='localhost', port='19530')
+        milvus_connection.connect()
+        
+        # Load existing collection (or just the configured years)
+        self.collection = milvus_connection.open_collection('case_files')
+        self.loaded_partitions = load_partitions(self.collection, self.preload_years)
+        self.partitions = year_partitions(self.collection)
+        self.on_demand = OnDemandPartitions(self.collection, self.max_on_demand)
         
-        # Load existing collection
-        self.collection = Collection('case_files')
-        self.collection.load()
+        # Cache the index description so each search can derive matching params
+        self.index_params = get_index_params(self.collection, 'case_embedding')
+    
+    def resolve_partitions(self, year):
+        """
+        Partitions a year filter should search (see acquire_partitions for loading them)
+        
+        :param year: Year filter (may be None)
+        :return: List of partition names, [] if no partition holds that year,
+                 or None to search the whole collection
+        """
+        if not year:
+            return None
+        
+        name = year_partition(year)
+        if name not in self.partitions:
+            # Pick up years ingested since we connected
+            self.partitions = year_partitions(self.collection)
+        if name not in self.partitions:
+            # A collection built before partitioning falls back to the year expression
+            return [] if self.partitions else None
+        return [name]
+    
+    def acquire_partitions(self, partition_names):
+        """
+        Load the released partitions a search reads for the time of that search
+        
+        :param partition_names: Partitions from build_filter (None: whole collection)
+        :return: Names to hand back with self.on_demand.release() once the search is done
+        """
+        if self.loaded_partitions is None or not partition_names:
+            return []
+        names = [name for name in partition_names if name not in self.loaded_partitions]
+        self.on_demand.acquire(names)
+        return names
     
     def search_case_files(self, 
                           query=None, 
@@ -61,7 +103,10 @@ class CaseFileSearcher:
                           criminal_name=None, 
                           police_station=None, 
                           crime_type=None, 
-                          top_k=5):
+                          top_k=5,
+                          profile=DEFAULT_PROFILE,
+                          rerank=False,
+                          name_match='exact'):
         """
         Search case files with multiple filtering options
         
@@ -71,61 +116,296 @@ class CaseFileSearcher:
         :param police_station: Police station to filter
         :param crime_type: Type of crime to filter
         :param top_k: Number of top results to return
+        :param profile: 'recall' or 'latency' search profile
+        :param rerank: Over-fetch ANN candidates and re-rank them exactly against the full-precision vectors
+        :param name_match: How criminal_name/police_station match: 'exact', 'prefix' or 'fuzzy'
         :return: Retrieved case files
         """
-        # Prepare search conditions
-        search_params = {
-            'metric_type': 'L2',
-            'params': {'nprobe': 10}
-        }
+        # Two-stage search needs a query and a built vector store
+        vector_store = open_vector_store(self.vector_store_path) if (rerank and query) else None
+        limit = top_k * RERANK_OVERSAMPLE if vector_store is not None else top_k
+        
+        # Prepare search conditions; the first stage of a two-stage search
+        # only has to find candidates, so it uses the cheap profile
+        search_params = plan_search_params(
+            self.index_params,
+            top_k=limit,
+            profile='latency' if vector_store is not None else profile
+        )
+        
+        filters = self.build_filter(year, criminal_name, police_station, crime_type, name_match)
+        if filters is None:
+            return []
+        filter_expr, partition_names, candidate_count = filters
+        
+        leased = self.acquire_partitions(partition_names)
+        try:
+            if query:
+                full_embedding = self.embedding_model.encode(query, dim=None)
+                query_embedding = fit_dimension(full_embedding)
+        
+            # Highly selective filters: fetch the few matching rows and rank them exactly
+            stat_filters = {
+                field: value for field, value in (
+                    ('year', year), ('criminal_name', criminal_name),
+                    ('police_station', police_station), ('crime_type', crime_type)
+                ) if value and not (candidate_count is not None and field in ('criminal_name', 'police_station'))
+            }
+            bound = None
+            if stat_filters:
+                stats = open_field_stats(stats_path(self.vector_store_path))
+                if stats is not None:
+                    bound = stats.estimate(stat_filters)
+            if candidate_count is not None:
+                bound = candidate_count if bound is None else min(bound, candidate_count)
+            if bound is not None and bound <= EXACT_SCAN_MAX_ROWS:
+                exact_results = self.exact_scan(
+                    filter_expr, partition_names, query_embedding if query else None, top_k
+                )
+                if exact_results is not None:
+                    return exact_results
+        
+            # Semantic search with optional embedding
+            if query:
+                results = self.collection.search(
+                    data=[query_embedding],
+                    anns_field='case_embedding',
+                    param=search_params,
+                    limit=limit,
+                    expr=filter_expr,
+                    partition_names=partition_names,
+                    output_fields=OUTPUT_FIELDS
+                )
+            else:
+                # If no query, perform metadata-only search
+                results = self.collection.search(
+                    data=[[0]*768],  # Dummy embedding (match your model's dimension)
+                    anns_field='case_embedding',
+                    param=search_params,
+                    limit=top_k,
+                    expr=filter_expr,
+                    partition_names=partition_names,
+                    output_fields=OUTPUT_FIELDS
+                )
+        
+            hits = list(results[0])
+            if vector_store is not None:
+                hits_by_id = {hit.id: hit for hit in hits}
+                ranked = vector_store.rerank(full_embedding, list(hits_by_id), top_k)
+                # Fall back to ANN order if the store does not cover these rows yet
+                if ranked:
+                    hits = [hits_by_id[case_file_id] for case_file_id, _ in ranked]
+                hits = hits[:top_k]
+        
+            # Process and return case files
+            retrieved_case_files = []
+            for result in hits:
+                case_file = {
+                    'case_file_id': result.entity.get('case_file_id'),
+                    'year': result.entity.get('year'),
+                    'criminal_name': result.entity.get('criminal_name'),
+                    'police_station': result.entity.get('police_station'),
+                    'crime_type': result.entity.get('crime_type'),
+                    'case_details': result.entity.get('case_details')
+                }
+                retrieved_case_files.append(case_file)
+        
+            return retrieved_case_files
+        finally:
+            self.on_demand.release(leased)
+    
+    def build_filter(self, year=None, criminal_name=None, police_station=None, crime_type=None, name_match='exact'):
+        """
+        Turn search filters into a Milvus expression and the partitions to read
+        
+        :return: (filter_expr, partition_names, candidate_count), or None when
+                 nothing can match; candidate_count bounds the rows a prefix or
+                 fuzzy name filter can match (None for exact matching)
+        :raises NameFilterTooBroad: A name filter matches too many distinct names
+        """
+        # A year filter becomes partition pruning when the collection is partitioned
+        partition_names = self.resolve_partitions(year)
+        if partition_names == []:
+            return None
         
-        # Build filter conditions
         bool_expr = []
-        if year:
+        if year and partition_names is None:
             bool_expr.append(f"year == {year}")
-        if criminal_name:
-            bool_expr.append(f"criminal_name == '{criminal_name}'")
-        if police_station:
-            bool_expr.append(f"police_station == '{police_station}'")
+        
+        # Prefix/fuzzy name filters resolve to candidate ids through the trigram index
+        candidate_count = None
+        if name_match != 'exact' and (criminal_name or police_station):
+            name_index = get_name_index(self.collection, stats_path(self.vector_store_path))
+            candidate_ids = None
+            for field, value in (('criminal_name', criminal_name), ('police_station', police_station)):
+                if not value:
+                    continue
+                ids = name_index.candidates(field, value, name_match)
+                if len(ids) <= MAX_ID_FILTER:
+                    candidate_ids = ids if candidate_ids is None else candidate_ids & ids
+                else:
+                    # Too many ids for one expression; the few distinct names they share are not
+                    names = name_index.matching_values(field, value, name_match)
+                    if len(names) > MAX_NAME_FILTER_VALUES:
+                        raise NameFilterTooBroad(f'{field} filter "{value}" matches too many names; be more specific')
+                    bool_expr.append(f"{field} in [{', '.join(json.dumps(name) for name in sorted(names))}]")
+                candidate_count = len(ids) if candidate_count is None else min(candidate_count, len(ids))
+            
+            if candidate_ids is not None:
+                if not candidate_ids:
+                    return None
+                candidate_count = min(candidate_count, len(candidate_ids))
+                bool_expr.append(f"case_file_id in [{', '.join(str(i) for i in sorted(candidate_ids))}]")
+            if not candidate_count:
+                return None
+        else:
+            if criminal_name:
+                bool_expr.append(f"criminal_name == '{criminal_name}'")
+            if police_station:
+                bool_expr.append(f"police_station == '{police_station}'")
         if crime_type:
             bool_expr.append(f"crime_type == '{crime_type}'")
         
         filter_expr = " and ".join(bool_expr) if bool_expr else None
+        return filter_expr, partition_names, candidate_count
+    
+    def iter_case_files(self,
+                        year=None,
+                        criminal_name=None,
+                        police_station=None,
+                        crime_type=None,
+                        name_match='exact',
+                        limit=None,
+                        batch_size=EXPORT_BATCH_SIZE):
+        """
+        Stream every case file matching the filters, one batch at a time
         
-        # Semantic search with optional embedding
-        if query:
-            query_embedding = self.embedding_model.encode(query)
-            
-            results = self.collection.search(
-                data=[query_embedding],
-                anns_field='case_embedding',
-                param=search_params,
-                limit=top_k,
-                expr=filter_expr,
-                output_fields=['case_file_id', 'year', 'criminal_name', 'police_station', 'crime_type', 'case_details']
-            )
-        else:
-            # If no query, perform metadata-only search
-            results = self.collection.search(
-                data=[[0]*768],  # Dummy embedding (match your model's dimension)
-                anns_field='case_embedding',
-                param=search_params,
-                limit=top_k,
-                expr=filter_expr,
-                output_fields=['case_file_id', 'year', 'criminal_name', 'police_station', 'crime_type', 'case_details']
+        Rows come from a Milvus query iterator (without vectors), so only one
+        batch is held in memory whatever the number of matches. Filters are
+        resolved, the iterator opened and the first batch fetched before this
+        returns, so setup errors raise here rather than mid-stream.
+        
+        :param limit: Stop after this many rows (None: all of them)
+        :param batch_size: Rows fetched per round trip
+        :return: CaseFileBatches; close() it (iterated or not) to free the
+                 iterator and partition leases
+        :raises NameFilterTooBroad: A name filter is too broad (see build_filter)
+        """
+        filters = self.build_filter(year, criminal_name, police_station, crime_type, name_match)
+        if filters is None:
+            return CaseFileBatches(self.on_demand)
+        filter_expr, partition_names, _ = filters
+        
+        leased = self.acquire_partitions(partition_names)
+        try:
+            iterator = self.collection.query_iterator(
+                batch_size=batch_size,
+                limit=limit if limit is not None else -1,
+                expr=filter_expr or '',
+                partition_names=partition_names,
+                output_fields=OUTPUT_FIELDS
             )
+            try:
+                first = iterator.next()
+            except Exception:
+                iterator.close()
+                raise
+        except Exception:
+            self.on_demand.release(leased)
+            raise
+        return CaseFileBatches(self.on_demand, iterator, first, limit, leased)
+    
+    def exact_scan(self, filter_expr, partition_names, query_embedding, top_k):
+        """
+        Fetch every row matching a selective filter and rank it exactly
         
-        # Process and return case files
-        retrieved_case_files = []
-        for result in results[0]:
-            case_file = {
-                'case_file_id': result.entity.get('case_file_id'),
-                'year': result.entity.get('year'),
-                'criminal_name': result.entity.get('criminal_name'),
-                'police_station': result.entity.get('police_station'),
-                'crime_type': result.entity.get('crime_type'),
-                'case_details': result.entity.get('case_details')
-            }
-            retrieved_case_files.append(case_file)
+        :param filter_expr: Milvus boolean expression (may be None when only partitions filter)
+        :param partition_names: Partitions to scan, or None for all
+        :param query_embedding: 768-dim query vector, or None to order by case_file_id
+        :param top_k: Number of results to return
+        :return: Case files, or None if more rows matched than the stats allowed for
+        """
+        rows = self.collection.query(
+            expr=filter_expr or '',
+            partition_names=partition_names,
+            output_fields=OUTPUT_FIELDS + ['case_embedding'],
+            limit=EXACT_SCAN_MAX_ROWS + 1
+        )
+        if len(rows) > EXACT_SCAN_MAX_ROWS:
+            # Stats are stale; let the ANN path handle it
+            return None
         
-        return retrieved_case_files
\ No newline at end of file
+        if query_embedding is not None and rows:
+            vectors = np.asarray([row['case_embedding'] for row in rows], dtype=np.float32)
+            diff = vectors - np.asarray(query_embedding, dtype=np.float32)
+            distances = np.einsum('ij,ij->i', diff, diff)
+            order = np.argsort(distances, kind='stable')[:top_k]
+        else:
+            order = np.argsort([row['case_file_id'] for row in rows], kind='stable')[:top_k]
+        
+        return [{field: rows[i].get(field) for field in OUTPUT_FIELDS} for i in order]
+
+
+class CaseFileBatches:
+    """
+    Batches of an export, holding its query iterator and partition leases
+    
+    close() frees both, whether or not iteration ever started. A generator's
+    finally block would not run if the consumer (a streaming response whose
+    client went away) closed it before the first batch.
+    """
+    
+    def __init__(self, on_demand, iterator=None, first=(), limit=None, leased=()):
+        self.on_demand = on_demand
+        self.iterator = iterator
+        self.first = first
+        self.limit = limit
+        self.leased = leased
+        self.closed = False
+        self.lock = threading.Lock()
+    
+    def __iter__(self):
+        try:
+            rows, remaining = self.first, self.limit
+            while rows and not self.closed and (remaining is None or remaining > 0):
+                if remaining is not None:
+                    rows = rows[:remaining]
+                    remaining -= len(rows)
+                yield [{field: row.get(field) for field in OUTPUT_FIELDS} for row in rows]
+                rows = self.iterator.next()
+        finally:
+            self.close()
+    
+    def close(self):
+        with self.lock:
+            if self.closed:
+                return
+            self.closed = True
+        try:
+            if self.iterator is not None:
+                self.iterator.close()
+        finally:
+            self.on_demand.release(self.leased)
+
+
+_searcher = None
+_searcher_lock = threading.Lock()
+
+
+def get_case_searcher():
+    """
+    Process-wide searcher for settings.CASE_FILES_VECTOR_STORE
+    
+    Connected and loaded on first use, like get_ipc_index(), so requests do
+    not pay for load_partitions; a failed connection is retried on the next call.
+    """
+    global _searcher
+    if _searcher is None:
+        with _searcher_lock:
+            if _searcher is None:
+                _searcher = CaseFileSearcher(
+                    vector_store_path=settings.CASE_FILES_VECTOR_STORE,
+                    preload_years=settings.CASE_FILES_PRELOAD_YEARS,
+                    max_on_demand=settings.CASE_FILES_ON_DEMAND_PARTITIONS
+                )
+    return _searcher
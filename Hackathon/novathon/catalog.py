@@ -0,0 +1,120 @@
+import csv
+import os
+import re
+
+# Folders are relative to the project root (settings.BASE_DIR, where manage.py
+# lives), matching the file_path values already stored in RenamedCaseFile.
+# Resolve them with project_path() rather than against the working directory.
+CASE_FILES_DIR = 'novathon/case_file'  # Folder with original PDFs
+RENAMED_DIR = 'novathon/renamed_case_files'  # Folder for renamed PDFs
+CASE_FILES_CSV = 'novathon/data/case_files_data.csv'
+
+# Columns a case needs before its PDF can be named and indexed
+REQUIRED_FIELDS = ('case_file_id', 'year', 'criminal_name', 'police_station', 'crime_type')
+
+SOURCE_FILE_PATTERN = re.compile(r'^case_file_(\d+)\.pdf$')
+RENAMED_FILE_PATTERN = re.compile(r'^(\d+)_.+\.pdf$')
+
+
+def renamed_file_name(case_id, year, criminal_name, crime_type):
+    """Build the catalog file name, e.g. 827_2020_Virginia_Burton_Fraud.pdf"""
+    return f"{case_id}_{year}_{criminal_name.replace(' ', '_')}_{crime_type}.pdf"
+
+
+def project_path(path):
+    """Absolute path; relative paths are taken from the project root, not the working directory"""
+    from django.conf import settings
+
+    return os.path.normpath(os.path.join(settings.BASE_DIR, path))
+
+
+def catalog_path(folder, file_name):
+    """
+    Path as stored in RenamedCaseFile.file_path (always forward slashes)
+
+    Files under the project root are stored relative to it, whatever
+    directory the command was run from.
+    """
+    from django.conf import settings
+
+    path = os.path.join(folder, file_name)
+    if os.path.isabs(path):
+        relative = os.path.relpath(path, settings.BASE_DIR)
+        if not relative.startswith(os.pardir):
+            path = relative
+    return path.replace(os.sep, '/')
+
+
+def load_case_metadata(csv_path=CASE_FILES_CSV):
+    """
+    Read the case CSV into a dict keyed by case id
+
+    Short rows get '' for their missing columns; a row still lacking one of
+    REQUIRED_FIELDS is skipped rather than failing the whole file.
+
+    :param csv_path: Path to case_files_data.csv
+    :return: ({case_id: row} with stripped string values, [(case_id, reason)] for skipped rows)
+    """
+    metadata = {}
+    skipped = []
+    with open(csv_path, newline='', encoding='utf-8') as f:
+        reader = csv.DictReader(f)
+        for row in reader:
+            # csv gives None for the columns of a short row; extra values go under the None key
+            row = {key: (value or '').strip() for key, value in row.items() if key is not None}
+            missing = [field for field in REQUIRED_FIELDS if not row.get(field)]
+            if missing:
+                skipped.append((
+                    row.get('case_file_id') or '?',
+                    f"line {reader.line_num} of the case CSV has no {', '.join(missing)}"
+                ))
+                continue
+            metadata[row['case_file_id']] = row
+    return metadata, skipped
+
+
+def scan_directory(folder, pattern):
+    """
+    List PDFs in a folder whose names match a pattern, in a single pass
+
+    :param folder: Directory to scan
+    :param pattern: Compiled regex whose first group is the case id
+    :return: {case_id: file_name}; ids that appear twice keep the first name seen
+    """
+    found = {}
+    if not os.path.isdir(folder):
+        return found
+
+    with os.scandir(folder) as entries:
+        for entry in entries:
+            if not entry.is_file():
+                continue
+            match = pattern.match(entry.name)
+            if match:
+                found.setdefault(match.group(1), entry.name)
+    return found
+
+
+def plan_renames(source_files, renamed_files, metadata):
+    """
+    Work out which original PDFs should be moved into the renamed folder
+
+    :param source_files: {case_id: file_name} from the original folder
+    :param renamed_files: {case_id: file_name} already in the renamed folder
+    :param metadata: {case_id: row} from the case CSV
+    :return: (moves, skipped) where moves is a list of (case_id, old_name, new_name)
+             and skipped a list of (case_id, reason) for files that cannot be named
+    """
+    moves = []
+    skipped = []
+    for case_id, old_name in sorted(source_files.items()):
+        if case_id in renamed_files:
+            # Already catalogued; the renamed copy wins
+            continue
+        row = metadata.get(case_id)
+        if row is None:
+            skipped.append((case_id, 'no row in the case CSV'))
+            continue
+        new_name = renamed_file_name(case_id, row['year'], row['criminal_name'], row['crime_type'])
+        moves.append((case_id, old_name, new_name))
+    return moves, skipped
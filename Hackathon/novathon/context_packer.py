@@ -0,0 +1,189 @@
+"""
+Fit retrieved documents or extracted text into a fixed token budget
+
+Token counts are estimated from character length, which is close enough for
+English legal text with llama-family tokenizers and needs no tokenizer.
+"""
+import re
+from collections import Counter, namedtuple
+
+CHARS_PER_TOKEN = 4
+
+# A truncated passage shorter than this is dropped rather than included
+MIN_PASSAGE_TOKENS = 32
+
+# Long paragraphs are split into passages of at most this size
+MAX_PASSAGE_TOKENS = 256
+
+WORD = re.compile(r'[a-z0-9]+')
+SENTENCE_END = re.compile(r'(?<=[.!?])\s+')
+PARAGRAPH_BREAK = re.compile(r'\n\s*\n')
+
+STOPWORDS = frozenset(
+    'a an and are as at be by for from has have he her his in is it its of on or she that the their '
+    'they this to was were which with'.split()
+)
+
+PackedContext = namedtuple('PackedContext', ['text', 'tokens', 'included', 'dropped'])
+
+
+def estimate_tokens(text):
+    return -(-len(text) // CHARS_PER_TOKEN)
+
+
+def truncate_to_tokens(text, max_tokens):
+    """Cut text to about max_tokens, at a sentence or word boundary when possible"""
+    limit = max_tokens * CHARS_PER_TOKEN
+    if len(text) <= limit:
+        return text
+    cut = text[:limit]
+    boundary = max(cut.rfind('. '), cut.rfind('\n'))
+    if boundary < limit // 2:
+        boundary = cut.rfind(' ')
+    return (cut[:boundary + 1] if boundary > 0 else cut).rstrip() + ' ...'
+
+
+def _fingerprint(text):
+    return ' '.join(WORD.findall(text.lower()))
+
+
+def format_section(document):
+    """Prompt text for one retrieved IPC section"""
+    lines = [f"Section: IPC {document.get('section')}"]
+    for label, key in (('Offense', 'offense'), ('Punishment', 'punishment'), ('Description', 'description')):
+        if document.get(key):
+            lines.append(f'{label}: {document[key]}')
+    return '\n'.join(lines)
+
+
+def pack_documents(documents, budget, formatter=format_section, score_key='score', higher_is_better=False):
+    """
+    Pack the best scoring documents into the budget
+
+    Documents are taken in score order (Milvus L2 distances: lower is better),
+    duplicates of an already included text are skipped, and the first
+    document that does not fit whole is truncated into the remaining space.
+
+    :param documents: Retrieved documents (dicts)
+    :param budget: Token budget for the packed context
+    :param formatter: Turns a document into prompt text
+    :param score_key: Key holding each document's score
+    :param higher_is_better: Score direction
+    :return: PackedContext
+    """
+    ranked = sorted(
+        documents,
+        key=lambda document: document.get(score_key) or 0,
+        reverse=higher_is_better
+    )
+
+    parts, seen, used, dropped = [], set(), 0, 0
+    for document in ranked:
+        text = formatter(document)
+        fingerprint = _fingerprint(text)
+        if fingerprint in seen:
+            dropped += 1
+            continue
+
+        remaining = budget - used
+        cost = estimate_tokens(text) + 1
+        if cost > remaining:
+            if remaining >= MIN_PASSAGE_TOKENS:
+                text = truncate_to_tokens(text, remaining - 2)
+                cost = estimate_tokens(text) + 1
+            else:
+                dropped += 1
+                continue
+
+        seen.add(fingerprint)
+        parts.append(text)
+        used += cost
+
+    return PackedContext('\n\n'.join(parts), used, len(parts), dropped)
+
+
+def split_passages(text, max_tokens=MAX_PASSAGE_TOKENS):
+    """Paragraphs of the text, with long paragraphs split into groups of sentences"""
+    passages = []
+    for paragraph in PARAGRAPH_BREAK.split(text):
+        paragraph = ' '.join(paragraph.split())
+        if not paragraph:
+            continue
+        if estimate_tokens(paragraph) <= max_tokens:
+            passages.append(paragraph)
+            continue
+
+        current = ''
+        for sentence in SENTENCE_END.split(paragraph):
+            candidate = f'{current} {sentence}'.strip()
+            if current and estimate_tokens(candidate) > max_tokens:
+                passages.append(current)
+                candidate = sentence
+            # A single sentence longer than a passage is cut
+            current = truncate_to_tokens(candidate, max_tokens) if estimate_tokens(candidate) > max_tokens else candidate
+        if current:
+            passages.append(current)
+    return passages
+
+
+def _content_words(text):
+    return [word for word in WORD.findall(text.lower()) if word not in STOPWORDS and len(word) > 2]
+
+
+def score_passages(passages, query=None):
+    """
+    Relevance of each passage
+
+    With a query, passages are scored by how many query terms they contain;
+    otherwise by how many of the document's most frequent terms they contain,
+    which favours the passages describing the main facts.
+    """
+    words = [_content_words(passage) for passage in passages]
+    if query:
+        weights = Counter(_content_words(query))
+    else:
+        weights = Counter(word for passage_words in words for word in set(passage_words))
+    return [
+        sum(weights[word] for word in set(passage_words)) / (1 + len(passage_words)) ** 0.5
+        for passage_words in words
+    ]
+
+
+def pack_text(text, budget, query=None):
+    """
+    Fit long extracted text into the budget
+
+    Repeated passages (page headers and footers in PDFs) are dropped, then
+    the highest scoring passages are kept and put back in document order.
+
+    :param text: Extracted text
+    :param budget: Token budget
+    :param query: Optional query the passages should be relevant to
+    :return: PackedContext
+    """
+    passages, seen, dropped = [], set(), 0
+    for passage in split_passages(text or ''):
+        fingerprint = _fingerprint(passage)
+        if fingerprint and fingerprint not in seen:
+            seen.add(fingerprint)
+            passages.append(passage)
+        else:
+            dropped += 1
+
+    costs = [estimate_tokens(passage) + 1 for passage in passages]
+    if sum(costs) <= budget:
+        return PackedContext('\n\n'.join(passages), sum(costs), len(passages), dropped)
+
+    scores = score_passages(passages, query)
+    chosen, used = [], 0
+    for position in sorted(range(len(passages)), key=lambda i: (-scores[i], i)):
+        if used + costs[position] <= budget:
+            chosen.append(position)
+            used += costs[position]
+    chosen.sort()
+    return PackedContext(
+        '\n\n'.join(passages[position] for position in chosen),
+        used,
+        len(chosen),
+        dropped + len(passages) - len(chosen)
+    )
@@ -0,0 +1,194 @@
+import contextvars
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+from django.conf import settings
+from django.core.cache import cache
+
+DEFERRED_KEY = 'novathon:deferred:{}'
+
+# Set while a profiled request runs (see run_stages_inline)
+_inline_stages = contextvars.ContextVar('novathon_inline_stages', default=False)
+
+
+@contextmanager
+def run_stages_inline():
+    """
+    Run stages on the calling thread instead of the stage pools
+
+    Used by the profiling middleware: profilers only see the thread they were
+    started on, so stages handed to a pool would show up as a wait on a future.
+    Inline stages are not cut off at their budget; timings are still recorded.
+    """
+    token = _inline_stages.set(True)
+    try:
+        yield
+    finally:
+        _inline_stages.reset(token)
+
+
+def stages_inline():
+    """Whether the current request runs its stages on its own thread"""
+    return _inline_stages.get()
+
+
+class DeadlineExceeded(TimeoutError):
+    """A request stage ran past its share of the request's time budget"""
+
+    def __init__(self, stage, future=None):
+        super().__init__(f'{stage} stage exceeded its time budget')
+        self.stage = stage
+        self.future = future
+
+
+class Deadline:
+    """
+    Absolute time limit for one request, shared out across its stages
+
+    Each stage gets min(its own cap, whatever is left), so a slow early stage
+    eats into later ones instead of extending the request.
+    """
+
+    def __init__(self, seconds):
+        self.seconds = seconds
+        self.started = time.monotonic()
+        self.expires_at = self.started + seconds
+        self.timings = {}
+
+    def remaining(self):
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def budget(self, cap=None):
+        remaining = self.remaining()
+        return remaining if cap is None else min(cap, remaining)
+
+    def run(self, stage, fn, *args, cap=None, cancel=True, executor=None, **kwargs):
+        """
+        Run fn on the stage pool and wait at most the stage budget for it
+
+        :param stage: Stage name, used in timings and errors
+        :param cap: Upper bound for this stage in seconds (None: the rest of the deadline)
+        :param cancel: Drop the work on overrun if it has not started yet
+        :param executor: Pool to run on (defaults to get_executor())
+        :return: fn's return value
+        :raises DeadlineExceeded: The stage overran; the exception carries the future
+        :raises ExecutorFull: A BoundedExecutor had no free worker
+        """
+        if stages_inline():
+            start = time.monotonic()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self.timings[stage] = round((time.monotonic() - start) * 1000, 1)
+        future = (executor or get_executor()).submit(fn, *args, **kwargs)
+        return self.wait(stage, future, cap=cap, cancel=cancel)
+
+    def wait(self, stage, future, cap=None, cancel=True):
+        start = time.monotonic()
+        try:
+            return future.result(timeout=self.budget(cap))
+        except FutureTimeoutError:
+            # A running call cannot be interrupted, only work still queued is dropped
+            if cancel:
+                future.cancel()
+            raise DeadlineExceeded(stage, future)
+        finally:
+            self.timings[stage] = round((time.monotonic() - start) * 1000, 1)
+
+
+class ExecutorFull(RuntimeError):
+    """Every worker of a BoundedExecutor is busy"""
+
+
+class BoundedExecutor:
+    """
+    Thread pool that refuses work once every worker is busy instead of queueing it
+
+    Used for the LLM stage: analyses that outlive their request keep running,
+    and queueing more behind them would only produce more overruns.
+    """
+
+    def __init__(self, max_workers, thread_name_prefix=''):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=thread_name_prefix)
+        self.slots = threading.BoundedSemaphore(max_workers)
+
+    def submit(self, fn, *args, **kwargs):
+        if not self.slots.acquire(blocking=False):
+            raise ExecutorFull('No free worker')
+        try:
+            future = self.executor.submit(fn, *args, **kwargs)
+        except Exception:
+            self.slots.release()
+            raise
+        # Also runs for futures cancelled before they started
+        future.add_done_callback(lambda _: self.slots.release())
+        return future
+
+
+_executor = None
+_llm_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    """Process-wide pool the embed and search stages run on, sized by LEGAL_ANALYSIS_DEADLINE['WORKERS']"""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=settings.LEGAL_ANALYSIS_DEADLINE['WORKERS'],
+                    thread_name_prefix='novathon-stage'
+                )
+    return _executor
+
+
+def get_llm_executor():
+    """
+    Process-wide pool for the LLM stage, sized by LEGAL_ANALYSIS_DEADLINE['LLM_WORKERS']
+
+    Kept apart from the embed/search pool so slow or deferred analyses cannot
+    starve the cheap stages of other requests.
+    """
+    global _llm_executor
+    if _llm_executor is None:
+        with _executor_lock:
+            if _llm_executor is None:
+                _llm_executor = BoundedExecutor(
+                    settings.LEGAL_ANALYSIS_DEADLINE['LLM_WORKERS'],
+                    thread_name_prefix='novathon-llm'
+                )
+    return _llm_executor
+
+
+def defer_result(future, ttl):
+    """
+    Keep an overrunning stage's result so the client can fetch it later
+
+    :param future: Future of the stage that ran out of time
+    :param ttl: Seconds to keep the result in the cache
+    :return: Id to pass to get_deferred_result
+    """
+    result_id = uuid.uuid4().hex
+    key = DEFERRED_KEY.format(result_id)
+    cache.set(key, {'status': 'pending'}, ttl)
+
+    def store(done):
+        if done.cancelled():
+            cache.set(key, {'status': 'failed', 'error': 'Cancelled before it started'}, ttl)
+        elif done.exception() is not None:
+            cache.set(key, {'status': 'failed', 'error': str(done.exception())}, ttl)
+        else:
+            cache.set(key, {'status': 'done', 'result': done.result()}, ttl)
+
+    # Runs immediately if the future has already finished
+    future.add_done_callback(store)
+    return result_id
+
+
+def get_deferred_result(result_id):
+    """{'status': 'pending' | 'done' | 'failed', ...}, or None for unknown or expired ids"""
+    return cache.get(DEFERRED_KEY.format(result_id))
@@ -0,0 +1,160 @@
+import mimetypes
+import os
+import re
+
+from django.conf import settings
+from django.http import FileResponse, HttpResponse, HttpResponseNotModified, StreamingHttpResponse
+from django.utils.http import content_disposition_header, http_date, parse_etags, parse_http_date_safe, quote_etag
+
+RANGE_PATTERN = re.compile(r'^bytes=(\d*)-(\d*)$')
+STREAM_BLOCK_SIZE = 64 * 1024
+
+
+def resolve_file_path(file_path):
+    """Stored paths are relative to the project root; make them absolute"""
+    if os.path.isabs(file_path):
+        return file_path
+    return os.path.join(settings.BASE_DIR, file_path)
+
+
+def file_etag(stat_result):
+    """Strong validator derived from size and modification time (no need to hash the file)"""
+    return quote_etag(f'{stat_result.st_size:x}-{stat_result.st_mtime_ns:x}')
+
+
+def is_not_modified(request, etag, mtime):
+    """Evaluate If-None-Match / If-Modified-Since the way RFC 9110 orders them"""
+    if_none_match = request.headers.get('If-None-Match')
+    if if_none_match:
+        etags = parse_etags(if_none_match)
+        return '*' in etags or etag in etags
+
+    if_modified_since = parse_http_date_safe(request.headers.get('If-Modified-Since', ''))
+    return if_modified_since is not None and int(mtime) <= if_modified_since
+
+
+def parse_range(header, size):
+    """
+    Parse a single-range Range header
+
+    :param header: Raw Range header value
+    :param size: File size in bytes
+    :return: (start, end) inclusive, None to serve the whole file, or False if unsatisfiable
+    """
+    match = RANGE_PATTERN.match(header.strip())
+    if not match:
+        # Multiple ranges or another unit: ignoring Range is always allowed
+        return None
+
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        # Suffix range: the last N bytes
+        length = int(last)
+        if length == 0:
+            return False
+        return max(size - length, 0), size - 1
+
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        return False
+    return start, end
+
+
+def _range_applies(request, etag, mtime):
+    """If-Range makes the Range conditional on the client's copy still being current"""
+    if_range = request.headers.get('If-Range')
+    if not if_range:
+        return True
+    if if_range.startswith('"') or if_range.startswith('W/'):
+        return if_range == etag
+    if_range_date = parse_http_date_safe(if_range)
+    return if_range_date is not None and int(mtime) <= if_range_date
+
+
+def _iter_file_range(path, start, length):
+    with open(path, 'rb') as f:
+        f.seek(start)
+        remaining = length
+        while remaining > 0:
+            chunk = f.read(min(STREAM_BLOCK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+def _sendfile_response(path):
+    """Hand the transfer to the front-end web server; it handles Range itself"""
+    mode = getattr(settings, 'CASE_FILE_SENDFILE', None)
+    if mode == 'x-sendfile':
+        response = HttpResponse()
+        response['X-Sendfile'] = path
+        return response
+    if mode == 'x-accel-redirect':
+        relative = os.path.relpath(path, settings.BASE_DIR).replace(os.sep, '/')
+        response = HttpResponse()
+        response['X-Accel-Redirect'] = settings.CASE_FILE_ACCEL_REDIRECT_PREFIX.rstrip('/') + '/' + relative
+        return response
+    return None
+
+
+def serve_file(request, path):
+    """
+    Serve a file with validators, Range support and long-lived caching
+
+    :param request: The incoming GET/HEAD request
+    :param path: Absolute path of the file on disk
+    :return: An HttpResponse (200, 206, 304 or 416)
+    """
+    stat_result = os.stat(path)
+    size = stat_result.st_size
+    etag = file_etag(stat_result)
+
+    headers = {
+        'ETag': etag,
+        'Last-Modified': http_date(stat_result.st_mtime),
+        'Cache-Control': f"private, max-age={getattr(settings, 'CASE_FILE_CACHE_MAX_AGE', 86400)}",
+        'Accept-Ranges': 'bytes',
+    }
+
+    if is_not_modified(request, etag, stat_result.st_mtime):
+        response = HttpResponseNotModified()
+        for key, value in headers.items():
+            response[key] = value
+        return response
+
+    content_type = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+    file_name = os.path.basename(path)
+
+    response = _sendfile_response(path)
+    if response is None:
+        byte_range = None
+        if 'Range' in request.headers and _range_applies(request, etag, stat_result.st_mtime):
+            byte_range = parse_range(request.headers['Range'], size)
+
+        if byte_range is False:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+            return response
+
+        if byte_range is None:
+            # Whole file: FileResponse lets the WSGI server use os.sendfile
+            response = FileResponse(open(path, 'rb'), content_type=content_type)
+        else:
+            start, end = byte_range
+            length = end - start + 1
+            response = StreamingHttpResponse(
+                _iter_file_range(path, start, length), status=206, content_type=content_type
+            )
+            response['Content-Range'] = f'bytes {start}-{end}/{size}'
+            response['Content-Length'] = str(length)
+    else:
+        response['Content-Type'] = content_type
+
+    response['Content-Disposition'] = content_disposition_header(False, file_name)
+    for key, value in headers.items():
+        response[key] = value
+    return response
@@ -0,0 +1,209 @@
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+
+import numpy as np
+
+DEFAULT_MODEL = 'mxbai-embed-large'
+
+
+def fit_dimension(embedding, dim=768):
+    """Pad or truncate an embedding to exactly dim dimensions"""
+    if len(embedding) == dim:
+        return list(embedding)
+    embedding = np.array(embedding)
+    if len(embedding) > dim:
+        embedding = embedding[:dim]
+    else:
+        embedding = np.pad(embedding, (0, dim - len(embedding)), mode='constant')
+    return embedding.tolist()
+
+
+class Embedder(ABC):
+    """
+    Base class for embedding backends
+
+    Subclasses implement embed(), which takes a list of texts and returns a
+    float32 matrix of the model's full-width vectors. encode() is the
+    interface the rest of the app uses.
+    """
+
+    model_name = DEFAULT_MODEL
+
+    @abstractmethod
+    def embed(self, texts):
+        """
+        :param texts: List of texts
+        :return: float32 matrix, one full-width vector per text
+        """
+
+    def encode(self, texts, dim=768):
+        """
+        Generate embeddings
+
+        :param texts: Single text or list of texts
+        :param dim: Pad or truncate to this many dimensions (None keeps the model's full vector)
+        :return: Embedding vector for a single text, list of vectors for a list
+        """
+        single = isinstance(texts, str)
+        vectors = self.embed([texts] if single else list(texts))
+        embeddings = [fit_dimension(vector, dim) if dim is not None else vector.tolist() for vector in vectors]
+        return embeddings[0] if single else embeddings
+
+
+class OllamaEmbedder(Embedder):
+    """Embeddings from an Ollama server over HTTP"""
+
+    def __init__(self, model_name=DEFAULT_MODEL, keep_alive=None, host=None):
+        """
+        :param host: Ollama server URL (defaults to settings.LLM['HOST'])
+        """
+        self.model_name = model_name
+        self.keep_alive = keep_alive
+        self.host = host
+        self._client = None
+
+    @property
+    def client(self):
+        if self._client is None:
+            import ollama
+            from .llm import llm_settings
+
+            self._client = ollama.Client(host=self.host or llm_settings()['HOST'])
+        return self._client
+
+    def embed(self, texts):
+        # The legacy /api/embeddings endpoint is used on purpose: /api/embed
+        # L2-normalizes, which would not match the vectors already in Milvus
+        return np.array([
+            self.client.embeddings(model=self.model_name, prompt=text, keep_alive=self.keep_alive)['embedding']
+            for text in texts
+        ], dtype=np.float32)
+
+
+class OnnxEmbedder(Embedder):
+    """
+    In-process CPU embeddings from an ONNX export of the model
+
+    Produces the same vectors as Ollama's mxbai-embed-large (CLS pooling,
+    no normalization) when given the same weights, so existing collections
+    remain searchable. Inputs are batched and inference uses every core.
+    """
+
+    def __init__(self, model_path, tokenizer_path, model_name=DEFAULT_MODEL, batch_size=32,
+                 max_length=512, pooling='cls', normalize=False, threads=None):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = threads or os.cpu_count() or 1
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(model_path, options, providers=['CPUExecutionProvider'])
+        self.input_names = {model_input.name for model_input in self.session.get_inputs()}
+
+        self.tokenizer = Tokenizer.from_file(tokenizer_path)
+        self.tokenizer.enable_truncation(max_length=max_length)
+        self.tokenizer.enable_padding()
+
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.pooling = pooling
+        self.normalize = normalize
+
+    def embed(self, texts):
+        batches = []
+        for start in range(0, len(texts), self.batch_size):
+            encodings = self.tokenizer.encode_batch(texts[start:start + self.batch_size])
+            input_ids = np.array([encoding.ids for encoding in encodings], dtype=np.int64)
+            attention_mask = np.array([encoding.attention_mask for encoding in encodings], dtype=np.int64)
+
+            feeds = {'input_ids': input_ids, 'attention_mask': attention_mask}
+            if 'token_type_ids' in self.input_names:
+                feeds['token_type_ids'] = np.zeros_like(input_ids)
+            hidden = self.session.run(None, feeds)[0]
+
+            if self.pooling == 'cls':
+                pooled = hidden[:, 0]
+            else:
+                mask = attention_mask[:, :, None].astype(np.float32)
+                pooled = (hidden * mask).sum(axis=1) / np.maximum(mask.sum(axis=1), 1e-9)
+
+            if self.normalize:
+                pooled = pooled / np.linalg.norm(pooled, axis=1, keepdims=True)
+            batches.append(pooled.astype(np.float32))
+
+        return np.vstack(batches) if batches else np.empty((0, 0), dtype=np.float32)
+
+
+class FakeEmbedder(Embedder):
+    """Deterministic hash-based vectors for tests and load runs; optional simulated latency"""
+
+    def __init__(self, model_name=DEFAULT_MODEL, dim=1024, latency_ms=0):
+        self.model_name = model_name
+        self.dim = dim
+        self.latency_ms = latency_ms
+
+    def embed(self, texts):
+        from .fakes import fake_embedding
+
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000)
+        return np.array([fake_embedding(text, self.dim) for text in texts], dtype=np.float32)
+
+
+def build_embedder(config):
+    """
+    Create an embedder from an EMBEDDER-style settings dict
+
+    :param config: Dict with BACKEND ('ollama', 'onnx' or 'fake'), MODEL and backend options
+                   (HOST for ollama, defaulting to LLM['HOST'])
+    """
+    backend = config.get('BACKEND', 'ollama')
+    model_name = config.get('MODEL', DEFAULT_MODEL)
+
+    if backend == 'ollama':
+        from .llm import keep_alive_for
+        return OllamaEmbedder(model_name, keep_alive=keep_alive_for(model_name), host=config.get('HOST'))
+    if backend == 'onnx':
+        return OnnxEmbedder(
+            config['ONNX_MODEL_PATH'],
+            config['TOKENIZER_PATH'],
+            model_name=model_name,
+            batch_size=config.get('BATCH_SIZE', 32),
+            max_length=config.get('MAX_LENGTH', 512),
+            pooling=config.get('POOLING', 'cls'),
+            normalize=config.get('NORMALIZE', False),
+            threads=config.get('THREADS'),
+        )
+    if backend == 'fake':
+        return FakeEmbedder(model_name)
+    raise ValueError(f"Unknown embedder backend '{backend}'")
+
+
+def configured_model():
+    """Model name of settings.EMBEDDER, without building the embedder"""
+    from django.conf import settings
+    return getattr(settings, 'EMBEDDER', {}).get('MODEL', DEFAULT_MODEL)
+
+
+_embedder = None
+_embedder_lock = threading.Lock()
+
+
+def get_embedder():
+    """Process-wide embedder configured by settings.EMBEDDER"""
+    global _embedder
+    if _embedder is None:
+        from django.conf import settings
+        with _embedder_lock:
+            if _embedder is None:
+                _embedder = build_embedder(getattr(settings, 'EMBEDDER', {}))
+    return _embedder
+
+
+def set_embedder(embedder):
+    """Replace the process-wide embedder (used by the load-test fakes)"""
+    global _embedder
+    with _embedder_lock:
+        _embedder = embedder
@@ -0,0 +1,116 @@
+import bisect
+import threading
+from collections import Counter, OrderedDict
+
+from .field_stats import FACET_FIELDS, open_field_stats, stats_path
+
+# Fields offered for typeahead completion
+TYPEAHEAD_FIELDS = ('year', 'police_station', 'crime_type', 'criminal_name')
+
+# Distinct filter selections memoized per stats version
+MAX_CACHED_SELECTIONS = 1024
+
+
+class FacetIndex:
+    """
+    Facet and typeahead lookups over one version of the field stats
+
+    Facet counts are disjunctive: each facet is counted with every selected
+    filter applied except its own, so the UI can show how many cases the
+    other values of a dropdown would return. Results are memoized per
+    selection; a new stats version gets a new FacetIndex and a fresh memo.
+    """
+
+    def __init__(self, stats):
+        self.stats = stats
+        self.version = stats.version
+        self.memo = OrderedDict()
+        self.lock = threading.Lock()
+
+        # Lowercased, sorted values per field for bisect prefix completion
+        self.completions = {}
+        for field in TYPEAHEAD_FIELDS:
+            entries = sorted((value.lower(), value) for value in stats.counts[field])
+            self.completions[field] = ([key for key, _ in entries], [value for _, value in entries])
+
+    def facet_counts(self, selected):
+        """
+        Counts per facet value given the selected filters
+
+        :param selected: {field: value} for the active facet filters
+        :return: (total rows matching every filter, {field: {value: count}})
+        """
+        selected = {field: str(value) for field, value in selected.items() if field in FACET_FIELDS}
+        key = tuple(sorted(selected.items()))
+
+        with self.lock:
+            if key in self.memo:
+                self.memo.move_to_end(key)
+                return self.memo[key]
+
+        total = 0
+        facets = {field: Counter() for field in FACET_FIELDS}
+        for combo, count in self.stats.combos.items():
+            mismatched = [
+                position for position, field in enumerate(FACET_FIELDS)
+                if field in selected and combo[position] != selected[field]
+            ]
+            if not mismatched:
+                total += count
+                for position, field in enumerate(FACET_FIELDS):
+                    facets[field][combo[position]] += count
+            elif len(mismatched) == 1:
+                # Only the facet's own filter excludes this combination
+                position = mismatched[0]
+                facets[FACET_FIELDS[position]][combo[position]] += count
+
+        result = (total, {
+            field: dict(sorted(counter.items(), key=lambda item: (-item[1], item[0])))
+            for field, counter in facets.items()
+        })
+
+        with self.lock:
+            self.memo[key] = result
+            if len(self.memo) > MAX_CACHED_SELECTIONS:
+                self.memo.popitem(last=False)
+        return result
+
+    def typeahead(self, field, prefix, limit=10):
+        """
+        Values of a field starting with the prefix (case-insensitive), most frequent first
+
+        :param field: One of TYPEAHEAD_FIELDS
+        :param prefix: Text typed so far
+        :param limit: Maximum number of suggestions
+        :return: List of {'value', 'count'} dicts
+        """
+        keys, values = self.completions[field]
+        prefix = prefix.strip().lower()
+        start = bisect.bisect_left(keys, prefix)
+        end = bisect.bisect_right(keys, prefix + '￿')
+
+        counts = self.stats.counts[field]
+        matches = sorted(values[start:end], key=lambda value: (-counts[value], value))
+        return [{'value': value, 'count': counts[value]} for value in matches[:limit]]
+
+
+_facet_index = None
+_facet_lock = threading.Lock()
+
+
+def get_facet_index(store_dir):
+    """
+    Process-wide facet index for the stats written next to the vector store
+
+    :param store_dir: Vector store directory holding field_stats.json
+    :return: FacetIndex, or None before the first ingestion
+    """
+    global _facet_index
+    stats = open_field_stats(stats_path(store_dir))
+    if stats is None:
+        return None
+
+    with _facet_lock:
+        if _facet_index is None or _facet_index.stats is not stats:
+            _facet_index = FacetIndex(stats)
+        return _facet_index
@@ -0,0 +1,261 @@
+"""
+Stand-in Ollama and Milvus backends for load testing
+
+The fakes keep the same call shapes the app uses (Embedder.encode,
+Collection.search/query, ollama.Client.generate) and sleep
+for a configurable latency, so the web tier can be measured without GPUs,
+model weights or a Milvus server.
+"""
+import hashlib
+import json
+import re
+import threading
+import time
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+
+CONDITION = re.compile(r"(\w+)\s*==\s*(?:'([^']*)'|(-?\d+))")
+ID_LIST = re.compile(r"(\w+)\s+in\s+\[([^\]]*)\]")
+
+
+def fake_embedding(text, dim=1024):
+    """Deterministic unit vector derived from the text, so equal texts embed equally"""
+    seed = int.from_bytes(hashlib.sha256(text.encode('utf-8')).digest()[:8], 'little')
+    vector = np.random.default_rng(seed).standard_normal(dim).astype(np.float32)
+    return (vector / np.linalg.norm(vector)).tolist()
+
+
+def _sleep(ms):
+    if ms > 0:
+        time.sleep(ms / 1000)
+
+
+class FakeLatency:
+    """Per-backend latencies in milliseconds"""
+
+    def __init__(self, embed_ms=20, search_ms=5, llm_ms=1500):
+        self.embed_ms = embed_ms
+        self.search_ms = search_ms
+        self.llm_ms = llm_ms
+
+
+class _Hit:
+    def __init__(self, row_id, distance, entity):
+        self.id = row_id
+        self.distance = distance
+        self.entity = entity
+
+
+class FakeCollection:
+    """
+    In-memory collection doing exact L2 search over a DataFrame
+
+    Given FakeConnections, searches and queries fail once the collection's
+    alias has been disconnected, as they do with pymilvus.
+    """
+
+    def __init__(self, name, frame, vector_field, primary_field, latency, partition_field=None,
+                 connections=None, using='default'):
+        self.name = name
+        self.frame = frame.reset_index(drop=True)
+        self.vector_field = vector_field
+        self.primary_field = primary_field
+        self.latency = latency
+        self.partition_field = partition_field
+        self.connections = connections
+        self.using = using
+        self.vectors = np.asarray(self.frame[vector_field].tolist(), dtype=np.float32)
+        self.indexes = []
+        # Partitions loaded one by one; None once the whole collection is loaded
+        self.loaded_partitions = set()
+
+    @property
+    def num_entities(self):
+        return len(self.frame)
+
+    @property
+    def partitions(self):
+        if not self.partition_field:
+            return []
+        return [SimpleNamespace(name=f'year_{year}') for year in sorted(self.frame[self.partition_field].unique())]
+
+    def load(self, partition_names=None, **kwargs):
+        if partition_names is None:
+            self.loaded_partitions = None
+        elif self.loaded_partitions is not None:
+            self.loaded_partitions.update(partition_names)
+
+    def release(self, *args, **kwargs):
+        self.loaded_partitions = set()
+
+    def partition(self, name):
+        def release():
+            if self.loaded_partitions is not None:
+                self.loaded_partitions.discard(name)
+        return SimpleNamespace(name=name, release=release)
+
+    def flush(self, *args, **kwargs):
+        pass
+
+    def _mask(self, expr, partition_names=None):
+        if self.connections is not None:
+            self.connections.require(self.using)
+        mask = np.ones(len(self.frame), dtype=bool)
+        if partition_names and self.loaded_partitions is not None:
+            missing = set(partition_names) - self.loaded_partitions
+            if missing:
+                raise RuntimeError(f'partitions not loaded: {sorted(missing)}')
+        if partition_names and self.partition_field:
+            years = [int(name.split('_', 1)[1]) for name in partition_names if name.startswith('year_')]
+            mask &= self.frame[self.partition_field].isin(years).to_numpy()
+        if expr:
+            for field, text_value, int_value in CONDITION.findall(expr):
+                value = text_value if int_value == '' else int(int_value)
+                mask &= (self.frame[field] == value).to_numpy()
+            for field, values in ID_LIST.findall(expr):
+                # Integer ids or double-quoted strings
+                members = json.loads(f'[{values}]')
+                mask &= self.frame[field].isin(members).to_numpy()
+        return mask
+
+    def _entity(self, position, output_fields):
+        row = self.frame.iloc[position]
+        fields = output_fields or []
+        return {field: (row[field].item() if hasattr(row[field], 'item') else row[field]) for field in fields}
+
+    def search(self, data, anns_field, param, limit, expr=None, partition_names=None, output_fields=None, **kwargs):
+        _sleep(self.latency.search_ms)
+        positions = np.flatnonzero(self._mask(expr, partition_names))
+        results = []
+        for query in data:
+            query = np.asarray(query, dtype=np.float32)[:self.vectors.shape[1]]
+            if len(positions) == 0:
+                results.append([])
+                continue
+            diff = self.vectors[positions, :len(query)] - query
+            distances = np.einsum('ij,ij->i', diff, diff)
+            order = np.argsort(distances, kind='stable')[:limit]
+            results.append([
+                _Hit(
+                    self.frame.iloc[positions[i]][self.primary_field].item(),
+                    float(distances[i]),
+                    self._entity(positions[i], output_fields)
+                )
+                for i in order
+            ])
+        return results
+
+    def query_iterator(self, batch_size=1000, expr=None, output_fields=None, partition_names=None, **kwargs):
+        rows = self.query(expr=expr, output_fields=output_fields, partition_names=partition_names)
+        batches = iter([rows[i:i + batch_size] for i in range(0, len(rows), batch_size)])
+        return SimpleNamespace(next=lambda: next(batches, []), close=lambda: None)
+
+    def query(self, expr=None, output_fields=None, limit=None, partition_names=None, **kwargs):
+        _sleep(self.latency.search_ms)
+        positions = np.flatnonzero(self._mask(expr, partition_names))
+        if limit:
+            positions = positions[:limit]
+        return [self._entity(position, output_fields) for position in positions]
+
+
+class FakeOllamaClient:
+    """Replaces the ollama.Client used for chat models"""
+
+    def __init__(self, latency):
+        self.latency = latency
+        self.loaded = []
+        self.systems = {}
+
+    def generate(self, model, prompt='', system=None, options=None, keep_alive=None, **kwargs):
+        if model not in self.loaded:
+            self.loaded.append(model)
+        if not prompt:
+            return {'response': '', 'load_duration': 0, 'done': True}
+
+        _sleep(self.latency.llm_ms)
+        # Mimic Ollama's prefix reuse: an unchanged system prompt is not evaluated again
+        cached = self.systems.get(model) == system
+        self.systems[model] = system
+        prompt_tokens = (0 if cached else len(system or '') // 4) + len(prompt) // 4
+        return {
+            'response': f'[{model}] fake response to a {len(prompt)}-character prompt',
+            'prompt_eval_count': prompt_tokens,
+            'eval_count': 32,
+            'eval_duration': int(self.latency.llm_ms * 0.8e6),
+            'prompt_eval_duration': prompt_tokens * 1000000,
+            'total_duration': int(self.latency.llm_ms * 1e6),
+            'load_duration': 0,
+            'done': True,
+        }
+
+    def ps(self):
+        return {'models': [{'model': model} for model in self.loaded]}
+
+
+class FakeConnections:
+    """Tracks connected aliases like pymilvus.connections"""
+
+    def __init__(self):
+        self.aliases = set()
+        self.lock = threading.Lock()
+
+    def connect(self, alias='default', *args, **kwargs):
+        with self.lock:
+            self.aliases.add(alias)
+
+    def disconnect(self, alias='default'):
+        with self.lock:
+            self.aliases.discard(alias)
+
+    def require(self, alias):
+        if alias not in self.aliases:
+            raise ConnectionError(f'should create connection first: alias {alias!r} is not connected')
+
+
+def build_fake_collections(case_files_csv, ipc_sections_csv, latency, connections=None):
+    """Embed the shipped CSVs with fake_embedding into in-memory collections"""
+    case_files = pd.read_csv(case_files_csv)
+    case_files['case_embedding'] = (case_files['case_details'] + ' ' + case_files['keywords']).map(
+        lambda text: fake_embedding(text)[:768]
+    )
+
+    ipc = pd.read_csv(ipc_sections_csv).rename(columns=str.lower)
+    ipc['id'] = np.arange(1, len(ipc) + 1)
+    ipc['embedding'] = ipc['description'].map(fake_embedding)
+
+    return {
+        'case_files': FakeCollection('case_files', case_files, 'case_embedding', 'case_file_id', latency,
+                                     partition_field='year', connections=connections),
+        'ipc_sections': FakeCollection('ipc_sections', ipc, 'embedding', 'id', latency, connections=connections),
+    }
+
+
+_install_lock = threading.Lock()
+
+
+def install_fakes(case_files_csv, ipc_sections_csv, latency):
+    """
+    Swap the app's embedder, Milvus and Ollama entry points for the fakes
+
+    Only meant for the load-test server process; there is no uninstall.
+    """
+    from novathon import milvus_connection
+    from novathon.embedders import FakeEmbedder, set_embedder
+    from novathon.llm import set_client
+
+    with _install_lock:
+        fake_connections = FakeConnections()
+        collections = build_fake_collections(case_files_csv, ipc_sections_csv, latency, fake_connections)
+        set_embedder(FakeEmbedder(latency_ms=latency.embed_ms))
+        set_client(FakeOllamaClient(latency))
+
+        def collection_factory(name, *args, **kwargs):
+            return collections[name]
+
+        milvus_connection.connect = fake_connections.connect
+        milvus_connection.disconnect = fake_connections.disconnect
+        milvus_connection.open_collection = collection_factory
+
+    return collections
@@ -0,0 +1,117 @@
+import json
+import os
+import threading
+import time
+from collections import Counter
+
+# Scalar fields the searcher can filter on
+STAT_FIELDS = ('year', 'criminal_name', 'police_station', 'crime_type')
+
+# Fields whose value combinations are counted, for cross-facet counts
+FACET_FIELDS = ('year', 'police_station', 'crime_type')
+
+# Kept next to the full-precision vectors of the same collection
+STATS_FILE = 'field_stats.json'
+
+
+def stats_path(store_dir):
+    return os.path.join(store_dir, STATS_FILE)
+
+
+class FieldStats:
+    """
+    Per-field value counts for case_files, maintained at ingestion
+
+    Used to estimate how many rows a filter matches before choosing between
+    an exact scan and an ANN search, and to serve facet counts. The
+    combination counts over FACET_FIELDS give the count for any mix of
+    facet filters without touching Milvus.
+    """
+
+    def __init__(self, total=0, counts=None, combos=None, version=None):
+        self.total = total
+        self.counts = {field: Counter((counts or {}).get(field, {})) for field in STAT_FIELDS}
+        self.combos = Counter({tuple(combo[:-1]): combo[-1] for combo in (combos or [])})
+        self.version = version
+
+    @classmethod
+    def from_rows(cls, rows):
+        stats = cls()
+        stats.add(rows)
+        return stats
+
+    def add(self, rows):
+        for row in rows:
+            self.total += 1
+            for field in STAT_FIELDS:
+                self.counts[field][str(row[field])] += 1
+            self.combos[tuple(str(row[field]) for field in FACET_FIELDS)] += 1
+
+    def remove(self, rows):
+        for row in rows:
+            self.total -= 1
+            for field in STAT_FIELDS:
+                key = str(row[field])
+                self.counts[field][key] -= 1
+                if self.counts[field][key] <= 0:
+                    del self.counts[field][key]
+            combo = tuple(str(row[field]) for field in FACET_FIELDS)
+            self.combos[combo] -= 1
+            if self.combos[combo] <= 0:
+                del self.combos[combo]
+
+    def count(self, field, value):
+        return self.counts[field].get(str(value), 0)
+
+    def estimate(self, filters):
+        """
+        Upper bound on the rows matching all equality filters
+
+        :param filters: {field: value} for the active filters
+        :return: Row count bound (the collection size when there are no filters)
+        """
+        bound = self.total
+        for field, value in filters.items():
+            bound = min(bound, self.count(field, value))
+        return bound
+
+    def to_dict(self):
+        return {
+            'version': self.version,
+            'total': self.total,
+            'counts': {field: dict(counter) for field, counter in self.counts.items()},
+            'combos': [[*combo, count] for combo, count in self.combos.items()],
+        }
+
+    def save(self, path):
+        """Write atomically so readers never see a partial file; every save gets a new version"""
+        self.version = str(time.time_ns())
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+        return cls(data['total'], data['counts'], data.get('combos'), data.get('version'))
+
+
+_stats = {}
+_stats_lock = threading.Lock()
+
+
+def open_field_stats(path):
+    """Process-wide stats for a path, reloaded when the file changes; None if missing"""
+    if not os.path.exists(path):
+        return None
+
+    mtime = os.path.getmtime(path)
+    with _stats_lock:
+        cached = _stats.get(path)
+        if cached is None or cached[0] != mtime:
+            cached = (mtime, FieldStats.load(path))
+            _stats[path] = cached
+        return cached[1]
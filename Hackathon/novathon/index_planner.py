@@ -0,0 +1,118 @@
+import json
+import math
+
+# Collections below this size are searched exactly; an ANN index only adds
+# build time and recall loss when a brute-force scan takes microseconds.
+FLAT_MAX_ENTITIES = 10_000
+
+# Above this size HNSW graphs get too large to keep in memory comfortably,
+# so we switch to a quantized IVF index.
+HNSW_MAX_ENTITIES = 1_000_000
+
+SEARCH_PROFILES = ('recall', 'latency')
+DEFAULT_PROFILE = 'recall'
+
+
+def plan_index(num_entities, dim, metric_type='L2'):
+    """
+    Choose a Milvus index type and build parameters for a collection
+
+    :param num_entities: Number of vectors in (or about to be inserted into) the collection
+    :param dim: Vector dimension
+    :param metric_type: Distance metric used by the collection
+    :return: Index params suitable for Collection.create_index
+    """
+    num_entities = max(int(num_entities or 0), 0)
+
+    if num_entities <= FLAT_MAX_ENTITIES:
+        return {
+            'metric_type': metric_type,
+            'index_type': 'FLAT',
+            'params': {}
+        }
+
+    if num_entities <= HNSW_MAX_ENTITIES:
+        # Wider vectors need more links per node to keep the graph navigable
+        m = 16 if dim <= 512 else 32
+        return {
+            'metric_type': metric_type,
+            'index_type': 'HNSW',
+            'params': {'M': m, 'efConstruction': 8 * m}
+        }
+
+    # Rule of thumb from the Milvus docs: nlist ~ 4 * sqrt(n)
+    nlist = int(min(max(4 * math.sqrt(num_entities), 1024), 65536))
+    return {
+        'metric_type': metric_type,
+        'index_type': 'IVF_SQ8',
+        'params': {'nlist': nlist}
+    }
+
+
+def plan_search_params(index_params, top_k=5, profile=DEFAULT_PROFILE):
+    """
+    Derive search parameters matching an index built by plan_index
+
+    :param index_params: Index params of the searched field (type, metric and build params)
+    :param top_k: Number of results requested
+    :param profile: 'recall' to favour result quality, 'latency' to favour speed
+    :return: Search params suitable for Collection.search
+    """
+    if profile not in SEARCH_PROFILES:
+        raise ValueError(f"Unknown search profile '{profile}', expected one of {SEARCH_PROFILES}")
+
+    index_params = index_params or {}
+    index_type = index_params.get('index_type', 'FLAT')
+    build_params = index_params.get('params') or {}
+    metric_type = index_params.get('metric_type', 'L2')
+    top_k = max(int(top_k), 1)
+
+    params = {}
+    if index_type == 'HNSW':
+        # ef must be at least top_k; larger ef widens the candidate list
+        if profile == 'recall':
+            params['ef'] = max(top_k, 128, 4 * int(build_params.get('M', 16)))
+        else:
+            params['ef'] = max(top_k, 16)
+    elif index_type.startswith('IVF'):
+        nlist = int(build_params.get('nlist', 1024))
+        if profile == 'recall':
+            params['nprobe'] = max(min(nlist // 8, 256), 1)
+        else:
+            params['nprobe'] = max(min(nlist // 64, 32), 1)
+
+    return {
+        'metric_type': metric_type,
+        'params': params
+    }
+
+
+def get_index_params(collection, field_name):
+    """
+    Look up the index params of a vector field on an existing collection
+
+    :param collection: pymilvus Collection
+    :param field_name: Name of the indexed vector field
+    :return: Index params dict, or None if the field has no index
+    """
+    for index in collection.indexes:
+        if index.field_name == field_name:
+            params = dict(index.params)
+            # Milvus may hand build params back as a JSON string
+            if isinstance(params.get('params'), str):
+                params['params'] = json.loads(params['params'])
+            return params
+    return None
+
+
+def search_params_for(collection, field_name, top_k=5, profile=DEFAULT_PROFILE):
+    """
+    Derive search parameters for whatever index currently backs a field
+
+    :param collection: pymilvus Collection
+    :param field_name: Name of the searched vector field
+    :param top_k: Number of results requested
+    :param profile: 'recall' or 'latency'
+    :return: Search params suitable for Collection.search
+    """
+    return plan_search_params(get_index_params(collection, field_name), top_k=top_k, profile=profile)
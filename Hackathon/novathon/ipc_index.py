@@ -0,0 +1,130 @@
+import bisect
+import csv
+import re
+import threading
+
+# "IPC 140", "ipc_124A", "section 420", "sec. 302", "u/s 376", "s. 34", and
+# lists after one prefix: "sections 302 and 307", "u/s 302/34", "IPC 379, 411"
+SECTION_REFERENCE = re.compile(
+    r'\b(?:ipc|sections?|secs?\.?|u/s|s\.)[\s_\-]*'
+    r'(\d{1,3}[a-z]{0,2}(?:\s*(?:,|/|&|\band\b|\bor\b)\s*(?:ipc[\s_\-]*)?\d{1,3}[a-z]{0,2})*)\b',
+    re.IGNORECASE
+)
+SECTION_NUMBER = re.compile(r'\d{1,3}[a-z]{0,2}', re.IGNORECASE)
+NON_WORD = re.compile(r'[^a-z0-9]+')
+
+
+def normalize_section(section):
+    """'IPC_121A' / '121a' / ' 121A ' -> '121a'"""
+    section = section.strip().lower()
+    if section.startswith('ipc'):
+        section = section[3:]
+    return section.strip(' _-')
+
+
+def normalize_title(title):
+    """Lowercase and collapse punctuation so titles compare loosely"""
+    return NON_WORD.sub(' ', title.lower()).strip()
+
+
+class IPCSectionIndex:
+    """
+    In-memory lookup over ipc_sections.csv by section number and offense title
+
+    Lookups are dict hits or a bisect over the sorted titles, so an explicit
+    reference like "IPC 420" is answered without embedding the query.
+    """
+
+    def __init__(self, csv_path):
+        self.entries = []
+        self.by_section = {}
+        self.by_title = {}
+
+        with open(csv_path, 'r', encoding='utf-8') as file:
+            for row in csv.DictReader(file):
+                entry = {
+                    'section': row['Section'],
+                    'description': row['Description'],
+                    'offense': row['Offense'],
+                    'punishment': row['Punishment'],
+                }
+                section_entries = self.by_section.setdefault(normalize_section(row['Section']), [])
+                # The CSV repeats some rows verbatim; keep one copy
+                if entry in section_entries:
+                    continue
+                self.entries.append(entry)
+                section_entries.append(entry)
+                self.by_title.setdefault(normalize_title(row['Offense']), []).append(entry)
+
+        self.sorted_titles = sorted(self.by_title)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def lookup_section(self, section):
+        """All entries for a section number (a few numbers have more than one row)"""
+        return list(self.by_section.get(normalize_section(section), []))
+
+    def lookup_title(self, title):
+        """Entries whose offense title matches exactly after normalization"""
+        return list(self.by_title.get(normalize_title(title), []))
+
+    def prefix_search(self, prefix, limit=10):
+        """
+        Entries whose normalized offense title starts with a prefix
+
+        :param prefix: Beginning of an offense title
+        :param limit: Maximum number of entries to return
+        :return: List of entries in title order
+        """
+        prefix = normalize_title(prefix)
+        if not prefix:
+            return []
+
+        results = []
+        start = bisect.bisect_left(self.sorted_titles, prefix)
+        for title in self.sorted_titles[start:]:
+            if not title.startswith(prefix) or len(results) >= limit:
+                break
+            results.extend(self.by_title[title])
+        return results[:limit]
+
+    def route(self, query):
+        """
+        Answer a query from the index when it names sections or an exact offense
+
+        :param query: Raw user query
+        :return: List of matching entries, or None if semantic search is needed
+        """
+        matches = []
+        seen = set()
+        for reference in SECTION_REFERENCE.findall(query):
+            for section in SECTION_NUMBER.findall(reference):
+                for entry in self.lookup_section(section):
+                    if id(entry) not in seen:
+                        seen.add(id(entry))
+                        matches.append(entry)
+
+        if not matches:
+            matches = self.lookup_title(query)
+
+        if not matches:
+            return None
+
+        # Same shape as MilvusOllamaHandler.search_similar; an exact hit has distance 0
+        return [dict(entry, id=None, score=0.0) for entry in matches]
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_ipc_index():
+    """Process-wide index, built from settings.IPC_SECTIONS_CSV on first use"""
+    global _index
+    if _index is None:
+        from django.conf import settings
+        with _index_lock:
+            if _index is None:
+                _index = IPCSectionIndex(settings.IPC_SECTIONS_CSV)
+    return _index
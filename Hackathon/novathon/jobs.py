@@ -0,0 +1,191 @@
+"""
+Database-backed queue for slow case file work (text extraction, summaries)
+
+Web requests only insert a CaseJob row; manage.py run_jobs workers claim
+rows with a conditional UPDATE (safe with several workers on any database,
+SQLite included), run them and store the result on the row.
+"""
+import os
+import socket
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .downloads import file_etag, resolve_file_path
+from .llm import group_by_model, model_for, resident_models
+from .models import CaseJob, RenamedCaseFile
+from .pdf_text import extract_text_from_pdf
+from .prompts import PROMPT_VERSION
+from .summarize import summarize_documents
+
+# Queued jobs considered at once when picking the next one to run
+CLAIM_WINDOW = 20
+
+
+def job_settings():
+    return settings.JOBS
+
+
+def source_version(case_id):
+    """
+    Size/mtime validator of a case's file ('' if the case or file is unknown)
+
+    Stored on the job when it runs, so a result built from a file that has
+    since been replaced is recognised as stale.
+    """
+    try:
+        file_path = RenamedCaseFile.objects.get(case_id=case_id).file_path
+        return file_etag(os.stat(resolve_file_path(file_path)))
+    except (RenamedCaseFile.DoesNotExist, OSError):
+        return ''
+
+
+def submit_job(kind, case_id):
+    """
+    Queue a job, or return the existing one for the same case and prompt version
+
+    A failed job, or a done job whose case file changed since it ran, is
+    queued again on resubmission.
+
+    :param kind: CaseJob.KIND_SUMMARIZE or CaseJob.KIND_EXTRACT
+    :param case_id: Case to process
+    :return: (job, created)
+    """
+    summarize = kind == CaseJob.KIND_SUMMARIZE
+    lookup = {
+        'kind': kind,
+        'case_id': str(case_id),
+        'prompt_version': PROMPT_VERSION if summarize else 0,
+    }
+    try:
+        with transaction.atomic():
+            job, created = CaseJob.objects.get_or_create(
+                **lookup, defaults={'model': model_for('summarize') if summarize else ''}
+            )
+    except IntegrityError:
+        # Another request created the same job in between
+        job, created = CaseJob.objects.get(**lookup), False
+
+    requeue = CaseJob.objects.none()
+    if not created and job.status == CaseJob.STATUS_FAILED:
+        requeue = CaseJob.objects.filter(pk=job.pk, status=CaseJob.STATUS_FAILED)
+    elif not created and job.status == CaseJob.STATUS_DONE and job.source_version != source_version(case_id):
+        requeue = CaseJob.objects.filter(pk=job.pk, status=CaseJob.STATUS_DONE, source_version=job.source_version)
+    if requeue.update(status=CaseJob.STATUS_QUEUED, result=None, error='', attempts=0, not_before=None, finished_at=None):
+        job.refresh_from_db()
+    return job, created
+
+
+def worker_name():
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+def claim_next_job(worker, kinds=None, last_model=None):
+    """
+    Atomically take the next queued job
+
+    Among the oldest queued jobs (failed attempts only once their backoff
+    has passed), those needing no model go first, then those for the model
+    the worker just used or a model Ollama already holds, so a worker drains
+    one model's jobs before making Ollama load another.
+
+    :return: Claimed CaseJob, or None when the queue is empty
+    """
+    while True:
+        queued = CaseJob.objects.filter(
+            Q(not_before__isnull=True) | Q(not_before__lte=timezone.now()), status=CaseJob.STATUS_QUEUED
+        )
+        if kinds:
+            queued = queued.filter(kind__in=kinds)
+        candidates = list(queued.order_by('created_at', 'id').values('id', 'model')[:CLAIM_WINDOW])
+        if not candidates:
+            return None
+
+        # Jobs needing no model are cheap and go first, then already loaded models
+        resident = [None] + ([last_model] if last_model else []) + resident_models()
+        groups = group_by_model(candidates, lambda job: job['model'] or None, resident)
+        for _, group in groups:
+            for candidate in group:
+                claimed = CaseJob.objects.filter(id=candidate['id'], status=CaseJob.STATUS_QUEUED).update(
+                    status=CaseJob.STATUS_RUNNING,
+                    worker=worker,
+                    started_at=timezone.now(),
+                    attempts=F('attempts') + 1,
+                )
+                if claimed:
+                    return CaseJob.objects.get(id=candidate['id'])
+        # Every candidate was taken by another worker; look again
+
+
+def requeue_stale_jobs(stale_after):
+    """
+    Return jobs left running by a worker that died to the queue
+
+    :param stale_after: Seconds after which a running job is presumed abandoned
+    :return: (requeued, failed) counts; jobs out of attempts are failed instead
+    """
+    cutoff = timezone.now() - timedelta(seconds=stale_after)
+    stale = CaseJob.objects.filter(status=CaseJob.STATUS_RUNNING, started_at__lt=cutoff)
+    failed = stale.filter(attempts__gte=job_settings()['MAX_ATTEMPTS']).update(
+        status=CaseJob.STATUS_FAILED, error='Worker stopped responding', finished_at=timezone.now()
+    )
+    requeued = stale.update(status=CaseJob.STATUS_QUEUED, worker='')
+    return requeued, failed
+
+
+def run_job(job):
+    """
+    Execute a claimed job and store its outcome
+
+    :return: The updated job
+    """
+    try:
+        renamed_case_file = RenamedCaseFile.objects.get(case_id=job.case_id)
+        # Taken before reading, so a file replaced mid-run makes the result stale
+        job.source_version = source_version(job.case_id)
+        text, error = extract_text_from_pdf(renamed_case_file.file_path)
+        if error:
+            raise ValueError(error)
+
+        if job.kind == CaseJob.KIND_EXTRACT:
+            result = {'file_path': renamed_case_file.file_path, 'text': text}
+        else:
+            result = {'file_path': renamed_case_file.file_path, **summarize_documents({job.case_id: text})}
+
+        job.status, job.result, job.error = CaseJob.STATUS_DONE, result, ''
+    except RenamedCaseFile.DoesNotExist:
+        job.status, job.error = CaseJob.STATUS_FAILED, f'Unknown case id {job.case_id}'
+    except Exception as e:
+        # Transient failures (Ollama down) are retried until MAX_ATTEMPTS, backing off exponentially
+        retry = job.attempts < job_settings()['MAX_ATTEMPTS']
+        job.status = CaseJob.STATUS_QUEUED if retry else CaseJob.STATUS_FAILED
+        job.error = str(e)
+        if retry:
+            delay = job_settings()['RETRY_BACKOFF_SECONDS'] * 2 ** (job.attempts - 1)
+            job.not_before = timezone.now() + timedelta(seconds=delay)
+
+    job.finished_at = timezone.now() if job.status != CaseJob.STATUS_QUEUED else None
+    job.save(update_fields=['status', 'result', 'error', 'finished_at', 'not_before', 'source_version'])
+    return job
+
+
+def job_payload(job):
+    """JSON-ready view of a job for the API"""
+    payload = {
+        'job_id': job.id,
+        'kind': job.kind,
+        'case_id': job.case_id,
+        'status': job.status,
+        'created_at': job.created_at.isoformat(),
+        'finished_at': job.finished_at.isoformat() if job.finished_at else None,
+    }
+    if job.status == CaseJob.STATUS_QUEUED and job.not_before:
+        payload['retry_at'] = job.not_before.isoformat()
+    if job.status == CaseJob.STATUS_DONE:
+        payload['result'] = job.result
+    if job.error:
+        payload['error'] = job.error
+    return payload
@@ -0,0 +1,253 @@
+import json
+import os
+import shutil
+import threading
+import time
+
+import numpy as np
+
+from .vector_store import MmapVectorStore
+
+# Stored in its own directory inside the vector store it was computed from
+GRAPH_DIR = 'knn'
+IDS_FILE = 'ids.npy'
+NEIGHBORS_FILE = 'neighbors.npy'
+DISTANCES_FILE = 'distances.npy'
+SIMILARITIES_FILE = 'similarities.npy'
+POSITIONS_FILE = 'positions.npy'
+META_FILE = 'meta.json'
+
+DEFAULT_K = 10
+DEFAULT_BLOCK_SIZE = 2048
+
+# Cosine similarity at or above which two cases are flagged as near-duplicate FIRs
+NEAR_DUPLICATE_SIMILARITY = 0.98
+
+# A direct id -> row table is written when ids are dense enough for it to stay small
+MAX_POSITIONS_RATIO = 4
+
+
+def graph_path(store_dir):
+    return os.path.join(store_dir, GRAPH_DIR)
+
+
+def _open_output(path, file_name, shape, dtype):
+    return np.lib.format.open_memmap(os.path.join(path, file_name), mode='w+', dtype=dtype, shape=shape)
+
+
+def build_knn_graph(store_dir, k=DEFAULT_K, block_size=DEFAULT_BLOCK_SIZE, progress=None):
+    """
+    Compute every case's k nearest neighbours from the full-precision vectors
+
+    Squared L2 distances (the metric the collection is searched with) are
+    computed block against block as |a|^2 + |b|^2 - 2 a.b, so memory stays
+    at block_size x block_size floats plus the running top-k, regardless of
+    the collection size. Results are streamed into memory-mapped files and
+    the finished graph replaces the previous one atomically.
+
+    :param store_dir: Vector store directory (see MmapVectorStore)
+    :param k: Neighbours kept per case
+    :param block_size: Rows per block in the similarity join
+    :param progress: Optional callable(done_rows, total_rows)
+    :return: Graph metadata dict
+    """
+    store = MmapVectorStore(store_dir)
+    n = len(store)
+    k = min(k, max(n - 1, 0))
+    started = time.time()
+
+    out_dir = graph_path(store_dir)
+    tmp_dir = out_dir + '.tmp'
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+
+    ids = np.asarray(store.ids, dtype=np.int64)
+    np.save(os.path.join(tmp_dir, IDS_FILE), ids)
+    neighbors = _open_output(tmp_dir, NEIGHBORS_FILE, (n, k), np.int64)
+    distances = _open_output(tmp_dir, DISTANCES_FILE, (n, k), np.float32)
+    similarities = _open_output(tmp_dir, SIMILARITIES_FILE, (n, k), np.float32)
+
+    # Squared norms of every row, computed one block at a time
+    norms = np.empty(n, dtype=np.float32)
+    for start in range(0, n, block_size):
+        block = np.asarray(store.vectors[start:start + block_size], dtype=np.float32)
+        norms[start:start + len(block)] = np.einsum('ij,ij->i', block, block)
+
+    for q_start in range(0, n if k else 0, block_size):
+        queries = np.asarray(store.vectors[q_start:q_start + block_size], dtype=np.float32)
+        q_rows = np.arange(q_start, q_start + len(queries))
+        best_dist = np.full((len(queries), k), np.inf, dtype=np.float32)
+        best_rows = np.zeros((len(queries), k), dtype=np.int64)
+
+        for t_start in range(0, n, block_size):
+            targets = np.asarray(store.vectors[t_start:t_start + block_size], dtype=np.float32)
+            block_dist = norms[q_rows, None] + norms[None, t_start:t_start + len(targets)] - 2 * (queries @ targets.T)
+            np.maximum(block_dist, 0, out=block_dist)
+
+            # A case is not its own neighbour
+            t_rows = np.arange(t_start, t_start + len(targets))
+            block_dist[q_rows[:, None] == t_rows[None, :]] = np.inf
+
+            # Merge the block into the running top-k
+            merged_dist = np.concatenate([best_dist, block_dist], axis=1)
+            merged_rows = np.concatenate([best_rows, np.broadcast_to(t_rows, block_dist.shape)], axis=1)
+            keep = np.argpartition(merged_dist, k - 1, axis=1)[:, :k]
+            best_dist = np.take_along_axis(merged_dist, keep, axis=1)
+            best_rows = np.take_along_axis(merged_rows, keep, axis=1)
+
+        order = np.argsort(best_dist, axis=1, kind='stable')
+        best_dist = np.take_along_axis(best_dist, order, axis=1)
+        best_rows = np.take_along_axis(best_rows, order, axis=1)
+
+        # cos = (|a|^2 + |b|^2 - d) / (2 |a| |b|), from the same quantities
+        q_norms = norms[q_rows, None]
+        t_norms = norms[best_rows]
+        denominator = 2 * np.sqrt(q_norms * t_norms)
+        cosine = np.divide(q_norms + t_norms - best_dist, denominator,
+                           out=np.zeros_like(best_dist), where=denominator > 0)
+
+        end = q_start + len(queries)
+        neighbors[q_start:end] = ids[best_rows]
+        distances[q_start:end] = best_dist
+        similarities[q_start:end] = np.clip(cosine, -1, 1)
+        if progress:
+            progress(end, n)
+
+    for array in (neighbors, distances, similarities):
+        array.flush()
+    del neighbors, distances, similarities
+
+    # Direct id -> row table for O(1) lookups when ids are reasonably dense
+    dense = n and ids[0] >= 0 and ids[-1] < MAX_POSITIONS_RATIO * n + 1024
+    if dense:
+        positions = np.full(int(ids[-1]) + 1, -1, dtype=np.int32)
+        positions[ids] = np.arange(n, dtype=np.int32)
+        np.save(os.path.join(tmp_dir, POSITIONS_FILE), positions)
+
+    meta = {
+        'num_rows': n,
+        'k': k,
+        'metric': 'L2',
+        'dim': store.dim if n else None,
+        'vectors_mtime': store.mtime,
+        'built_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'build_seconds': round(time.time() - started, 3),
+    }
+    with open(os.path.join(tmp_dir, META_FILE), 'w', encoding='utf-8') as f:
+        json.dump(meta, f, indent=2)
+
+    # Swap the finished graph in; readers holding the old mmaps keep working
+    old_dir = out_dir + '.old'
+    shutil.rmtree(old_dir, ignore_errors=True)
+    if os.path.exists(out_dir):
+        os.replace(out_dir, old_dir)
+    os.replace(tmp_dir, out_dir)
+    shutil.rmtree(old_dir, ignore_errors=True)
+    return meta
+
+
+def remove_knn_graph(store_dir):
+    """Drop a graph whose vectors no longer match the collection (open_knn_graph then returns None)"""
+    shutil.rmtree(graph_path(store_dir), ignore_errors=True)
+
+
+class KnnGraph:
+    """
+    Read-only neighbour lists keyed by case_file_id, backed by memory-mapped .npy files
+
+    The graph carries its own copy of the ids it was built from, so it stays
+    consistent even if the vector store has since been rewritten.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.ids = np.load(os.path.join(path, IDS_FILE), mmap_mode='r')
+        self.neighbors = np.load(os.path.join(path, NEIGHBORS_FILE), mmap_mode='r')
+        self.distances = np.load(os.path.join(path, DISTANCES_FILE), mmap_mode='r')
+        self.similarities = np.load(os.path.join(path, SIMILARITIES_FILE), mmap_mode='r')
+        positions_path = os.path.join(path, POSITIONS_FILE)
+        self.positions = np.load(positions_path, mmap_mode='r') if os.path.exists(positions_path) else None
+        with open(os.path.join(path, META_FILE), encoding='utf-8') as f:
+            self.meta = json.load(f)
+        self.mtime = os.path.getmtime(os.path.join(path, META_FILE))
+
+    def position(self, case_file_id):
+        """Row of a case in the graph, or None if it was not part of the build"""
+        case_file_id = int(case_file_id)
+        if self.positions is not None:
+            if 0 <= case_file_id < len(self.positions):
+                row = int(self.positions[case_file_id])
+                return row if row >= 0 else None
+            return None
+
+        row = int(np.searchsorted(self.ids, case_file_id))
+        if row < len(self.ids) and self.ids[row] == case_file_id:
+            return row
+        return None
+
+    def similar(self, case_file_id, top_k=None, duplicate_threshold=NEAR_DUPLICATE_SIMILARITY):
+        """
+        Precomputed neighbours of a case
+
+        :param case_file_id: Case to look up
+        :param top_k: Number of neighbours to return (capped at the graph's k)
+        :param duplicate_threshold: Cosine similarity at which a neighbour is a near-duplicate
+        :return: List of neighbour dicts, closest first, or None if the case is unknown
+        :raises ValueError: top_k is below 1 or case_file_id is not an integer
+        """
+        if top_k is not None and top_k < 1:
+            # A negative slice would silently return the farthest neighbours
+            raise ValueError(f'top_k must be at least 1, got {top_k}')
+
+        row = self.position(case_file_id)
+        if row is None:
+            return None
+
+        top_k = self.neighbors.shape[1] if top_k is None else top_k
+        return [
+            {
+                'case_file_id': int(neighbor),
+                'distance': float(distance),
+                'similarity': float(similarity),
+                'near_duplicate': bool(similarity >= duplicate_threshold),
+            }
+            for neighbor, distance, similarity in zip(
+                self.neighbors[row, :top_k], self.distances[row, :top_k], self.similarities[row, :top_k]
+            )
+        ]
+
+    def near_duplicates(self, threshold=NEAR_DUPLICATE_SIMILARITY):
+        """
+        Pairs of cases whose similarity reaches the threshold, each pair reported once
+
+        :return: List of (case_file_id, other_case_file_id, similarity)
+        """
+        rows, columns = np.nonzero(np.asarray(self.similarities) >= threshold)
+        pairs = {}
+        for row, column in zip(rows, columns):
+            first, second = int(self.ids[row]), int(self.neighbors[row, column])
+            pairs[(min(first, second), max(first, second))] = float(self.similarities[row, column])
+        return [(first, second, similarity) for (first, second), similarity in sorted(pairs.items())]
+
+
+_graphs = {}
+_graphs_lock = threading.Lock()
+
+
+def open_knn_graph(store_dir):
+    """
+    Return the process-wide graph for a vector store, or None if it has not been built
+
+    The graph is reopened when a rebuild replaces it.
+    """
+    path = graph_path(store_dir)
+    meta_path = os.path.join(path, META_FILE)
+    if not os.path.exists(meta_path):
+        return None
+
+    with _graphs_lock:
+        graph = _graphs.get(path)
+        if graph is None or graph.mtime != os.path.getmtime(meta_path):
+            graph = KnnGraph(path)
+            _graphs[path] = graph
+        return graph
@@ -1,44 +1,23 @@
-from llmware.models import ModelCatalog
+from django.conf import settings
+from .context_packer import pack_text
+from .llm import generate
+from .prompts import SUMMARIZER_SYSTEM_PROMPT, summary_prompt
 
 def interact_with_model(context):
     """
-    Registers a predefined Ollama model, confirms its registration, and performs inference on a question.
+    Summarizes FIR text with the model configured for the 'summarize' task.
     
     Parameters:
-        question (str): The query for which inference is required.
+        context (str): Text extracted from the case file.
     
     Returns:
-        str: The response from the model.
+        dict: The model's response ('llm_response') and token usage ('usage').
     """
-    # Predefined model details
-    model_name = "llama2-uncensored:7b"
-    model_type = "chat"
-    host = "localhost"
-    port = 11434
-    temperature = 0
-
-    # Register the model
-    model_catalog = ModelCatalog()
-    model_catalog.register_ollama_model(
-        model_name=model_name,
-        model_type=model_type,
-        host=host,
-        port=port,
-        temperature=temperature
-    )
-    
-    # Confirm the model registration
-    model_card = model_catalog.lookup_model_card(model_name)
-   
-    
-    # Load the model and perform inference
-    print(context)
-    model = model_catalog.load_model(model_name)
-    response = model.inference(f"""Summarize the given FIR crime details
-
-Context: {context}
-
-Instructions: Provide only the summary. Ensure the sentence is concise, clear, and accurately reflects the key details of the FIR crime""")
+    # The model comes from settings.LLM, which also controls its residency;
+    # the instructions are a fixed system prompt so their tokens are reused,
+    # and long files are cut down to the most relevant passages
+    packed = pack_text(context, settings.LLM['CONTEXT_TOKENS']['summarize'])
+    response = generate("summarize", summary_prompt(packed.text), system=SUMMARIZER_SYSTEM_PROMPT)
     
     return response
 
@@ -0,0 +1,427 @@
+"""
+Chat model access through Ollama, with model residency management
+
+Every prompt the app sends goes through generate(), which picks the model
+for the task, applies that model's keep_alive (pinned models never unload),
+bounds the number of concurrent Ollama calls and records reloads reported by
+Ollama's load_duration, so model thrashing shows up in llm_metrics(). Each
+call is also appended to the LLMUsage ledger (manage.py llm_usage) by a
+single writer thread.
+"""
+import atexit
+import logging
+import math
+import queue
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import DatabaseError, close_old_connections, connection
+
+from .models import LLMUsage
+from .prompts import PROMPT_VERSION
+
+logger = logging.getLogger(__name__)
+
+# Ollama reports durations in nanoseconds
+NS = 1e9
+
+
+def llm_settings():
+    return settings.LLM
+
+
+def model_for(task):
+    """
+    Model serving a task ('legal_analysis', 'summarize')
+
+    LLM['CHAT_MODEL'], when set, routes every chat task to that one model so
+    only it has to stay resident.
+    """
+    config = llm_settings()
+    return config.get('CHAT_MODEL') or config['MODELS'][task]
+
+
+def keep_alive_for(model):
+    """keep_alive to send with a request: -1 (never unload) for pinned models"""
+    config = llm_settings()
+    if model in config.get('PINNED', ()):
+        return -1
+    return config.get('KEEP_ALIVE', {}).get(model, config.get('DEFAULT_KEEP_ALIVE'))
+
+
+class ResidencyStats:
+    """Per-model request and reload counters"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.models = defaultdict(lambda: {
+            'requests': 0,
+            'reloads': 0,
+            'reload_seconds': 0.0,
+            'last_reload_at': None,
+        })
+
+    def record(self, model, load_seconds):
+        """
+        Count a request; a load_duration above the threshold means the weights were (re)loaded
+        """
+        reloaded = load_seconds >= llm_settings().get('RELOAD_THRESHOLD_SECONDS', 0.5)
+        with self.lock:
+            stats = self.models[model]
+            stats['requests'] += 1
+            if reloaded:
+                stats['reloads'] += 1
+                stats['reload_seconds'] = round(stats['reload_seconds'] + load_seconds, 3)
+                stats['last_reload_at'] = time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())
+        if reloaded:
+            logger.warning('Ollama loaded %s in %.1fs; it was not resident', model, load_seconds)
+        return reloaded
+
+    def snapshot(self):
+        with self.lock:
+            return {model: dict(stats) for model, stats in self.models.items()}
+
+
+class PromptStats:
+    """
+    Per-task prompt token counts and prompt evaluation times
+
+    prompt_eval_count only covers tokens Ollama had to evaluate, so a system
+    prompt reused from the previous request shows up as fewer prompt tokens
+    and a shorter time to first token.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.tasks = defaultdict(lambda: {
+            'requests': 0,
+            'prompt_tokens': 0,
+            'prompt_eval_seconds': 0.0,
+            'time_to_first_token_seconds': 0.0,
+        })
+
+    def record(self, task, prompt_tokens, prompt_eval_seconds, time_to_first_token):
+        with self.lock:
+            stats = self.tasks[task]
+            stats['requests'] += 1
+            stats['prompt_tokens'] += prompt_tokens
+            stats['prompt_eval_seconds'] += prompt_eval_seconds
+            stats['time_to_first_token_seconds'] += time_to_first_token
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                task: {
+                    'requests': stats['requests'],
+                    'avg_prompt_tokens': round(stats['prompt_tokens'] / stats['requests'], 1),
+                    'avg_prompt_eval_ms': round(stats['prompt_eval_seconds'] * 1000 / stats['requests'], 1),
+                    'avg_time_to_first_token_ms': round(
+                        stats['time_to_first_token_seconds'] * 1000 / stats['requests'], 1
+                    ),
+                }
+                for task, stats in self.tasks.items()
+            }
+
+
+residency = ResidencyStats()
+prompt_stats = PromptStats()
+
+# generate() rounds timeouts up to this many seconds, so a handful of timed
+# clients (each with its own connection pool) serve every request deadline
+TIMEOUT_STEP_SECONDS = 5
+
+_client = None
+_client_replaced = False
+_timed_clients = {}
+_slots = None
+_client_lock = threading.Lock()
+
+
+def get_client(timeout=None):
+    """
+    Process-wide Ollama client for LLM['HOST']
+
+    :param timeout: HTTP timeout in seconds; when given, the process-wide
+                    client for that timeout is returned, whose calls give up
+                    after that long
+    """
+    global _client
+    if timeout is not None and not _client_replaced:
+        client = _timed_clients.get(timeout)
+        if client is None:
+            import ollama
+
+            with _client_lock:
+                client = _timed_clients.get(timeout)
+                if client is None:
+                    client = ollama.Client(host=llm_settings()['HOST'], timeout=timeout)
+                    _timed_clients[timeout] = client
+        return client
+
+    if _client is None:
+        import ollama
+
+        with _client_lock:
+            if _client is None:
+                _client = ollama.Client(host=llm_settings()['HOST'])
+    return _client
+
+
+def set_client(client):
+    """Replace the process-wide Ollama client (used by the load-test fakes)"""
+    global _client, _client_replaced
+    with _client_lock:
+        _client = client
+        _client_replaced = True
+
+
+def llm_slots():
+    """Semaphore bounding concurrent Ollama calls to LLM['CONCURRENCY']"""
+    global _slots
+    if _slots is None:
+        with _client_lock:
+            if _slots is None:
+                _slots = threading.BoundedSemaphore(llm_settings().get('CONCURRENCY', 2))
+    return _slots
+
+
+def generate(task, prompt, system=None, options=None, timeout=None):
+    """
+    Run a prompt on the task's model
+
+    :param task: Key of LLM['MODELS']
+    :param prompt: Prompt text
+    :param system: Optional system prompt
+    :param options: Extra Ollama options (temperature defaults to 0)
+    :param timeout: Seconds after which the HTTP call to Ollama is abandoned
+                    (rounded up to TIMEOUT_STEP_SECONDS)
+    :return: {'llm_response': text, 'usage': token counts and timings}
+    """
+    model = model_for(task)
+    if timeout is not None:
+        timeout = math.ceil(timeout / TIMEOUT_STEP_SECONDS) * TIMEOUT_STEP_SECONDS
+    queued = time.monotonic()
+    with llm_slots():
+        started = time.monotonic()
+        try:
+            response = get_client(timeout).generate(
+                model=model,
+                prompt=prompt,
+                system=system,
+                options={'temperature': 0, **(options or {})},
+                keep_alive=keep_alive_for(model),
+            )
+        except Exception:
+            record_usage(
+                task, model, LLMUsage.OUTCOME_ERROR,
+                queue_wait=started - queued,
+                total=time.monotonic() - started,
+            )
+            raise
+        finished = time.monotonic()
+
+    load_seconds = (response.get('load_duration') or 0) / NS
+    reloaded = residency.record(model, load_seconds)
+
+    # Without streaming, the first token arrives once the model is loaded and the prompt evaluated
+    prompt_tokens = response.get('prompt_eval_count') or 0
+    prompt_eval_seconds = (response.get('prompt_eval_duration') or 0) / NS
+    time_to_first_token = load_seconds + prompt_eval_seconds
+    prompt_stats.record(task, prompt_tokens, prompt_eval_seconds, time_to_first_token)
+
+    completion_tokens = response.get('eval_count') or 0
+    eval_seconds = (response.get('eval_duration') or 0) / NS
+    record_usage(
+        task, model, LLMUsage.OUTCOME_OK,
+        queue_wait=started - queued,
+        total=finished - started,
+        prompt_tokens=prompt_tokens,
+        completion_tokens=completion_tokens,
+        time_to_first_token=time_to_first_token,
+        tokens_per_second=completion_tokens / eval_seconds if eval_seconds else None,
+        reloaded=reloaded,
+    )
+
+    return {
+        'llm_response': response['response'],
+        'usage': {
+            'model': model,
+            'input': prompt_tokens,
+            'output': completion_tokens,
+            'processing_time': round((response.get('total_duration') or 0) / NS, 3),
+            'prompt_eval_time': round(prompt_eval_seconds, 3),
+            'time_to_first_token': round(time_to_first_token, 3),
+            'queue_wait': round(started - queued, 3),
+            'load_time': round(load_seconds, 3),
+            'reloaded': reloaded,
+        }
+    }
+
+
+class UsageWriter:
+    """
+    Single daemon thread that writes the LLMUsage ledger
+
+    generate() runs on request threads and on ThreadPoolExecutor workers
+    (deadline pools, summarize map steps). Django opens one DB connection per
+    thread and only closes them at the end of a request, so writing from those
+    workers leaked a connection per pool thread. Rows are queued here instead
+    and written in batches from this one thread, whose connection is recycled
+    like a request's (close_old_connections) before each batch.
+    """
+    # Rows written per INSERT, and rows kept waiting before new ones are dropped
+    BATCH_SIZE = 200
+    MAX_PENDING = 10000
+
+    def __init__(self):
+        self.queue = queue.Queue(maxsize=self.MAX_PENDING)
+        self.thread = None
+        self.lock = threading.Lock()
+
+    def submit(self, usage):
+        """Queue an unsaved LLMUsage row; never blocks the LLM call"""
+        if self.thread is None:
+            with self.lock:
+                if self.thread is None:
+                    self.thread = threading.Thread(target=self.run, name='llm-usage-writer', daemon=True)
+                    self.thread.start()
+                    atexit.register(self.flush)
+        try:
+            self.queue.put_nowait(usage)
+        except queue.Full:
+            logger.warning('LLM usage ledger is backed up; dropping a row for %s', usage.model)
+
+    def run(self):
+        while True:
+            batch = [self.queue.get()]
+            while len(batch) < self.BATCH_SIZE:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                self.write(batch)
+            finally:
+                for _ in batch:
+                    self.queue.task_done()
+
+    def write(self, batch):
+        close_old_connections()
+        try:
+            LLMUsage.objects.bulk_create(batch)
+        except DatabaseError:
+            logger.exception('Could not record %d LLM usage row(s)', len(batch))
+            # Drop a possibly broken connection so the next batch reconnects
+            connection.close()
+
+    def flush(self, timeout=5):
+        """
+        Wait until queued rows are written (at exit and in tests)
+
+        :param timeout: Seconds to wait at most
+        :return: Whether the queue was drained
+        """
+        deadline = time.monotonic() + timeout
+        while self.queue.unfinished_tasks:
+            if self.thread is None or not self.thread.is_alive() or time.monotonic() > deadline:
+                return False
+            time.sleep(0.01)
+        return True
+
+
+usage_writer = UsageWriter()
+
+
+def record_usage(task, model, outcome, queue_wait, total, prompt_tokens=0, completion_tokens=0,
+                 time_to_first_token=None, tokens_per_second=None, reloaded=False):
+    """
+    Append one call to the LLMUsage ledger (durations in seconds)
+
+    The row is written asynchronously by usage_writer; ledger failures are
+    logged and never fail the LLM call itself.
+    """
+    if not llm_settings().get('USAGE_LEDGER', True):
+        return
+    usage_writer.submit(LLMUsage(
+        task=task,
+        model=model,
+        prompt_version=PROMPT_VERSION,
+        outcome=outcome,
+        prompt_tokens=prompt_tokens,
+        completion_tokens=completion_tokens,
+        queue_wait_ms=round(queue_wait * 1000, 1),
+        time_to_first_token_ms=round(time_to_first_token * 1000, 1) if time_to_first_token is not None else None,
+        total_ms=round(total * 1000, 1),
+        tokens_per_second=round(tokens_per_second, 2) if tokens_per_second is not None else None,
+        reloaded=reloaded,
+    ))
+
+
+def group_by_model(jobs, model_of, resident=()):
+    """
+    Order bulk jobs so each model's jobs run back to back
+
+    Models already resident in Ollama go first, so the batch starts without a
+    load; within a model, jobs keep their original order.
+
+    :param jobs: Sequence of jobs
+    :param model_of: Callable returning a job's model name
+    :param resident: Names of currently loaded models
+    :return: List of (model, [jobs]) groups
+    """
+    groups = {}
+    for job in jobs:
+        groups.setdefault(model_of(job), []).append(job)
+    resident = list(resident)
+
+    def rank(group):
+        model = group[0]
+        return resident.index(model) if model in resident else len(resident)
+
+    return sorted(groups.items(), key=rank)
+
+
+# ps() is asked by every metrics request and job worker loop: it gets a short
+# timeout, and its answer is reused for a few seconds
+RESIDENT_MODELS_TIMEOUT_SECONDS = 2
+RESIDENT_MODELS_TTL_SECONDS = 5
+
+_resident = (0.0, [])
+
+
+def resident_models():
+    """Names of the models Ollama currently holds in memory ([] if it cannot be asked)"""
+    global _resident
+    expires_at, models = _resident
+    if time.monotonic() < expires_at:
+        return list(models)
+    try:
+        models = [model['model'] for model in get_client(RESIDENT_MODELS_TIMEOUT_SECONDS).ps()['models']]
+    except Exception:
+        models = []
+    # A hung or unreachable Ollama is remembered too, so callers do not queue up behind it
+    _resident = (time.monotonic() + RESIDENT_MODELS_TTL_SECONDS, models)
+    return list(models)
+
+
+def warm_up(models=None):
+    """
+    Load models into Ollama ahead of traffic with their keep_alive applied
+
+    An empty prompt makes Ollama load the weights without generating.
+
+    :param models: Model names; defaults to LLM['PINNED']
+    :return: {model: load seconds}
+    """
+    timings = {}
+    for model in models if models is not None else llm_settings().get('PINNED', ()):
+        response = get_client().generate(model=model, prompt='', keep_alive=keep_alive_for(model))
+        timings[model] = round((response.get('load_duration') or 0) / NS, 3)
+    return timings
+
+
+def llm_metrics():
+    """Residency counters per model, prompt costs per task and what Ollama reports as loaded"""
+    return {'models': residency.snapshot(), 'prompts': prompt_stats.snapshot(), 'resident': resident_models()}
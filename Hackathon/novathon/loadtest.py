@@ -0,0 +1,158 @@
+import json
+import random
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import defaultdict
+
+import numpy as np
+import pandas as pd
+
+ENDPOINTS = ('search', 'legal', 'text')
+DEFAULT_MIX = {'search': 0.6, 'legal': 0.3, 'text': 0.1}
+
+# Endpoints whose 404 means "nothing matched" rather than a wrong route or id.
+# /legal-analysis/ answers 404 when no section is similar enough; search
+# answers 200 with no results, and every text request names a known case.
+NOT_FOUND_OK = frozenset({'legal'})
+
+
+class Workload:
+    """
+    Realistic request mix drawn from the shipped CSVs
+
+    search: semantic and filtered /search_case_files/ calls
+    legal:  /legal-analysis/ with offense descriptions and explicit "IPC n" references
+    text:   /get-file-text/<case_id>/
+    """
+
+    def __init__(self, case_files_csv, ipc_sections_csv, mix=None, seed=0):
+        case_files = pd.read_csv(case_files_csv)
+        ipc = pd.read_csv(ipc_sections_csv)
+
+        self.case_ids = case_files['case_file_id'].astype(str).tolist()
+        self.case_rows = case_files[['year', 'criminal_name', 'police_station', 'crime_type', 'keywords']].to_dict('records')
+        self.offenses = ipc['Offense'].dropna().tolist()
+        self.sections = ipc['Section'].str.replace('IPC_', '', regex=False).tolist()
+
+        self.mix = mix or DEFAULT_MIX
+        self.endpoints = list(self.mix)
+        self.weights = [self.mix[name] for name in self.endpoints]
+        self.seed = seed
+
+    def request(self, rng):
+        """Pick one request: (endpoint, method, path, body)"""
+        endpoint = rng.choices(self.endpoints, self.weights)[0]
+
+        if endpoint == 'search':
+            row = rng.choice(self.case_rows)
+            body = {'top_k': rng.choice([5, 10, 20])}
+            if rng.random() < 0.8:
+                body['query'] = rng.choice(row['keywords'].split(', '))
+            # Filters in roughly the proportions the UI sends them
+            if rng.random() < 0.4:
+                body['year'] = int(row['year'])
+            if rng.random() < 0.3:
+                body['crime_type'] = row['crime_type']
+            if rng.random() < 0.1:
+                body['police_station'] = row['police_station']
+            if rng.random() < 0.05:
+                body['criminal_name'] = row['criminal_name']
+            return endpoint, 'POST', '/search_case_files/', body
+
+        if endpoint == 'legal':
+            if rng.random() < 0.3:
+                query = f"IPC {rng.choice(self.sections)} punishment"
+            else:
+                query = rng.choice(self.offenses)
+            return endpoint, 'POST', '/legal-analysis/', {'query': query}
+
+        return endpoint, 'GET', f'/get-file-text/{rng.choice(self.case_ids)}/', None
+
+
+def _send(base_url, method, path, body, timeout, not_found_ok=False):
+    """Send one request; True for a 2xx/3xx answer (or a 404 when not_found_ok)"""
+    data = json.dumps(body).encode('utf-8') if body is not None else None
+    request = urllib.request.Request(base_url + path, data=data, method=method,
+                                     headers={'Content-Type': 'application/json'})
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            response.read()
+            return response.status < 400
+    except urllib.error.HTTPError as e:
+        e.read()
+        return not_found_ok and e.code == 404
+    except (urllib.error.URLError, OSError):
+        return False
+
+
+def run_level(base_url, workload, concurrency, duration, timeout=60.0):
+    """
+    Drive the server with `concurrency` closed-loop clients for `duration` seconds
+
+    :return: {endpoint: [(latency_seconds, ok), ...]} and the measured wall time
+    """
+    samples = defaultdict(list)
+    lock = threading.Lock()
+    stop_at = time.perf_counter() + duration
+
+    def client(index):
+        rng = random.Random(workload.seed * 1000 + index)
+        local = []
+        while time.perf_counter() < stop_at:
+            endpoint, method, path, body = workload.request(rng)
+            started = time.perf_counter()
+            ok = _send(base_url, method, path, body, timeout, not_found_ok=endpoint in NOT_FOUND_OK)
+            local.append((endpoint, time.perf_counter() - started, ok))
+        with lock:
+            for endpoint, latency, ok in local:
+                samples[endpoint].append((latency, ok))
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=client, args=(i,), daemon=True) for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return samples, time.perf_counter() - started
+
+
+def summarize(samples, wall_time):
+    """Throughput, latency percentiles (ms) and error rate per endpoint"""
+    summary = {}
+    for endpoint, rows in sorted(samples.items()):
+        latencies = np.array([latency for latency, _ in rows]) * 1000
+        errors = sum(1 for _, ok in rows if not ok)
+        summary[endpoint] = {
+            'requests': len(rows),
+            'throughput_rps': round(len(rows) / wall_time, 2),
+            'p50_ms': round(float(np.percentile(latencies, 50)), 1),
+            'p95_ms': round(float(np.percentile(latencies, 95)), 1),
+            'p99_ms': round(float(np.percentile(latencies, 99)), 1),
+            'error_rate': round(errors / len(rows), 4),
+        }
+    return summary
+
+
+def compare(report, baseline, tolerance=0.1):
+    """
+    Compare a report against a saved baseline
+
+    :return: List of (concurrency, endpoint, metric, baseline_value, current_value, regressed)
+    """
+    rows = []
+    for level, endpoints in report['levels'].items():
+        for endpoint, current in endpoints.items():
+            previous = baseline.get('levels', {}).get(level, {}).get(endpoint)
+            if previous is None:
+                continue
+            for metric in ('p95_ms', 'p99_ms'):
+                regressed = current[metric] > previous[metric] * (1 + tolerance)
+                rows.append((level, endpoint, metric, previous[metric], current[metric], regressed))
+            regressed = current['throughput_rps'] < previous['throughput_rps'] * (1 - tolerance)
+            rows.append((level, endpoint, 'throughput_rps', previous['throughput_rps'],
+                         current['throughput_rps'], regressed))
+            regressed = current['error_rate'] > previous['error_rate'] + 0.01
+            rows.append((level, endpoint, 'error_rate', previous['error_rate'], current['error_rate'], regressed))
+    return rows
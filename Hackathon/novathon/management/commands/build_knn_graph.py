@@ -0,0 +1,37 @@
+# novathon/management/commands/build_knn_graph.py
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from novathon.knn_graph import DEFAULT_BLOCK_SIZE, DEFAULT_K, build_knn_graph, open_knn_graph
+from novathon.vector_store import open_vector_store
+
+class Command(BaseCommand):
+    help = 'Precompute the similar-cases neighbour graph from the full-precision case vectors'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--k', type=int, default=DEFAULT_K, help='Neighbours kept per case')
+        parser.add_argument('--block-size', type=int, default=DEFAULT_BLOCK_SIZE,
+                            help='Rows per block in the similarity join (memory grows with its square)')
+        parser.add_argument('--duplicates', action='store_true', help='List near-duplicate case pairs after the build')
+        parser.add_argument('--threshold', type=float, default=settings.CASE_FILES_NEAR_DUPLICATE_SIMILARITY,
+                            help='Cosine similarity at which two cases count as near-duplicates')
+
+    def handle(self, *args, **kwargs):
+        store_dir = settings.CASE_FILES_VECTOR_STORE
+        if open_vector_store(store_dir) is None:
+            raise CommandError(f'No vector store at {store_dir}; load the case files first')
+        if kwargs['k'] < 1 or kwargs['block_size'] < 1:
+            raise CommandError('--k and --block-size must be positive')
+
+        def progress(done, total):
+            self.stdout.write(f'{done}/{total} cases')
+
+        meta = build_knn_graph(store_dir, k=kwargs['k'], block_size=kwargs['block_size'], progress=progress)
+        self.stdout.write(self.style.SUCCESS(
+            f"Built {meta['k']}-NN graph for {meta['num_rows']} cases in {meta['build_seconds']}s"
+        ))
+
+        if kwargs['duplicates']:
+            pairs = open_knn_graph(store_dir).near_duplicates(kwargs['threshold'])
+            for first, second, similarity in pairs:
+                self.stdout.write(f'{first} ~ {second} (similarity {similarity:.4f})')
+            self.stdout.write(self.style.SUCCESS(f'{len(pairs)} near-duplicate pair(s)'))
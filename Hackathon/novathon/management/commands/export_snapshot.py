@@ -0,0 +1,42 @@
+# novathon/management/commands/export_snapshot.py
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from pymilvus import Collection, connections
+from novathon.embedders import configured_model
+from novathon.snapshot import SNAPSHOT_COLLECTIONS, export_collection
+
+class Command(BaseCommand):
+    help = 'Export a Milvus collection (embeddings + metadata) to a snapshot directory'
+
+    def add_arguments(self, parser):
+        parser.add_argument('collection', choices=sorted(SNAPSHOT_COLLECTIONS))
+        parser.add_argument('output_dir', type=str)
+        parser.add_argument('--model', default=None,
+                            help='Embedding model that produced the vectors, recorded in the manifest '
+                                 '(default: settings.EMBEDDER MODEL)')
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **kwargs):
+        collection_name = kwargs['collection']
+        connections.connect(host='localhost', port='19530')
+
+        collection = Collection(collection_name)
+        collection.load()
+
+        # Carry the full-precision vectors along so re-ranking works after a restore
+        vector_store_path = settings.CASE_FILES_VECTOR_STORE if collection_name == 'case_files' else None
+
+        try:
+            manifest = export_collection(
+                collection,
+                kwargs['output_dir'],
+                model_name=kwargs['model'] or configured_model(),
+                batch_size=kwargs['batch_size'],
+                vector_store_path=vector_store_path
+            )
+        except Exception as e:
+            raise CommandError(f'Export failed: {e}')
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Exported {manifest['num_rows']} rows of {collection_name} to {kwargs['output_dir']}"
+        ))
@@ -0,0 +1,38 @@
+# novathon/management/commands/import_snapshot.py
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from pymilvus import connections
+from novathon.embedders import configured_model
+from novathon.snapshot import SnapshotError, import_snapshot
+
+class Command(BaseCommand):
+    help = 'Recreate a Milvus collection from a snapshot without re-embedding anything'
+
+    def add_arguments(self, parser):
+        parser.add_argument('snapshot_dir', type=str)
+        parser.add_argument('--batch-size', type=int, default=None,
+                            help='Rows per insert call (default: ~32MB of vectors)')
+        parser.add_argument('--model', default=None,
+                            help='Refuse snapshots embedded with a different model '
+                                 '(default: settings.EMBEDDER MODEL)')
+        parser.add_argument('--no-verify', action='store_true',
+                            help='Skip checking file hashes against the manifest')
+
+    def handle(self, *args, **kwargs):
+        connections.connect(host='localhost', port='19530')
+
+        try:
+            manifest = import_snapshot(
+                kwargs['snapshot_dir'],
+                batch_size=kwargs['batch_size'],
+                verify=not kwargs['no_verify'],
+                vector_store_path=settings.CASE_FILES_VECTOR_STORE,
+                expected_model=kwargs['model'] or configured_model()
+            )
+        except SnapshotError as e:
+            raise CommandError(str(e))
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Restored {manifest['num_rows']} rows into {manifest['collection']} "
+            f"(model {manifest['model']}, dim {manifest['dim']})"
+        ))
@@ -0,0 +1,28 @@
+# novathon/management/commands/llm_residency.py
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from novathon.llm import keep_alive_for, model_for, resident_models, warm_up
+
+class Command(BaseCommand):
+    help = 'Show which Ollama models are resident and preload the pinned ones'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--warm', action='store_true', help='Load the pinned models now')
+        parser.add_argument('--model', action='append', default=None,
+                            help='Load this model instead of the pinned ones (repeatable)')
+
+    def handle(self, *args, **kwargs):
+        config = settings.LLM
+        for task in config['MODELS']:
+            model = model_for(task)
+            self.stdout.write(f'{task:<16} {model:<24} keep_alive={keep_alive_for(model)}')
+
+        if kwargs['warm'] or kwargs['model']:
+            try:
+                timings = warm_up(kwargs['model'])
+            except Exception as e:
+                raise CommandError(f'Could not load models: {e}')
+            for model, seconds in timings.items():
+                self.stdout.write(self.style.SUCCESS(f'Loaded {model} ({seconds}s)'))
+
+        self.stdout.write(f"Resident: {', '.join(resident_models()) or 'none'}")
@@ -0,0 +1,53 @@
+# novathon/management/commands/llm_usage.py
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from novathon.models import LLMUsage
+from novathon.usage_report import LATENCY_FIELDS, PERCENTILES, daily_throughput, model_percentiles, task_costs
+
+class Command(BaseCommand):
+    help = 'Summarize the LLM usage ledger: per-model percentiles, expensive prompts and daily throughput'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=7, help='Look back this many days')
+        parser.add_argument('--model', help='Only this model')
+        parser.add_argument('--task', help='Only this task')
+
+    def handle(self, *args, **kwargs):
+        usage = LLMUsage.objects.filter(created_at__gte=timezone.now() - timedelta(days=kwargs['days']))
+        if kwargs['model']:
+            usage = usage.filter(model=kwargs['model'])
+        if kwargs['task']:
+            usage = usage.filter(task=kwargs['task'])
+
+        models = model_percentiles(usage)
+        if not models:
+            self.stdout.write(self.style.WARNING(f"No LLM calls recorded in the last {kwargs['days']} day(s)"))
+            return
+
+        header = ' / '.join(f'p{p}' for p in PERCENTILES)
+        for model, stats in models.items():
+            self.stdout.write(self.style.SUCCESS(
+                f"{model}: {stats['calls']} calls, {stats['errors']} errors, {stats['reloads']} reloads, "
+                f"{stats['prompt_tokens'] or 0} prompt / {stats['completion_tokens'] or 0} completion tokens"
+            ))
+            for field in LATENCY_FIELDS:
+                values = stats[field]
+                shown = ' / '.join(str(values[p]) for p in PERCENTILES) if values else '-'
+                self.stdout.write(f'  {field:<24} {header}: {shown}')
+
+        self.stdout.write('\nPrompt cost by task')
+        for row in task_costs(usage):
+            self.stdout.write(
+                f"  {row['task']:<16} v{row['prompt_version']:<3} {row['calls']:>6} calls  "
+                f"{row['avg_prompt_tokens']:.0f} prompt / {row['avg_completion_tokens']:.0f} completion tokens  "
+                f"ttft {row['avg_time_to_first_token_ms'] or 0:.0f} ms"
+            )
+
+        self.stdout.write('\nDaily throughput')
+        for day, per_model in daily_throughput(usage).items():
+            for model, stats in per_model.items():
+                self.stdout.write(
+                    f"  {day}  {model:<24} {stats['calls']:>6} calls  {stats['prompt_tokens']:>9} prompt  "
+                    f"{stats['completion_tokens']:>9} completion tokens  {stats['busy_seconds']}s busy"
+                )
@@ -0,0 +1,126 @@
+# novathon/management/commands/loadtest.py
+import json
+import threading
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.core.servers.basehttp import ThreadedWSGIServer, WSGIRequestHandler
+from django.core.wsgi import get_wsgi_application
+from novathon.catalog import CASE_FILES_CSV, project_path
+from novathon.loadtest import DEFAULT_MIX, ENDPOINTS, Workload, compare, run_level, summarize
+
+class QuietRequestHandler(WSGIRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+class Command(BaseCommand):
+    help = 'Sweep concurrency levels against the API and report throughput, latency percentiles and errors'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default=None,
+                            help='Target a running server; by default an in-process server with fake backends is started')
+        parser.add_argument('--concurrency', default='1,4,16', help='Comma-separated client counts')
+        parser.add_argument('--duration', type=float, default=20, help='Seconds per concurrency level')
+        parser.add_argument('--mix', default=','.join(f'{k}={v}' for k, v in DEFAULT_MIX.items()),
+                            help='Endpoint weights, e.g. search=0.6,legal=0.3,text=0.1')
+        parser.add_argument('--embed-latency', type=float, default=20, help='Fake embedding latency (ms)')
+        parser.add_argument('--search-latency', type=float, default=5, help='Fake Milvus latency (ms)')
+        parser.add_argument('--llm-latency', type=float, default=1500, help='Fake LLM latency (ms)')
+        parser.add_argument('--timeout', type=float, default=60, help='Per-request client timeout (s)')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', default=None, help='Write the JSON report here')
+        parser.add_argument('--baseline', default=None, help='Compare against a previously saved report')
+        parser.add_argument('--tolerance', type=float, default=0.1, help='Allowed relative regression')
+        parser.add_argument('--fail-on-regression', action='store_true')
+
+    def handle(self, *args, **kwargs):
+        try:
+            mix = {
+                name: float(weight)
+                for name, weight in (item.split('=') for item in kwargs['mix'].split(','))
+            }
+            levels = [int(level) for level in kwargs['concurrency'].split(',')]
+        except ValueError:
+            raise CommandError('Invalid --mix or --concurrency')
+        unknown = set(mix) - set(ENDPOINTS)
+        if unknown:
+            raise CommandError(f'Unknown endpoints in --mix: {sorted(unknown)}')
+
+        workload = Workload(project_path(CASE_FILES_CSV), settings.IPC_SECTIONS_CSV, mix=mix, seed=kwargs['seed'])
+
+        server = None
+        base_url = kwargs['url']
+        if base_url is None:
+            server = self.start_fake_server(kwargs)
+            base_url = f'http://127.0.0.1:{server.server_address[1]}'
+        base_url = base_url.rstrip('/')
+
+        report = {
+            'config': {
+                'url': kwargs['url'] or 'in-process (fake backends)',
+                'duration': kwargs['duration'],
+                'mix': mix,
+                'fake_latency_ms': None if kwargs['url'] else {
+                    'embed': kwargs['embed_latency'],
+                    'search': kwargs['search_latency'],
+                    'llm': kwargs['llm_latency'],
+                },
+            },
+            'levels': {},
+        }
+
+        try:
+            for level in levels:
+                self.stdout.write(f'Running {level} concurrent clients for {kwargs["duration"]}s...')
+                samples, wall_time = run_level(base_url, workload, level, kwargs['duration'], kwargs['timeout'])
+                report['levels'][str(level)] = summarize(samples, wall_time)
+        finally:
+            if server is not None:
+                server.shutdown()
+                server.server_close()
+
+        self.print_report(report)
+
+        if kwargs['output']:
+            with open(kwargs['output'], 'w', encoding='utf-8') as f:
+                json.dump(report, f, indent=2)
+            self.stdout.write(self.style.SUCCESS(f'Report written to {kwargs["output"]}'))
+
+        if kwargs['baseline']:
+            with open(kwargs['baseline'], encoding='utf-8') as f:
+                baseline = json.load(f)
+            regressions = self.print_comparison(compare(report, baseline, kwargs['tolerance']))
+            if regressions and kwargs['fail_on_regression']:
+                raise CommandError(f'{regressions} metric(s) regressed beyond {kwargs["tolerance"]:.0%}')
+
+    def start_fake_server(self, kwargs):
+        """Serve the real Django app on an ephemeral port with fake Ollama/Milvus/LLM backends"""
+        from novathon.fakes import FakeLatency, install_fakes
+
+        latency = FakeLatency(kwargs['embed_latency'], kwargs['search_latency'], kwargs['llm_latency'])
+        install_fakes(project_path(CASE_FILES_CSV), settings.IPC_SECTIONS_CSV, latency)
+
+        server = ThreadedWSGIServer(('127.0.0.1', 0), QuietRequestHandler, allow_reuse_address=True)
+        server.set_app(get_wsgi_application())
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
+
+    def print_report(self, report):
+        self.stdout.write(f"\n{'conc':>5} {'endpoint':<8} {'reqs':>6} {'rps':>8} {'p50':>8} {'p95':>8} {'p99':>8} {'err':>7}")
+        for level, endpoints in report['levels'].items():
+            for endpoint, row in endpoints.items():
+                self.stdout.write(
+                    f"{level:>5} {endpoint:<8} {row['requests']:>6} {row['throughput_rps']:>8.2f} "
+                    f"{row['p50_ms']:>8.1f} {row['p95_ms']:>8.1f} {row['p99_ms']:>8.1f} {row['error_rate']:>7.2%}"
+                )
+
+    def print_comparison(self, rows):
+        regressions = 0
+        self.stdout.write('\nComparison with baseline:')
+        for level, endpoint, metric, previous, current, regressed in rows:
+            line = f'{level:>5} {endpoint:<8} {metric:<15} {previous:>10} -> {current:<10}'
+            if regressed:
+                regressions += 1
+                self.stdout.write(self.style.ERROR(line + ' REGRESSED'))
+            else:
+                self.stdout.write(line)
+        return regressions
@@ -0,0 +1,57 @@
+# novathon/management/commands/run_jobs.py
+import signal
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from novathon.jobs import claim_next_job, requeue_stale_jobs, run_job, worker_name
+from novathon.models import CaseJob
+
+class Command(BaseCommand):
+    help = 'Run queued summarization and text extraction jobs'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Exit when the queue is empty')
+        parser.add_argument('--kind', action='append', choices=[kind for kind, _ in CaseJob.KIND_CHOICES],
+                            help='Only run jobs of this kind (repeatable)')
+        parser.add_argument('--poll-interval', type=float, default=settings.JOBS['POLL_INTERVAL_SECONDS'],
+                            help='Seconds to wait when the queue is empty')
+
+    def handle(self, *args, **kwargs):
+        worker = worker_name()
+        self.stopping = False
+
+        # Finish the current job on SIGTERM/SIGINT instead of abandoning it
+        for signum in (signal.SIGTERM, signal.SIGINT):
+            signal.signal(signum, self.request_stop)
+
+        self.stdout.write(f'Worker {worker} started')
+        last_model = None
+        last_stale_check = 0
+
+        while not self.stopping:
+            if time.monotonic() - last_stale_check > settings.JOBS['STALE_AFTER_SECONDS'] / 2:
+                requeued, failed = requeue_stale_jobs(settings.JOBS['STALE_AFTER_SECONDS'])
+                if requeued or failed:
+                    self.stdout.write(self.style.WARNING(f'Requeued {requeued} and failed {failed} stale job(s)'))
+                last_stale_check = time.monotonic()
+
+            job = claim_next_job(worker, kinds=kwargs['kind'], last_model=last_model)
+            if job is None:
+                if kwargs['once']:
+                    break
+                time.sleep(kwargs['poll_interval'])
+                continue
+
+            started = time.monotonic()
+            job = run_job(job)
+            last_model = job.model or last_model
+            message = f'Job {job.id} ({job.kind} case {job.case_id}) {job.status} in {time.monotonic() - started:.1f}s'
+            if job.status == CaseJob.STATUS_DONE:
+                self.stdout.write(self.style.SUCCESS(message))
+            else:
+                self.stdout.write(self.style.ERROR(f'{message}: {job.error}'))
+
+        self.stdout.write(f'Worker {worker} stopped')
+
+    def request_stop(self, signum, frame):
+        self.stopping = True
@@ -0,0 +1,106 @@
+# novathon/management/commands/sync_case_files.py
+import os
+from concurrent.futures import ThreadPoolExecutor
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from novathon.catalog import (
+    CASE_FILES_CSV, CASE_FILES_DIR, RENAMED_DIR, RENAMED_FILE_PATTERN, SOURCE_FILE_PATTERN,
+    catalog_path, load_case_metadata, plan_renames, project_path, scan_directory
+)
+from novathon.models import RenamedCaseFile
+
+# Rows per INSERT/UPDATE/DELETE statement; keeps SQLite under its bound-variable limit
+DB_BATCH_SIZE = 500
+
+class Command(BaseCommand):
+    help = 'Rename new case PDFs and bring the RenamedCaseFile table in line with the renamed folder'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--csv', default=CASE_FILES_CSV, help='Case CSV used to name new PDFs')
+        parser.add_argument('--source-dir', default=CASE_FILES_DIR)
+        parser.add_argument('--renamed-dir', default=RENAMED_DIR)
+        parser.add_argument('--workers', type=int, default=min(32, (os.cpu_count() or 1) * 4),
+                            help='Parallel file moves')
+        parser.add_argument('--keep-missing', action='store_true',
+                            help='Do not delete rows whose PDF is no longer on disk')
+        parser.add_argument('--dry-run', action='store_true', help='Report the changes without applying them')
+
+    def handle(self, *args, **kwargs):
+        # Relative folders are taken from the project root, not the working directory
+        source_dir = project_path(kwargs['source_dir'])
+        renamed_dir = project_path(kwargs['renamed_dir'])
+        dry_run = kwargs['dry_run']
+
+        # A missing folder would look like an empty catalog and delete every row
+        for option, folder in (('--source-dir', source_dir), ('--renamed-dir', renamed_dir)):
+            if not os.path.isdir(folder):
+                raise CommandError(f'{option} {folder} does not exist')
+
+        # One scan of each folder; everything else is compared in memory
+        source_files = scan_directory(source_dir, SOURCE_FILE_PATTERN)
+        renamed_files = scan_directory(renamed_dir, RENAMED_FILE_PATTERN)
+
+        metadata, bad_rows = load_case_metadata(project_path(kwargs['csv'])) if source_files else ({}, [])
+        moves, skipped = plan_renames(source_files, renamed_files, metadata)
+        for case_id, reason in bad_rows + skipped:
+            self.stdout.write(self.style.WARNING(f'Skipped case {case_id}: {reason}'))
+
+        if moves and not dry_run:
+            renamed_files.update(self.move_files(moves, source_dir, renamed_dir, kwargs['workers']))
+        elif dry_run:
+            renamed_files.update({case_id: new_name for case_id, _, new_name in moves})
+
+        # Diff the desired catalog against the table
+        desired = {case_id: catalog_path(renamed_dir, name) for case_id, name in renamed_files.items()}
+        existing = {
+            case_id: (pk, file_path)
+            for pk, case_id, file_path in RenamedCaseFile.objects.values_list('pk', 'case_id', 'file_path').iterator()
+        }
+
+        to_create = [
+            RenamedCaseFile(case_id=case_id, file_path=file_path)
+            for case_id, file_path in desired.items() if case_id not in existing
+        ]
+        to_update = [
+            RenamedCaseFile(pk=existing[case_id][0], case_id=case_id, file_path=file_path)
+            for case_id, file_path in desired.items()
+            if case_id in existing and existing[case_id][1] != file_path
+        ]
+        to_delete = [] if kwargs['keep_missing'] else [
+            pk for case_id, (pk, _) in existing.items() if case_id not in desired
+        ]
+
+        if not dry_run:
+            with transaction.atomic():
+                RenamedCaseFile.objects.bulk_create(to_create, batch_size=DB_BATCH_SIZE)
+                RenamedCaseFile.objects.bulk_update(to_update, ['file_path'], batch_size=DB_BATCH_SIZE)
+                for start in range(0, len(to_delete), DB_BATCH_SIZE):
+                    RenamedCaseFile.objects.filter(pk__in=to_delete[start:start + DB_BATCH_SIZE]).delete()
+
+        prefix = 'Would apply' if dry_run else 'Applied'
+        self.stdout.write(self.style.SUCCESS(
+            f'{prefix}: {len(moves)} renamed, {len(to_create)} created, '
+            f'{len(to_update)} updated, {len(to_delete)} deleted'
+        ))
+
+    def move_files(self, moves, source_dir, renamed_dir, workers):
+        """Move PDFs concurrently; returns {case_id: new_name} for the moves that succeeded"""
+        def move(item):
+            case_id, old_name, new_name = item
+            new_path = os.path.join(renamed_dir, new_name)
+            if os.path.exists(new_path):
+                raise FileExistsError(new_path)
+            os.replace(os.path.join(source_dir, old_name), new_path)
+            return case_id, new_name
+
+        moved = {}
+        with ThreadPoolExecutor(max_workers=max(workers, 1)) as executor:
+            futures = [(item, executor.submit(move, item)) for item in moves]
+            for (case_id, old_name, new_name), future in futures:
+                try:
+                    future.result()
+                except OSError as e:
+                    self.stdout.write(self.style.ERROR(f'Error moving {old_name}: {e}'))
+                    continue
+                moved[case_id] = new_name
+        return moved
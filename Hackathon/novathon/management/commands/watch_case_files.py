@@ -0,0 +1,80 @@
+# novathon/management/commands/watch_case_files.py
+import signal
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from novathon.catalog import CASE_FILES_CSV, CASE_FILES_DIR, RENAMED_DIR, project_path
+from novathon.embedders import get_embedder
+from novathon.milvus.insert import CaseFileRAG
+from novathon.watcher import CaseFileIndexer, Debouncer, InotifyWatcher, open_watcher
+
+class Command(BaseCommand):
+    help = 'Watch the case PDF folders and index new, changed and removed files as they appear'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--csv', default=CASE_FILES_CSV, help='Case CSV with each case\'s metadata')
+        parser.add_argument('--source-dir', default=CASE_FILES_DIR)
+        parser.add_argument('--renamed-dir', default=RENAMED_DIR)
+        parser.add_argument('--poll', action='store_true', help='Poll the folders instead of using inotify')
+        parser.add_argument('--interval', type=float, default=2.0, help='Seconds between polls')
+        parser.add_argument('--debounce', type=float, default=2.0,
+                            help='Seconds a file must be left alone before it is indexed')
+        parser.add_argument('--batch-size', type=int, default=32, help='Files indexed per Milvus upsert')
+        parser.add_argument('--once', action='store_true',
+                            help='Index what is pending in the folders and exit without watching')
+
+    def handle(self, *args, **kwargs):
+        # Relative folders are taken from the project root, not the working directory
+        for option in ('csv', 'source_dir', 'renamed_dir'):
+            kwargs[option] = project_path(kwargs[option])
+        folders = [kwargs['source_dir'], kwargs['renamed_dir']]
+        rag = CaseFileRAG(
+            embedder=get_embedder(), vector_store_path=settings.CASE_FILES_VECTOR_STORE, recreate=False
+        )
+        indexer = CaseFileIndexer(
+            rag, kwargs['source_dir'], kwargs['renamed_dir'], kwargs['csv'], settings.CASE_FILES_VECTOR_STORE
+        )
+        self.stopping = False
+        for signum in (signal.SIGTERM, signal.SIGINT):
+            signal.signal(signum, self.request_stop)
+
+        # Files added while the watcher was not running
+        pending = sorted(indexer.pending_on_start())
+        for start in range(0, len(pending), kwargs['batch_size']):
+            self.index(indexer, pending[start:start + kwargs['batch_size']])
+        if kwargs['once']:
+            return
+
+        watcher = open_watcher(folders, polling=kwargs['poll'], interval=kwargs['interval'])
+        mode = 'inotify' if isinstance(watcher, InotifyWatcher) else f'polling every {kwargs["interval"]}s'
+        self.stdout.write(f'Watching {", ".join(folders)} ({mode})')
+
+        debouncer = Debouncer(kwargs['debounce'])
+        try:
+            while not self.stopping:
+                debouncer.add(watcher.poll(kwargs['debounce'] / 2 if debouncer else kwargs['interval']))
+                while not self.stopping:
+                    batch = debouncer.ready(limit=kwargs['batch_size'])
+                    if not batch:
+                        break
+                    self.index(indexer, batch)
+        finally:
+            watcher.close()
+        self.stdout.write('Watcher stopped')
+
+    def index(self, indexer, batch):
+        try:
+            result = indexer.process(batch)
+        except Exception as e:
+            # Milvus or Ollama being down must not stop the watcher; the files are picked up on restart
+            self.stdout.write(self.style.ERROR(f'Error indexing {len(batch)} file(s): {e}'))
+            return
+
+        for case_id, reason in result['skipped']:
+            self.stdout.write(self.style.WARNING(f'Skipped case {case_id}: {reason}'))
+        if result['renamed'] or result['indexed'] or result['removed']:
+            self.stdout.write(self.style.SUCCESS(
+                f"{result['renamed']} renamed, {result['indexed']} indexed, {result['removed']} removed"
+            ))
+
+    def request_stop(self, signum, frame):
+        self.stopping = True
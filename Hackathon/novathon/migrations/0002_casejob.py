@@ -0,0 +1,33 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('novathon', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CaseJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('summarize', 'Summarize'), ('extract', 'Extract text')], max_length=20)),
+                ('case_id', models.CharField(max_length=255)),
+                ('prompt_version', models.IntegerField(default=0)),
+                ('model', models.CharField(blank=True, max_length=100)),
+                ('status', models.CharField(choices=[('queued', 'Queued'), ('running', 'Running'), ('done', 'Done'), ('failed', 'Failed')], default='queued', max_length=20)),
+                ('result', models.JSONField(blank=True, null=True)),
+                ('error', models.TextField(blank=True)),
+                ('attempts', models.IntegerField(default=0)),
+                ('worker', models.CharField(blank=True, max_length=100)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['status', 'created_at'], name='case_job_status_created')],
+                'constraints': [models.UniqueConstraint(fields=('kind', 'case_id', 'prompt_version'), name='unique_case_job')],
+            },
+        ),
+    ]
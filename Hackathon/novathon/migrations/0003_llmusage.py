@@ -0,0 +1,32 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('novathon', '0002_casejob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LLMUsage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('task', models.CharField(max_length=50)),
+                ('model', models.CharField(max_length=100)),
+                ('prompt_version', models.IntegerField(default=0)),
+                ('outcome', models.CharField(choices=[('ok', 'OK'), ('error', 'Error')], default='ok', max_length=10)),
+                ('prompt_tokens', models.IntegerField(default=0)),
+                ('completion_tokens', models.IntegerField(default=0)),
+                ('queue_wait_ms', models.FloatField(default=0)),
+                ('time_to_first_token_ms', models.FloatField(blank=True, null=True)),
+                ('total_ms', models.FloatField(default=0)),
+                ('tokens_per_second', models.FloatField(blank=True, null=True)),
+                ('reloaded', models.BooleanField(default=False)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['created_at'], name='llm_usage_created')],
+            },
+        ),
+    ]
@@ -0,0 +1,21 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('novathon', '0003_llmusage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='casejob',
+            name='not_before',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='casejob',
+            name='source_version',
+            field=models.CharField(blank=True, max_length=64),
+        ),
+    ]
@@ -1,53 +1,27 @@
 import pandas as pd
-import ollama
-from pymilvus import Collection, CollectionSchema, FieldSchema, DataType, connections
+import os
+from pymilvus import Collection, CollectionSchema, FieldSchema, DataType, connections, utility
 import numpy as np
-
-class OllamaEmbedding:
-    def __init__(self, model_name='mxbai-embed-large'):
-        self.model_name = model_name
-    
-    def encode(self, texts):
-        """
-        Generate embeddings using Ollama
-        
-        :param texts: Single text or list of texts
-        :return: Embedding vector(s)
-        """
-        # Handle single text input
-        if isinstance(texts, str):
-            texts = [texts]
-        
-        embeddings = []
-        for text in texts:
-            response = ollama.embeddings(
-                model=self.model_name,
-                prompt=text
-            )
-            # Ensure the embedding is exactly 768 dimensions
-            embedding = response['embedding']
-            if len(embedding) != 768:
-                # Pad or truncate to exactly 768 dimensions
-                embedding = np.array(embedding)
-                if len(embedding) > 768:
-                    embedding = embedding[:768]
-                else:
-                    embedding = np.pad(embedding, (0, 768 - len(embedding)), mode='constant')
-            
-            embeddings.append(embedding.tolist())
-        
-        # Return single embedding if only one text, otherwise return list
-        return embeddings[0] if len(embeddings) == 1 else embeddings
+from novathon.embedders import fit_dimension, get_embedder
+from novathon.field_stats import STAT_FIELDS, FieldStats, stats_path
+from novathon.name_index import append_name_changes, reset_name_changes
+from novathon.index_planner import DEFAULT_PROFILE, plan_index, search_params_for
+from novathon.partitions import insert_partitioned, partition_loaded, year_partition, year_partitions
+from novathon.vector_store import DEFAULT_CASE_FILES_STORE, MmapVectorStore
 
 class CaseFileRAG:
-    def __init__(self, embedding_model='mxbai-embed-large'):
-        # Initialize Ollama embedding model
-        self.embedding_model = OllamaEmbedding(embedding_model)
+    def __init__(self, embedder=None, vector_store_path=DEFAULT_CASE_FILES_STORE, recreate=True):
+        # Initialize embedding backend (settings.EMBEDDER unless another Embedder is passed in)
+        self.embedding_model = embedder or get_embedder()
         
-        # Milvus connection and collection setup
-        self.setup_milvus_collection()
+        # Full-precision embeddings used for exact re-ranking
+        self.vector_store_path = vector_store_path
+        
+        # Milvus connection and collection setup; recreate=False keeps the
+        # existing collection for incremental updates
+        self.setup_milvus_collection(recreate=recreate)
     
-    def setup_milvus_collection(self):
+    def setup_milvus_collection(self, recreate=True):
         # Connect to Milvus
         connections.connect(host='localhost', port='19530')
         
@@ -66,6 +40,10 @@ class CaseFileRAG:
         
         schema = CollectionSchema(fields)
         
+        if not recreate and utility.has_collection('case_files'):
+            self.collection = Collection('case_files')
+            return
+        
         # Drop collection if it exists to avoid conflicts
         try:
             Collection('case_files').drop()
@@ -73,24 +51,28 @@ class CaseFileRAG:
             pass
         
         self.collection = Collection(name='case_files', schema=schema)
-        
-        # Create index
-        index_params = {
-            'metric_type': 'L2',
-            'index_type': 'IVF_FLAT',
-            'params': {'nlist': 1024}
-        }
+    
+    def build_index(self):
+        """Create the vector index sized for the rows currently in the collection"""
+        self.collection.flush()
+        index_params = plan_index(self.collection.num_entities, dim=768)
+        if self.collection.has_index():
+            self.collection.release()
+            self.collection.drop_index()
         self.collection.create_index(field_name='case_embedding', index_params=index_params)
     
     def load_case_files(self, case_files_path):
         # Read CSV file
         case_files_df = pd.read_csv(case_files_path)
         
-        # Generate embeddings for case details with keywords
+        # Generate full embeddings for case details with keywords; Milvus gets
+        # the 768-dim prefix, the vector store keeps the full vector
         case_files_df['combined_text'] = case_files_df['case_details'] + ' ' + case_files_df['keywords']
-        case_files_df['case_embedding'] = case_files_df['combined_text'].apply(
-            lambda x: self.embedding_model.encode(x)
+        full_embeddings = pd.Series(
+            self.embedding_model.encode(case_files_df['combined_text'].tolist(), dim=None),
+            index=case_files_df.index
         )
+        case_files_df['case_embedding'] = full_embeddings.apply(fit_dimension)
         
         # Verify embedding dimensions
         def validate_embedding(embedding):
@@ -110,9 +92,119 @@ class CaseFileRAG:
             'case_embedding': validate_embedding(row['case_embedding'])
         }, axis=1).tolist()
         
-        # Insert data
-        self.collection.insert(insert_data)
+        # Insert data into per-year partitions, then index it now that the collection size is known
+        insert_partitioned(self.collection, insert_data)
+        self.build_index()
         self.collection.load()
+        
+        if self.vector_store_path:
+            MmapVectorStore.write(self.vector_store_path, case_files_df['case_file_id'], full_embeddings.tolist())
+            # Value counts the searcher uses to spot highly selective filters;
+            # name indexes rescan the new collection instead of replaying changes
+            reset_name_changes(self.vector_store_path)
+            FieldStats.from_rows(insert_data).save(stats_path(self.vector_store_path))
+    
+    def upsert_case_files(self, rows):
+        """
+        Add or replace individual case files without rebuilding the collection
+        
+        Only the given rows are embedded. Milvus rows are deleted and
+        re-inserted (a case whose year changed moves partition), and the
+        vector store and field stats are updated to match.
+        
+        :param rows: Case dicts with the CSV columns (case_file_id, year, criminal_name,
+                     police_station, crime_type, case_details, keywords)
+        """
+        if not rows:
+            return
+        
+        texts = [f"{row['case_details']} {row['keywords']}" for row in rows]
+        full_embeddings = self.embedding_model.encode(texts, dim=None)
+        insert_data = [
+            {**row, 'case_file_id': int(row['case_file_id']), 'year': int(row['year']),
+             'case_embedding': fit_dimension(embedding)}
+            for row, embedding in zip(rows, full_embeddings)
+        ]
+        self.replace_rows([row['case_file_id'] for row in insert_data], insert_data, full_embeddings)
+    
+    def delete_case_files(self, case_file_ids):
+        """Remove case files from Milvus, the vector store and the field stats"""
+        if case_file_ids:
+            self.replace_rows([int(case_file_id) for case_file_id in case_file_ids], [], [])
+    
+    def previous_rows(self, case_file_ids, years=()):
+        """
+        Stored STAT_FIELDS values of the given ids, to take them out of the field stats
+        
+        Loading is server-wide, so partitions the searchers keep loaded are read
+        as they are and any other partition is loaded for one query and released
+        again; a batch never leaves more of the collection resident than before.
+        
+        :param case_file_ids: Ids to look up
+        :param years: Years the ids probably sit in (those of their new rows), tried first
+        :return: List of row dicts with case_file_id and STAT_FIELDS
+        """
+        id_list = ', '.join(str(case_file_id) for case_file_id in case_file_ids)
+        names = {p.name for p in self.collection.partitions}
+        loaded = {name for name in names if partition_loaded(self.collection, name)}
+        likely = {year_partition(year) for year in years} & names
+        
+        remaining = set(case_file_ids)
+        previous = []
+        for name in sorted(loaded) + sorted(likely - loaded) + sorted(names - loaded - likely):
+            if not remaining:
+                break
+            if name not in loaded:
+                self.collection.load(partition_names=[name])
+            try:
+                rows = self.collection.query(
+                    expr=f'case_file_id in [{id_list}]',
+                    partition_names=[name],
+                    output_fields=['case_file_id'] + list(STAT_FIELDS)
+                )
+            finally:
+                if name not in loaded:
+                    self.collection.partition(name).release()
+            previous.extend(rows)
+            remaining -= {row['case_file_id'] for row in rows}
+        return previous
+    
+    def replace_rows(self, case_file_ids, insert_data, full_embeddings):
+        """Delete the given ids everywhere, then insert the new rows and vectors in their place"""
+        id_list = ', '.join(str(case_file_id) for case_file_id in case_file_ids)
+        expr = f'case_file_id in [{id_list}]'
+        
+        # Old values are needed to take them out of the field stats
+        previous = self.previous_rows(case_file_ids, {row['year'] for row in insert_data})
+        if previous:
+            self.collection.delete(expr)
+        
+        existing_partitions = year_partitions(self.collection)
+        written = insert_partitioned(self.collection, insert_data) if insert_data else set()
+        
+        if not self.collection.has_index():
+            # First rows of a new collection; searchers load the years they keep
+            self.build_index()
+            if written:
+                self.collection.load(partition_names=sorted(written))
+        elif written - existing_partitions:
+            # A new year's partition has to be loaded before it is searchable
+            self.collection.load(partition_names=sorted(written - existing_partitions))
+        
+        if self.vector_store_path:
+            MmapVectorStore.update(
+                self.vector_store_path,
+                [row['case_file_id'] for row in insert_data],
+                full_embeddings,
+                removed_ids=case_file_ids
+            )
+            path = stats_path(self.vector_store_path)
+            stats = FieldStats.load(path) if os.path.exists(path) else FieldStats()
+            stats.remove(previous)
+            stats.add(insert_data)
+            # Journal first: the new stats version is what sends readers to it
+            append_name_changes(self.vector_store_path, previous, insert_data)
+            stats.save(path)
     
     def search_case_files(self, 
                            query=None, 
@@ -120,7 +212,8 @@ class CaseFileRAG:
                            criminal_name=None, 
                            police_station=None, 
                            crime_type=None, 
-                           top_k=5):
+                           top_k=5,
+                           profile=DEFAULT_PROFILE):
         """
         Search case files with multiple filtering options
         
@@ -130,13 +223,11 @@ class CaseFileRAG:
         :param police_station: Police station to filter
         :param crime_type: Type of crime to filter
         :param top_k: Number of top results to return
+        :param profile: 'recall' or 'latency' search profile
         :return: Retrieved case files
         """
         # Prepare search conditions
-        search_params = {
-            'metric_type': 'L2',
-            'params': {'nprobe': 10}
-        }
+        search_params = search_params_for(self.collection, 'case_embedding', top_k=top_k, profile=profile)
         
         # Build filter conditions
         bool_expr = []
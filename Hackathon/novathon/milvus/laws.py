@@ -1,9 +1,13 @@
 import csv
-import ollama
 from pymilvus import Collection, CollectionSchema, FieldSchema, DataType, connections, utility
+from novathon.embedders import get_embedder
+from novathon.index_planner import DEFAULT_PROFILE, plan_index, search_params_for
 
 class IPCRetriever:
-    def __init__(self, host='localhost', port='19530', collection_name='ipc_sections'):
+    def __init__(self, host='localhost', port='19530', collection_name='ipc_sections', embedder=None):
+        # Embedding backend (settings.EMBEDDER unless another Embedder is passed in)
+        self.embedder = embedder or get_embedder()
+        
         # Connect to Milvus
         connections.connect(host=host, port=port)
         
@@ -37,7 +41,6 @@ class IPCRetriever:
         offenses = []
         punishments = []
         sections = []
-        embeddings = []
         
         # Load data
         with open(csv_path, 'r', encoding='utf-8') as file:
@@ -46,15 +49,14 @@ class IPCRetriever:
                 # Truncate description
                 truncated_description = self.truncate_text(row['Description'])
                 
-                # Generate embedding using Ollama
-                embedding = ollama.embeddings(model='mxbai-embed-large', prompt=truncated_description)['embedding']
-                
                 # Append to lists
                 descriptions.append(truncated_description)
                 offenses.append(row['Offense'][:1000])
                 punishments.append(row['Punishment'][:1000])
                 sections.append(row['Section'][:100])
-                embeddings.append(embedding)
+        
+        # Generate all embeddings in one batch
+        embeddings = self.embedder.encode(descriptions, dim=None)
         
         # Prepare data for batch insertion
         data = [descriptions, offenses, punishments, sections, embeddings]
@@ -62,31 +64,30 @@ class IPCRetriever:
         # Insert data
         self.collection.insert(data)
         
-        # Create index for vector field
-        index_params = {
-            'metric_type': 'L2',
-            'index_type': 'HNSW',
-            'params': {'M': 8, 'efConstruction': 64}
-        }
-        self.collection.create_index(field_name='embedding', index_params=index_params)
-        
-        # Flush and load collection
-        self.collection.flush()
+        # Index and load collection
+        self.build_index()
         self.collection.load()
 
-    def search_sections(self, query, top_k=3):
+    def build_index(self):
+        """Create the vector index sized for the rows currently in the collection"""
+        # Flush first so the planner sees the real row count
+        self.collection.flush()
+        index_params = plan_index(self.collection.num_entities, dim=1024)
+        if self.collection.has_index():
+            self.collection.release()
+            self.collection.drop_index()
+        self.collection.create_index(field_name='embedding', index_params=index_params)
+
+    def search_sections(self, query, top_k=3, profile=DEFAULT_PROFILE):
         """Retrieve most similar IPC sections based on query"""
         # Ensure collection is loaded
         self.collection.load()
         
         # Generate embedding for query
-        query_embedding = ollama.embeddings(model='mxbai-embed-large', prompt=query)['embedding']
+        query_embedding = self.embedder.encode(query, dim=None)
         
         # Search in Milvus
-        search_params = {
-            'metric_type': 'L2',
-            'params': {'ef': 64}
-        }
+        search_params = search_params_for(self.collection, 'embedding', top_k=top_k, profile=profile)
         results = self.collection.search(
             data=[query_embedding], 
             anns_field='embedding', 
@@ -0,0 +1,28 @@
+"""
+pymilvus entry points for the request path, imported on first use
+
+pymilvus pulls in grpc and protobuf, so importing it at module level made
+every manage.py command pay for it through urls.py -> views.py. The load-test
+fakes replace connect/disconnect/open_collection on this module.
+"""
+MILVUS_HOST = 'localhost'
+MILVUS_PORT = '19530'
+
+
+def connect(host=MILVUS_HOST, port=MILVUS_PORT):
+    from pymilvus import connections
+
+    connections.connect(host=host, port=port)
+
+
+def disconnect(alias='default'):
+    from pymilvus import connections
+
+    connections.disconnect(alias)
+
+
+def open_collection(name):
+    """Existing collection by name"""
+    from pymilvus import Collection
+
+    return Collection(name)
@@ -8,3 +8,74 @@ class RenamedCaseFile(models.Model):
     def __str__(self):
         return f"Case {self.case_id}: {self.file_path}"
 
+
+class CaseJob(models.Model):
+    KIND_SUMMARIZE = 'summarize'
+    KIND_EXTRACT = 'extract'
+    KIND_CHOICES = [(KIND_SUMMARIZE, 'Summarize'), (KIND_EXTRACT, 'Extract text')]
+
+    STATUS_QUEUED = 'queued'
+    STATUS_RUNNING = 'running'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_QUEUED, 'Queued'),
+        (STATUS_RUNNING, 'Running'),
+        (STATUS_DONE, 'Done'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    case_id = models.CharField(max_length=255)
+    prompt_version = models.IntegerField(default=0)  # 0 for jobs that use no prompt
+    model = models.CharField(max_length=100, blank=True)  # LLM the job needs, used to group work by model
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_QUEUED)
+    result = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    attempts = models.IntegerField(default=0)
+    worker = models.CharField(max_length=100, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    not_before = models.DateTimeField(null=True, blank=True)  # A failed attempt is retried after this
+    source_version = models.CharField(max_length=64, blank=True)  # Size/mtime of the case file the result was built from
+
+    class Meta:
+        constraints = [
+            # One job per case and prompt version; resubmitting returns the existing job
+            models.UniqueConstraint(fields=['kind', 'case_id', 'prompt_version'], name='unique_case_job'),
+        ]
+        indexes = [
+            models.Index(fields=['status', 'created_at'], name='case_job_status_created'),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} job for case {self.case_id}: {self.status}"
+
+
+class LLMUsage(models.Model):
+    """One chat model call; rows are only ever appended (see manage.py llm_usage)"""
+    OUTCOME_OK = 'ok'
+    OUTCOME_ERROR = 'error'
+    OUTCOME_CHOICES = [(OUTCOME_OK, 'OK'), (OUTCOME_ERROR, 'Error')]
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    task = models.CharField(max_length=50)  # Key of settings.LLM['MODELS']
+    model = models.CharField(max_length=100)
+    prompt_version = models.IntegerField(default=0)
+    outcome = models.CharField(max_length=10, choices=OUTCOME_CHOICES, default=OUTCOME_OK)
+    prompt_tokens = models.IntegerField(default=0)  # Tokens Ollama evaluated (cached prefixes excluded)
+    completion_tokens = models.IntegerField(default=0)
+    queue_wait_ms = models.FloatField(default=0)  # Time spent waiting for an LLM slot
+    time_to_first_token_ms = models.FloatField(null=True, blank=True)
+    total_ms = models.FloatField(default=0)  # Wall-clock time of the Ollama call
+    tokens_per_second = models.FloatField(null=True, blank=True)  # Completion tokens over generation time
+    reloaded = models.BooleanField(default=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_at'], name='llm_usage_created'),
+        ]
+
+    def __str__(self):
+        return f"{self.task} on {self.model}: {self.outcome}"
@@ -0,0 +1,355 @@
+import bisect
+import json
+import logging
+import os
+import re
+import threading
+import uuid
+from collections import Counter, defaultdict
+
+logger = logging.getLogger(__name__)
+
+NAME_FIELDS = ('criminal_name', 'police_station')
+NAME_MATCH_MODES = ('exact', 'prefix', 'fuzzy')
+
+# Minimum trigram Jaccard similarity for a fuzzy match (pg_trgm uses 0.3)
+FUZZY_THRESHOLD = 0.3
+
+NON_WORD = re.compile(r'[^a-z0-9]+')
+
+
+def normalize(value):
+    return NON_WORD.sub(' ', str(value).lower()).strip()
+
+
+def trigrams(value):
+    """pg_trgm-style trigrams: each word padded with two leading and one trailing space"""
+    grams = set()
+    for word in value.split():
+        padded = f'  {word} '
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+class TrigramIndex:
+    """
+    In-memory trigram and prefix index from string values to row ids
+
+    Values are deduplicated, so a police station shared by thousands of
+    cases is indexed once and its id set is returned as a whole.
+    """
+
+    def __init__(self):
+        self.ids_by_value = defaultdict(set)
+        self.values_by_gram = defaultdict(set)
+        self.gram_counts = {}
+        self.sorted_values = []
+        # Stored spellings behind each normalized value, with their row counts
+        self.raw_values = defaultdict(Counter)
+
+    def add(self, raw_value, row_id, keep_sorted=True):
+        """
+        :param keep_sorted: Insert into sorted_values now; bulk loads pass False
+                            and call sort() once at the end
+        """
+        value = normalize(raw_value)
+        if not value:
+            return
+        if value not in self.ids_by_value:
+            grams = trigrams(value)
+            for gram in grams:
+                self.values_by_gram[gram].add(value)
+            self.gram_counts[value] = len(grams)
+            if keep_sorted:
+                bisect.insort(self.sorted_values, value)
+            else:
+                self.sorted_values.append(value)
+        if row_id not in self.ids_by_value[value]:
+            self.ids_by_value[value].add(row_id)
+            self.raw_values[value][raw_value] += 1
+
+    def sort(self):
+        self.sorted_values.sort()
+
+    def remove(self, raw_value, row_id):
+        value = normalize(raw_value)
+        ids = self.ids_by_value.get(value)
+        if ids is None or row_id not in ids:
+            return
+        ids.discard(row_id)
+        raw = self.raw_values[value]
+        raw[raw_value] -= 1
+        if raw[raw_value] <= 0:
+            del raw[raw_value]
+        if not ids:
+            del self.raw_values[value]
+            del self.ids_by_value[value]
+            for gram in trigrams(value):
+                self.values_by_gram[gram].discard(value)
+            del self.gram_counts[value]
+            position = bisect.bisect_left(self.sorted_values, value)
+            if position < len(self.sorted_values) and self.sorted_values[position] == value:
+                del self.sorted_values[position]
+
+    def exact_values(self, query):
+        query = normalize(query)
+        return {query} if query in self.ids_by_value else set()
+
+    def prefix_values(self, query):
+        """Normalized values starting with the query"""
+        query = normalize(query)
+        values = set()
+        if not query:
+            return values
+        start = bisect.bisect_left(self.sorted_values, query)
+        for value in self.sorted_values[start:]:
+            if not value.startswith(query):
+                break
+            values.add(value)
+        return values
+
+    def fuzzy_values(self, query, threshold=FUZZY_THRESHOLD):
+        """Normalized values sharing enough trigrams with the query (tolerates typos and partial names)"""
+        query_grams = trigrams(normalize(query))
+        if not query_grams:
+            return set()
+
+        shared = defaultdict(int)
+        for gram in query_grams:
+            for value in self.values_by_gram.get(gram, ()):
+                shared[value] += 1
+
+        return {
+            value for value, common in shared.items()
+            if common / (len(query_grams) + self.gram_counts[value] - common) >= threshold
+        }
+
+    def matching_values(self, query, mode):
+        if mode == 'prefix':
+            return self.prefix_values(query)
+        if mode == 'fuzzy':
+            # A prefix hit is always a match, even when the query is too short to score well
+            return self.fuzzy_values(query) | self.prefix_values(query)
+        return self.exact_values(query)
+
+    def lookup(self, query, mode):
+        """Ids of the rows whose value matches"""
+        ids = set()
+        for value in self.matching_values(query, mode):
+            ids.update(self.ids_by_value[value])
+        return ids
+
+    def raw_matches(self, query, mode):
+        """Stored spellings of the matching values, for an `in [...]` filter"""
+        return {raw for value in self.matching_values(query, mode) for raw in self.raw_values[value]}
+
+
+class CaseNameIndex:
+    """Trigram indexes over case_files.criminal_name and police_station"""
+
+    def __init__(self):
+        self.fields = {field: TrigramIndex() for field in NAME_FIELDS}
+        self.lock = threading.Lock()
+
+    def add_rows(self, rows, keep_sorted=True):
+        with self.lock:
+            for row in rows:
+                for field, index in self.fields.items():
+                    index.add(row[field], int(row['case_file_id']), keep_sorted)
+
+    def remove_rows(self, rows):
+        with self.lock:
+            for row in rows:
+                for field, index in self.fields.items():
+                    index.remove(row[field], int(row['case_file_id']))
+
+    def candidates(self, field, query, mode='fuzzy'):
+        """
+        Case file ids whose field matches the query
+
+        :param field: 'criminal_name' or 'police_station'
+        :param query: User-typed value
+        :param mode: 'exact', 'prefix' or 'fuzzy'
+        :return: Set of case_file_ids
+        """
+        with self.lock:
+            return self.fields[field].lookup(query, mode)
+
+    def matching_values(self, field, query, mode='fuzzy'):
+        """Stored values of the field that match the query"""
+        with self.lock:
+            return self.fields[field].raw_matches(query, mode)
+
+    @classmethod
+    def from_collection(cls, collection, batch_size=5000):
+        """Build from a scalar scan of the collection (names only, no vectors)"""
+        index = cls()
+        iterator = collection.query_iterator(batch_size=batch_size, output_fields=['case_file_id'] + list(NAME_FIELDS))
+        try:
+            while True:
+                rows = iterator.next()
+                if not rows:
+                    break
+                index.add_rows(rows, keep_sorted=False)
+        finally:
+            iterator.close()
+        for field_index in index.fields.values():
+            field_index.sort()
+        return index
+
+
+# Journal of name changes made by incremental updates (manage.py watch_case_files),
+# kept next to the field stats. Its first line holds an epoch that changes
+# whenever the collection is rebuilt from scratch.
+CHANGES_FILE = 'name_changes.jsonl'
+
+
+def changes_path(store_dir):
+    return os.path.join(store_dir, CHANGES_FILE)
+
+
+def reset_name_changes(store_dir):
+    """Start a new journal; call before saving the field stats of a full ingestion"""
+    os.makedirs(store_dir, exist_ok=True)
+    tmp_path = changes_path(store_dir) + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(json.dumps({'epoch': uuid.uuid4().hex}) + '\n')
+    os.replace(tmp_path, changes_path(store_dir))
+
+
+def append_name_changes(store_dir, removed, added):
+    """
+    Record rows taken out of and put into the collection
+
+    Must be written before the field stats are saved: a new stats version is
+    what makes readers look at the journal.
+
+    :param removed: Row dicts with case_file_id and the NAME_FIELDS
+    :param added: Same, for the new rows
+    """
+    path = changes_path(store_dir)
+    if not os.path.exists(path):
+        reset_name_changes(store_dir)
+
+    def names(rows):
+        return [[int(row['case_file_id'])] + [row[field] for field in NAME_FIELDS] for row in rows]
+
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write(json.dumps({'removed': names(removed), 'added': names(added)}) + '\n')
+
+
+def read_epoch(path):
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.loads(f.readline()).get('epoch')
+    except (OSError, ValueError):
+        return None
+
+
+def replay_name_changes(index, path, offset):
+    """
+    Apply journal entries written after offset to the index
+
+    Only complete lines are read, so an entry still being written is picked up
+    next time.
+
+    :return: Offset after the last applied entry
+    """
+    with open(path, 'rb') as f:
+        f.seek(offset)
+        for line in f:
+            if not line.endswith(b'\n'):
+                break
+            offset += len(line)
+            entry = json.loads(line)
+            for key, apply in (('removed', index.remove_rows), ('added', index.add_rows)):
+                apply([dict(zip(('case_file_id',) + NAME_FIELDS, values)) for values in entry.get(key, ())])
+    return offset
+
+
+class _IndexState:
+    """The shared index and the field stats version and journal position it reflects"""
+
+    def __init__(self):
+        self.index = None
+        self.version = None
+        self.epoch = None
+        self.offset = 0
+        self.rebuilding = False
+
+
+_state = _IndexState()
+_index_lock = threading.Lock()
+_build_lock = threading.Lock()
+
+
+def _stats_version(version_path):
+    from .field_stats import open_field_stats
+
+    stats = open_field_stats(version_path) if version_path else None
+    return stats.version if stats is not None else None
+
+
+def _rebuild(collection, version_path):
+    """Scan the collection into a new index and swap it in"""
+    journal = changes_path(os.path.dirname(version_path)) if version_path else None
+    # Journal entries written during the scan are replayed afterwards; adds and
+    # removes are idempotent, so overlapping with the scan does no harm
+    version = _stats_version(version_path)
+    epoch = read_epoch(journal) if journal else None
+    offset = os.path.getsize(journal) if epoch else 0
+
+    index = CaseNameIndex.from_collection(collection)
+    with _index_lock:
+        _state.index, _state.version, _state.epoch, _state.offset = index, version, epoch, offset
+
+
+def _rebuild_in_background(collection, version_path):
+    try:
+        _rebuild(collection, version_path)
+    except Exception:
+        logger.exception('Rebuilding the name index failed')
+    finally:
+        with _index_lock:
+            _state.rebuilding = False
+
+
+def get_name_index(collection, version_path=None):
+    """
+    Process-wide name index, built on first use
+
+    When the field stats version changes, incremental updates are replayed
+    from the name journal. Only a full re-ingestion (a new journal epoch)
+    rescans the collection, in a background thread while the previous index
+    keeps answering.
+
+    :param collection: case_files Collection to scan when (re)building
+    :param version_path: Field stats file; every ingestion writes a new version
+    """
+    if _state.index is None:
+        # Nothing to serve yet: the first caller builds, the others wait
+        with _build_lock:
+            if _state.index is None:
+                _rebuild(collection, version_path)
+        return _state.index
+
+    version = _stats_version(version_path)
+    with _index_lock:
+        if version == _state.version:
+            return _state.index
+
+        journal = changes_path(os.path.dirname(version_path)) if version_path else None
+        epoch = read_epoch(journal) if journal else None
+        if epoch is not None and epoch == _state.epoch and os.path.getsize(journal) >= _state.offset:
+            _state.offset = replay_name_changes(_state.index, journal, _state.offset)
+            _state.version = version
+            return _state.index
+
+        if not _state.rebuilding:
+            _state.rebuilding = True
+            threading.Thread(
+                target=_rebuild_in_background, args=(collection, version_path),
+                name='novathon-name-index', daemon=True
+            ).start()
+        # Slightly stale answers until the rebuild is swapped in
+        return _state.index
@@ -0,0 +1,112 @@
+import threading
+from collections import OrderedDict, defaultdict
+
+# case_files is split into one partition per year. Year filters then become
+# partition pruning instead of a post-filter, and old years can stay released.
+# (A partition key on police_station/crime_type would prune too, but Milvus
+# cannot load or release partition-key partitions individually.)
+PARTITION_FIELD = 'year'
+PARTITION_PREFIX = 'year_'
+
+
+def year_partition(year):
+    """Partition name holding a year's cases, e.g. year_2024"""
+    return f'{PARTITION_PREFIX}{int(year)}'
+
+
+def year_partitions(collection):
+    """Names of the year partitions that currently exist on the collection"""
+    return {p.name for p in collection.partitions if p.name.startswith(PARTITION_PREFIX)}
+
+
+def partition_loaded(collection, name):
+    """Whether a partition is loaded on the server (by this process or any other)"""
+    from pymilvus import utility
+    from pymilvus.client.types import LoadState
+
+    return utility.load_state(collection.name, partition_names=[name]) == LoadState.Loaded
+
+
+def insert_partitioned(collection, rows):
+    """
+    Insert row dicts, routing each one to its year partition
+
+    :param collection: pymilvus Collection
+    :param rows: List of row dicts containing a 'year' value
+    :return: Names of the partitions written to
+    """
+    groups = defaultdict(list)
+    for row in rows:
+        groups[year_partition(row[PARTITION_FIELD])].append(row)
+
+    existing = year_partitions(collection)
+    for name, group in groups.items():
+        if name not in existing:
+            collection.create_partition(name)
+        collection.insert(group, partition_name=name)
+
+    return set(groups)
+
+
+def load_partitions(collection, years=None):
+    """
+    Load the collection, or only the given years' partitions
+
+    :param collection: pymilvus Collection
+    :param years: Years to keep resident; None loads everything
+    :return: Set of partition names loaded (None when the whole collection is)
+    """
+    if years is None:
+        collection.load()
+        return None
+
+    names = [year_partition(year) for year in years]
+    names = [name for name in names if name in year_partitions(collection)]
+    # _default holds rows ingested before partitioning existed
+    names.append('_default')
+    collection.load(partition_names=names)
+    return set(names)
+
+
+class OnDemandPartitions:
+    """
+    Year partitions loaded on demand, on top of the preloaded years
+
+    Searches lease the partitions they read. Once more than max_loaded are
+    resident, the least recently used ones no search is reading are released
+    again, so year-filtered searches over old years do not end up loading the
+    whole collection.
+    """
+
+    def __init__(self, collection, max_loaded):
+        self.collection = collection
+        self.max_loaded = max_loaded
+        # name -> number of searches reading it, least recently used first
+        self.leases = OrderedDict()
+        self.lock = threading.Lock()
+
+    def acquire(self, names):
+        """Load the partitions if needed and lease them to one search"""
+        with self.lock:
+            for name in names:
+                if name not in self.leases:
+                    self.collection.load(partition_names=[name])
+                    self.leases[name] = 0
+                self.leases.move_to_end(name)
+                self.leases[name] += 1
+            self._evict()
+
+    def release(self, names):
+        """Return the leases taken by acquire()"""
+        with self.lock:
+            for name in names:
+                self.leases[name] -= 1
+            self._evict()
+
+    def _evict(self):
+        for name in list(self.leases):
+            if len(self.leases) <= self.max_loaded:
+                break
+            if self.leases[name] == 0:
+                self.collection.partition(name).release()
+                del self.leases[name]
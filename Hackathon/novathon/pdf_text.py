@@ -0,0 +1,20 @@
+import os
+
+def extract_text_from_pdf(file_path):
+    """
+    Extract text from a PDF file.
+    """
+    if not os.path.exists(file_path):
+        return None, f"File not found: {file_path}"
+    
+    # PyPDF2 is only needed once a file is actually read
+    from PyPDF2 import PdfReader
+
+    try:
+        reader = PdfReader(file_path)
+        text = ""
+        for page in reader.pages:
+            text += page.extract_text()  # Extract text from each page
+        return text.strip(), None
+    except Exception as e:
+        return None, str(e)
@@ -0,0 +1,123 @@
+import hmac
+import os
+import random
+import re
+import time
+import uuid
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+from .deadlines import run_stages_inline
+
+PROFILERS = ('cprofile', 'pyinstrument')
+
+# Request ids end up in file names, so anything else is replaced
+UNSAFE_ID_CHARS = re.compile(r'[^A-Za-z0-9_.-]+')
+
+
+def request_id(request):
+    """The caller's X-Request-ID when it has one, otherwise a fresh id"""
+    supplied = UNSAFE_ID_CHARS.sub('', request.headers.get('X-Request-ID', ''))[:64]
+    return supplied or uuid.uuid4().hex
+
+
+class ProfilingMiddleware:
+    """
+    Profile selected requests and dump one file per request
+
+    Configured by settings.REQUEST_PROFILING. A request is profiled when it
+    carries the configured X-Profile-Token or falls in the sampling rate, and
+    its path starts with one of PATHS. cProfile writes a .prof file (view it
+    with snakeviz or flameprof); pyinstrument writes a speedscope flame graph.
+    Both only sample the request thread, so a profiled request runs its
+    /legal-analysis/ stages and summarize map-reduce inline on that thread
+    instead of the worker pools (and without stage time limits); its
+    profile then shows the embedding, search and LLM calls themselves.
+    When profiling is disabled Django drops the middleware at startup, so
+    ordinary requests pay nothing.
+    """
+
+    def __init__(self, get_response):
+        config = getattr(settings, 'REQUEST_PROFILING', {})
+        self.token = config.get('TOKEN')
+        self.sample_rate = config.get('SAMPLE_RATE', 0.0)
+        if not config.get('ENABLED') or (not self.token and self.sample_rate <= 0):
+            raise MiddlewareNotUsed('Request profiling is disabled')
+
+        self.profiler = config.get('PROFILER', 'cprofile')
+        if self.profiler not in PROFILERS:
+            raise ValueError(f"Unknown profiler '{self.profiler}'")
+        if self.profiler == 'pyinstrument':
+            import pyinstrument  # noqa: F401 - fail at startup rather than on the first profiled request
+
+        self.output_dir = config['DIR']
+        self.paths = tuple(config.get('PATHS') or ('/',))
+        os.makedirs(self.output_dir, exist_ok=True)
+        self.get_response = get_response
+
+    def should_profile(self, request):
+        if not request.path.startswith(self.paths):
+            return False
+        supplied = request.headers.get('X-Profile-Token')
+        if self.token and supplied and hmac.compare_digest(supplied, self.token):
+            return True
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def __call__(self, request):
+        if not self.should_profile(request):
+            return self.get_response(request)
+
+        profile_id = request_id(request)
+        if self.profiler == 'pyinstrument':
+            response, file_name = self.run_pyinstrument(request, profile_id)
+        else:
+            response, file_name = self.run_cprofile(request, profile_id)
+
+        if file_name:
+            response['X-Profile-Id'] = profile_id
+        return response
+
+    def output_path(self, request, profile_id, suffix):
+        slug = UNSAFE_ID_CHARS.sub('_', request.path.strip('/')) or 'root'
+        stamp = time.strftime('%Y%m%dT%H%M%S')
+        return os.path.join(self.output_dir, f'{stamp}-{slug}-{profile_id}{suffix}')
+
+    def run_cprofile(self, request, profile_id):
+        import cProfile
+
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Another request in this process is already being profiled
+            return self.get_response(request), None
+        try:
+            with run_stages_inline():
+                response = self.get_response(request)
+        finally:
+            profiler.disable()
+
+        path = self.output_path(request, profile_id, '.prof')
+        profiler.dump_stats(path)
+        return response, path
+
+    def run_pyinstrument(self, request, profile_id):
+        from pyinstrument import Profiler
+        from pyinstrument.renderers import SpeedscopeRenderer
+
+        profiler = Profiler(async_mode='disabled')
+        try:
+            profiler.start()
+        except RuntimeError:
+            return self.get_response(request), None
+        try:
+            with run_stages_inline():
+                response = self.get_response(request)
+        finally:
+            profiler.stop()
+
+        path = self.output_path(request, profile_id, '.speedscope.json')
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(profiler.output(renderer=SpeedscopeRenderer()))
+        return response, path
@@ -0,0 +1,70 @@
+"""
+Prompt templates for the chat models
+
+Static instructions live in system prompts that are byte-for-byte identical
+across requests, and the per-request parts (question, context) come last.
+Ollama keeps the evaluated tokens of the previous request per model, so a
+request that shares the system-prompt prefix only evaluates its new tokens.
+Bump PROMPT_VERSION whenever a template changes, so cached results made with
+an older prompt are not reused.
+"""
+
+PROMPT_VERSION = 3
+
+LEGAL_ADVISOR_SYSTEM_PROMPT = """You are a seasoned legal advisor with expertise in interpreting and referencing legal provisions, specializing in providing accurate and concise guidance on matters related to the Indian Penal Code (IPC).
+
+Guidelines:
+Scope of Advice:
+
+Address only queries related to the Indian Penal Code (IPC) sections provided in the context.
+If a query falls outside the IPC or your scope of expertise, state clearly: "My specialization is limited to legal advice on IPC-related matters."
+Integrity of Response:
+
+If unsure about a particular question, respond with: "I don't know," rather than providing inaccurate information.
+Input Format:
+
+Question: the user's question
+Context: IPC sections and their descriptions.
+Response Instructions:
+
+Focus solely on the legal aspects relevant to the provided IPC section.
+Ensure the advice is concise, precise, and devoid of extraneous details or unrelated information.
+"""
+
+SUMMARIZER_SYSTEM_PROMPT = """Summarize the given FIR crime details.
+
+Instructions: Provide only the summary. Ensure the sentence is concise, clear, and accurately reflects the key details of the FIR crime."""
+
+
+def legal_analysis_prompt(query, context):
+    """
+    Per-request part of a legal analysis prompt
+
+    :param query: User's question
+    :param context: IPC section context
+    """
+    return f"Question: {query}\nContext: {context}"
+
+
+def summary_prompt(context):
+    """Per-request part of an FIR summary prompt"""
+    return f"Context: {context}"
+
+REDUCE_SYSTEM_PROMPT = """Combine the given partial summaries of one FIR into a single summary.
+
+Instructions: Provide only the summary. Keep every distinct fact (parties, place, date, offence, property, police action) once, drop repetition, and keep it concise and clear."""
+
+MULTI_CASE_REDUCE_SYSTEM_PROMPT = """Combine the given summaries of related FIR cases into one overview.
+
+Instructions: Provide only the overview. Refer to each case by its case ID, state what the cases have in common and where they differ, and keep it concise and clear."""
+
+
+def reduce_prompt(summaries, labels=None):
+    """
+    Per-request part of a reduce prompt
+
+    :param summaries: Partial summaries, in order
+    :param labels: Optional label per summary (e.g. 'Case 12')
+    """
+    labels = labels or [f'Part {position}' for position in range(1, len(summaries) + 1)]
+    return '\n\n'.join(f'{label}: {summary}' for label, summary in zip(labels, summaries))
@@ -0,0 +1,275 @@
+import hashlib
+import json
+import os
+import shutil
+from datetime import datetime, timezone
+
+import numpy as np
+
+from .field_stats import FieldStats, stats_path
+from .knn_graph import remove_knn_graph
+from .name_index import reset_name_changes
+from .partitions import insert_partitioned
+from .vector_store import IDS_FILE, VECTORS_FILE, MmapVectorStore, store_files_dir
+
+SNAPSHOT_FORMAT_VERSION = 1
+
+MANIFEST_FILE = 'manifest.json'
+METADATA_FILE = 'metadata.parquet'
+SNAPSHOT_VECTORS_FILE = 'vectors.npy'
+FULL_VECTORS_DIR = 'full_vectors'
+
+# Collections we know how to snapshot, and which of their fields are special.
+# vector_store: the collection's full-precision vectors (and the kNN graph
+# built from them) live in the vector store passed to import_snapshot
+SNAPSHOT_COLLECTIONS = {
+    'case_files': {
+        'vector_field': 'case_embedding',
+        'primary_field': 'case_file_id',
+        'auto_id': False,
+        'partitioned': True,
+        'vector_store': True,
+    },
+    'ipc_sections': {
+        'vector_field': 'embedding',
+        'primary_field': 'id',
+        'auto_id': True,
+        'partitioned': False,
+        'vector_store': False,
+    },
+}
+
+# Keep each insert RPC comfortably below Milvus' 64MB gRPC message limit
+INSERT_BATCH_BYTES = 32 * 1024 * 1024
+
+
+class SnapshotError(Exception):
+    pass
+
+
+def file_sha256(path, chunk_size=1024 * 1024):
+    """Hash a file in fixed-size chunks so large vector files never sit in memory"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _collection_spec(collection_name):
+    try:
+        return SNAPSHOT_COLLECTIONS[collection_name]
+    except KeyError:
+        raise SnapshotError(
+            f"Don't know how to snapshot '{collection_name}', expected one of {sorted(SNAPSHOT_COLLECTIONS)}"
+        )
+
+
+def export_collection(collection, snapshot_dir, model_name, batch_size=5000, vector_store_path=None):
+    """
+    Export a live collection (vectors and scalar fields) to a snapshot directory
+
+    :param collection: Loaded pymilvus Collection
+    :param snapshot_dir: Directory to write the snapshot into
+    :param model_name: Embedding model that produced the vectors
+    :param batch_size: Rows pulled from Milvus per query_iterator batch
+    :param vector_store_path: Optional full-precision vector store to include
+    :return: The manifest dict
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    spec = _collection_spec(collection.name)
+    vector_field = spec['vector_field']
+    dim = next(f.params['dim'] for f in collection.schema.fields if f.name == vector_field)
+    scalar_fields = [f.name for f in collection.schema.fields if f.name != vector_field]
+
+    os.makedirs(snapshot_dir, exist_ok=True)
+    metadata_path = os.path.join(snapshot_dir, METADATA_FILE)
+    vectors_path = os.path.join(snapshot_dir, SNAPSHOT_VECTORS_FILE)
+
+    # Stream rows out of Milvus straight into the parquet writer and a
+    # preallocated memmap, so memory stays at one batch
+    collection.flush()
+    capacity = collection.num_entities
+    vectors = np.lib.format.open_memmap(vectors_path, mode='w+', dtype=np.float32, shape=(capacity, dim))
+    writer = None
+    num_rows = 0
+
+    iterator = collection.query_iterator(batch_size=batch_size, output_fields=scalar_fields + [vector_field])
+    try:
+        while True:
+            rows = iterator.next()
+            if not rows:
+                break
+            if num_rows + len(rows) > capacity:
+                raise SnapshotError("Collection grew during export; retry once ingestion has stopped")
+
+            vectors[num_rows:num_rows + len(rows)] = [row[vector_field] for row in rows]
+            table = pa.Table.from_pydict({name: [row[name] for row in rows] for name in scalar_fields})
+            if writer is None:
+                writer = pq.ParquetWriter(metadata_path, table.schema, compression='zstd')
+            writer.write_table(table)
+            num_rows += len(rows)
+    finally:
+        iterator.close()
+        if writer is not None:
+            writer.close()
+
+    vectors.flush()
+    del vectors
+    if num_rows != capacity:
+        # Deleted rows still count towards num_entities; trim the padding
+        trimmed = np.load(vectors_path, mmap_mode='r')[:num_rows].copy()
+        np.save(vectors_path, trimmed)
+    if writer is None:
+        pq.write_table(pa.Table.from_pydict({name: [] for name in scalar_fields}), metadata_path)
+
+    files = [METADATA_FILE, SNAPSHOT_VECTORS_FILE]
+    store_dir = store_files_dir(vector_store_path) if vector_store_path else None
+    if store_dir is not None:
+        os.makedirs(os.path.join(snapshot_dir, FULL_VECTORS_DIR), exist_ok=True)
+        for file_name in (IDS_FILE, VECTORS_FILE):
+            shutil.copyfile(os.path.join(store_dir, file_name),
+                            os.path.join(snapshot_dir, FULL_VECTORS_DIR, file_name))
+            files.append(f'{FULL_VECTORS_DIR}/{file_name}')
+
+    manifest = {
+        'format_version': SNAPSHOT_FORMAT_VERSION,
+        'collection': collection.name,
+        'model': model_name,
+        'dim': dim,
+        'vector_field': vector_field,
+        'primary_field': spec['primary_field'],
+        'num_rows': num_rows,
+        'created_at': datetime.now(timezone.utc).isoformat(),
+        'files': {name: file_sha256(os.path.join(snapshot_dir, name)) for name in files},
+    }
+    with open(os.path.join(snapshot_dir, MANIFEST_FILE), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+
+    return manifest
+
+
+def read_manifest(snapshot_dir, verify=True):
+    """
+    Load a snapshot manifest, optionally checking every file against its hash
+
+    :raises SnapshotError: If the manifest is missing, unsupported or a hash does not match
+    """
+    manifest_path = os.path.join(snapshot_dir, MANIFEST_FILE)
+    if not os.path.exists(manifest_path):
+        raise SnapshotError(f"No {MANIFEST_FILE} in {snapshot_dir}")
+
+    with open(manifest_path, encoding='utf-8') as f:
+        manifest = json.load(f)
+
+    if manifest.get('format_version') != SNAPSHOT_FORMAT_VERSION:
+        raise SnapshotError(f"Unsupported snapshot format version {manifest.get('format_version')}")
+
+    if verify:
+        for name, expected in manifest['files'].items():
+            actual = file_sha256(os.path.join(snapshot_dir, name))
+            if actual != expected:
+                raise SnapshotError(f"Hash mismatch for {name}: snapshot is corrupt or was modified")
+
+    return manifest
+
+
+def _create_collection(collection_name):
+    """Recreate an empty collection through the class that owns its schema"""
+    if collection_name == 'case_files':
+        from novathon.milvus.insert import CaseFileRAG
+        owner = CaseFileRAG(vector_store_path=None)
+    else:
+        from novathon.milvus.laws import IPCRetriever
+        owner = IPCRetriever(collection_name=collection_name)
+    return owner
+
+
+def import_snapshot(snapshot_dir, batch_size=None, verify=True, vector_store_path=None, expected_model=None):
+    """
+    Recreate a collection from a snapshot with large batched inserts
+
+    :param snapshot_dir: Directory written by export_collection
+    :param batch_size: Rows per insert call (defaults to ~32MB of vectors)
+    :param verify: Check file hashes before touching Milvus
+    :param vector_store_path: Where to restore the full-precision vector store, if the snapshot has one;
+                              a case_files snapshot without one removes the existing store and
+                              kNN graph, which would otherwise score against the old corpus
+    :param expected_model: Refuse snapshots produced by a different embedding model
+    :return: The manifest dict
+    """
+    import pyarrow.parquet as pq
+
+    manifest = read_manifest(snapshot_dir, verify=verify)
+    if expected_model and manifest['model'] != expected_model:
+        raise SnapshotError(
+            f"Snapshot was embedded with '{manifest['model']}', but '{expected_model}' is configured"
+        )
+
+    spec = _collection_spec(manifest['collection'])
+    vectors = np.load(os.path.join(snapshot_dir, SNAPSHOT_VECTORS_FILE), mmap_mode='r')
+    if vectors.shape != (manifest['num_rows'], manifest['dim']):
+        raise SnapshotError(f"Vector file has shape {vectors.shape}, manifest expects "
+                            f"({manifest['num_rows']}, {manifest['dim']})")
+
+    if batch_size is None:
+        batch_size = max(INSERT_BATCH_BYTES // (manifest['dim'] * 4), 1)
+
+    # Vectors of the corpus being replaced must not outlive it: re-ranking and
+    # similar cases fall back or report unavailable until they are rebuilt
+    if not spec['vector_store']:
+        vector_store_path = None
+    if vector_store_path:
+        remove_knn_graph(vector_store_path)
+        if not os.path.isdir(os.path.join(snapshot_dir, FULL_VECTORS_DIR)):
+            MmapVectorStore.remove(vector_store_path)
+
+    owner = _create_collection(manifest['collection'])
+    collection = owner.collection
+
+    # Column-based inserts in schema order; auto ids are reassigned by Milvus
+    insert_fields = [f.name for f in collection.schema.fields
+                     if not (spec['auto_id'] and f.name == spec['primary_field'])]
+
+    # Rebuild the filter value counts from the metadata as it streams past
+    stats = FieldStats() if vector_store_path else None
+
+    start = 0
+    metadata = pq.ParquetFile(os.path.join(snapshot_dir, METADATA_FILE))
+    for batch in metadata.iter_batches(batch_size=batch_size):
+        end = start + batch.num_rows
+        batch_vectors = np.asarray(vectors[start:end]).tolist()
+        if spec['partitioned']:
+            rows = batch.to_pylist()
+            for row, vector in zip(rows, batch_vectors):
+                row[spec['vector_field']] = vector
+            insert_partitioned(collection, rows)
+            if stats is not None:
+                stats.add(rows)
+        else:
+            columns = batch.to_pydict()
+            data = [
+                batch_vectors if name == spec['vector_field'] else columns[name]
+                for name in insert_fields
+            ]
+            collection.insert(data)
+        start = end
+
+    owner.build_index()
+    collection.load()
+
+    if stats is not None:
+        reset_name_changes(vector_store_path)
+        stats.save(stats_path(vector_store_path))
+
+    full_vectors_dir = os.path.join(snapshot_dir, FULL_VECTORS_DIR)
+    if vector_store_path and os.path.isdir(full_vectors_dir):
+        MmapVectorStore.write(
+            vector_store_path,
+            np.load(os.path.join(full_vectors_dir, IDS_FILE), mmap_mode='r'),
+            np.load(os.path.join(full_vectors_dir, VECTORS_FILE), mmap_mode='r'),
+        )
+
+    return manifest
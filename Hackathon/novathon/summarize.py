@@ -0,0 +1,186 @@
+"""
+Map-reduce summarization of long and multi-case FIR text
+
+Each document is split into chunks that fit the context budget, chunks are
+summarized concurrently on one process-wide pool sized to
+LLM['CONCURRENCY'], and partial summaries are merged in one or
+more reduce rounds. Chunk summaries are cached by chunk content, model and
+prompt version, so re-summarizing a case or a case set that shares files
+only pays for new chunks.
+"""
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .context_packer import estimate_tokens, split_passages, truncate_to_tokens
+from .deadlines import stages_inline
+from .llm import generate, model_for
+from .prompts import (
+    MULTI_CASE_REDUCE_SYSTEM_PROMPT, PROMPT_VERSION, REDUCE_SYSTEM_PROMPT, SUMMARIZER_SYSTEM_PROMPT,
+    reduce_prompt, summary_prompt
+)
+
+CHUNK_SUMMARY_KEY = 'novathon:chunk-summary:{}:{}:{}'
+
+_pool = None
+_pool_lock = threading.Lock()
+_worker = threading.local()
+
+
+def summary_settings():
+    return settings.LLM['SUMMARY']
+
+
+def chunk_text(text, chunk_tokens):
+    """Consecutive passages grouped into chunks of at most chunk_tokens"""
+    chunks, current, used = [], [], 0
+    for passage in split_passages(text or ''):
+        cost = estimate_tokens(passage) + 1
+        if current and used + cost > chunk_tokens:
+            chunks.append('\n\n'.join(current))
+            current, used = [], 0
+        current.append(passage)
+        used += cost
+    if current:
+        chunks.append('\n\n'.join(current))
+    return chunks
+
+
+def _chunk_key(chunk):
+    digest = hashlib.sha256(chunk.encode('utf-8')).hexdigest()
+    return CHUNK_SUMMARY_KEY.format(PROMPT_VERSION, model_for('summarize'), digest)
+
+
+def summarize_chunk(chunk):
+    """
+    Summary of one chunk, from the cache when the same chunk was seen before
+
+    :return: (summary text, True if it came from the cache)
+    """
+    key = _chunk_key(chunk)
+    cached = cache.get(key)
+    if cached is not None:
+        return cached, True
+
+    summary = generate('summarize', summary_prompt(chunk), system=SUMMARIZER_SYSTEM_PROMPT)['llm_response']
+    cache.set(key, summary, summary_settings()['CACHE_TTL_SECONDS'])
+    return summary, False
+
+
+def reduce_summaries(summaries, system=REDUCE_SYSTEM_PROMPT, labels=None):
+    """
+    Merge partial summaries, in several rounds if they do not fit one prompt
+
+    :param summaries: Partial summaries, in document order
+    :param system: Reduce system prompt, used in every round
+    :param labels: Optional label per summary; an intermediate merge is
+                   labelled with the labels of the summaries it covers
+    :return: Merged summary text
+    """
+    if len(summaries) == 1:
+        return summaries[0]
+
+    budget = settings.LLM['CONTEXT_TOKENS']['summarize']
+    while sum(estimate_tokens(summary) + 8 for summary in summaries) > budget and len(summaries) > 1:
+        # Merge neighbouring summaries in groups that fit, concurrently
+        groups, current, used = [], [], 0
+        for position, summary in enumerate(summaries):
+            cost = estimate_tokens(summary) + 8
+            if current and used + cost > budget:
+                groups.append(current)
+                current, used = [], 0
+            current.append(position)
+            used += cost
+        groups.append(current)
+        if len(groups) == len(summaries):
+            # Every summary fills a prompt on its own; fall back to truncation below
+            break
+
+        def merge(group, summaries=summaries, labels=labels):
+            return reduce_summaries(
+                [summaries[position] for position in group],
+                system=system,
+                labels=[labels[position] for position in group] if labels else None
+            )
+
+        if labels:
+            labels = [', '.join(labels[position] for position in group) for group in groups]
+        summaries = _map(merge, groups)
+
+    if sum(estimate_tokens(summary) + 8 for summary in summaries) > budget:
+        # Give each summary an equal share of the prompt
+        share = max(budget // len(summaries) - 8, 1)
+        summaries = [truncate_to_tokens(summary, share) for summary in summaries]
+
+    return generate('summarize', reduce_prompt(summaries, labels), system=system)['llm_response']
+
+
+def get_pool():
+    """Process-wide pool for map and reduce steps, sized to LLM['CONCURRENCY']"""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ThreadPoolExecutor(
+                    max_workers=settings.LLM.get('CONCURRENCY', 2), thread_name_prefix='summarize'
+                )
+    return _pool
+
+
+def _run_in_pool(fn, item):
+    _worker.active = True
+    try:
+        return fn(item)
+    finally:
+        _worker.active = False
+
+
+def _map(fn, items):
+    # A reduce running on a pool worker maps its groups inline: waiting on the
+    # same pool from inside it could deadlock once every worker is waiting.
+    # Profiled requests also stay on their own thread so the profile sees the work.
+    if getattr(_worker, 'active', False) or stages_inline():
+        return [fn(item) for item in items]
+    return list(get_pool().map(_run_in_pool, [fn] * len(items), items))
+
+
+def summarize_documents(documents):
+    """
+    Summarize one or more documents with map-reduce
+
+    :param documents: Dict of {case_id: extracted text}, in the order to report them
+    :return: Dict with the overall 'summary', per-case 'case_summaries' and chunk counts
+    """
+    chunk_tokens = summary_settings()['CHUNK_TOKENS']
+    chunks = {case_id: chunk_text(text, chunk_tokens) for case_id, text in documents.items()}
+
+    # Map: every chunk of every case at once, bounded by the LLM concurrency limit
+    flat = [(case_id, chunk) for case_id, case_chunks in chunks.items() for chunk in case_chunks]
+    mapped = _map(lambda item: summarize_chunk(item[1]), flat)
+
+    partials = {case_id: [] for case_id in documents}
+    for (case_id, _), (summary, _) in zip(flat, mapped):
+        partials[case_id].append(summary)
+
+    # Reduce: each case on its own, then the cases together
+    reducible = [case_id for case_id in documents if partials[case_id]]
+    case_summaries = dict(zip(reducible, _map(lambda case_id: reduce_summaries(partials[case_id]), reducible)))
+
+    if len(case_summaries) > 1:
+        summary = reduce_summaries(
+            list(case_summaries.values()),
+            system=MULTI_CASE_REDUCE_SYSTEM_PROMPT,
+            labels=[f'Case {case_id}' for case_id in case_summaries]
+        )
+    else:
+        summary = next(iter(case_summaries.values()), '')
+
+    return {
+        'summary': summary,
+        'case_summaries': case_summaries,
+        'chunks': len(flat),
+        'cached_chunks': sum(1 for _, from_cache in mapped if from_cache),
+    }
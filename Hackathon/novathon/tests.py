@@ -1,3 +1,907 @@
-from django.test import TestCase
+import csv
+import io
+import os
+import shutil
+import tempfile
+import threading
+import time
+import urllib.error
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+import pandas as pd
+from types import SimpleNamespace
+from django.conf import settings
+from django.core.management import CommandError, call_command
+from django.db import DatabaseError
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+
+from . import case_searcher, embedders, jobs, llm, loadtest, milvus_connection, views
+from .case_searcher import NameFilterTooBroad
+from .context_packer import estimate_tokens, pack_documents, pack_text
+from .deadlines import Deadline, DeadlineExceeded, run_stages_inline
+from .downloads import parse_range
+from .embedders import Embedder, FakeEmbedder, build_embedder, configured_model, fit_dimension
+from .facets import FacetIndex
+from .fakes import FakeCollection, FakeConnections, FakeLatency, build_fake_collections
+from .field_stats import FieldStats, open_field_stats, stats_path
+from .index_planner import FLAT_MAX_ENTITIES, HNSW_MAX_ENTITIES, plan_index, plan_search_params
+from .ipc_index import IPCSectionIndex
+from .knn_graph import build_knn_graph, open_knn_graph
+from .llm import UsageWriter, group_by_model, record_usage
+from .models import CaseJob, LLMUsage, RenamedCaseFile
+from .prompts import MULTI_CASE_REDUCE_SYSTEM_PROMPT
+from .snapshot import FULL_VECTORS_DIR, export_collection, import_snapshot
+from .summarize import reduce_summaries
+from .name_index import TrigramIndex
+from .vector_store import CURRENT_FILE, VERSIONS_DIR, MmapVectorStore, current_version, open_vector_store
+from .watcher import CaseFileIndexer, Debouncer
+
+
+class EmbedderTests(SimpleTestCase):
+    def test_embedder_requires_embed(self):
+        with self.assertRaises(TypeError):
+            Embedder()
+
+    def test_fake_embedder_is_deterministic(self):
+        embedder = FakeEmbedder(dim=64)
+        first, second, other = embedder.encode(['theft', 'theft', 'assault'], dim=None)
+        self.assertEqual(first, second)
+        self.assertNotEqual(first, other)
+        self.assertAlmostEqual(float(np.linalg.norm(first)), 1.0, places=5)
+
+    def test_encode_fits_dimension(self):
+        embedder = FakeEmbedder(dim=1024)
+        self.assertEqual(len(embedder.encode('theft')), 768)
+        self.assertEqual(len(embedder.encode('theft', dim=None)), 1024)
+        self.assertEqual(len(embedder.encode(['a', 'b'], dim=768)), 2)
+
+    def test_fit_dimension_pads_and_truncates(self):
+        self.assertEqual(fit_dimension([1.0, 2.0], dim=4), [1.0, 2.0, 0.0, 0.0])
+        self.assertEqual(fit_dimension([1.0, 2.0, 3.0], dim=2), [1.0, 2.0])
+
+    def test_build_embedder(self):
+        self.assertIsInstance(build_embedder({'BACKEND': 'fake'}), FakeEmbedder)
+        with self.assertRaises(ValueError):
+            build_embedder({'BACKEND': 'word2vec'})
+
+    def test_configured_model(self):
+        with override_settings(EMBEDDER={'BACKEND': 'fake', 'MODEL': 'nomic-embed-text'}):
+            self.assertEqual(configured_model(), 'nomic-embed-text')
+        with override_settings(EMBEDDER={'BACKEND': 'fake'}):
+            self.assertEqual(configured_model(), 'mxbai-embed-large')
+
+    @override_settings(LLM={**settings.LLM, 'HOST': 'http://ollama.internal:11434'})
+    def test_ollama_embedder_uses_configured_host(self):
+        fake_ollama = mock.Mock()
+        fake_ollama.Client.return_value.embeddings.return_value = {'embedding': [1.0, 2.0]}
+        with mock.patch.dict('sys.modules', {'ollama': fake_ollama}):
+            vectors = build_embedder({'BACKEND': 'ollama'}).embed(['theft'])
+            build_embedder({'BACKEND': 'ollama', 'HOST': 'http://gpu:11434'}).embed(['theft'])
+        self.assertEqual(vectors.tolist(), [[1.0, 2.0]])
+        self.assertEqual(fake_ollama.Client.call_args_list,
+                         [mock.call(host='http://ollama.internal:11434'), mock.call(host='http://gpu:11434')])
+        fake_ollama.embeddings.assert_not_called()
+
+
+def section(number, offense, score, description='x' * 200):
+    return {'section': number, 'offense': offense, 'punishment': '7 years', 'description': description, 'score': score}
+
+
+class PackDocumentsTests(SimpleTestCase):
+    def test_best_scores_first_and_within_budget(self):
+        documents = [section(str(n), f'Offense {n}', score=n) for n in range(20)]
+        packed = pack_documents(documents, budget=200)
+        self.assertLessEqual(packed.tokens, 200)
+        self.assertLessEqual(estimate_tokens(packed.text), 200)
+        self.assertTrue(packed.text.startswith('Section: IPC 0\n'))
+        self.assertEqual(packed.included + packed.dropped, 20)
+        self.assertGreater(packed.dropped, 0)
+
+    def test_duplicates_are_dropped(self):
+        documents = [section('420', 'Cheating', 0.1), section('420', 'Cheating', 0.2), section('379', 'Theft', 0.3)]
+        packed = pack_documents(documents, budget=1000)
+        self.assertEqual(packed.included, 2)
+        self.assertEqual(packed.dropped, 1)
+        self.assertEqual(packed.text.count('IPC 420'), 1)
+
+    def test_truncates_the_first_document_that_does_not_fit(self):
+        packed = pack_documents([section('302', 'Murder', 0.1, description='word ' * 400)], budget=100)
+        self.assertEqual(packed.included, 1)
+        self.assertLessEqual(packed.tokens, 100)
+        self.assertTrue(packed.text.endswith('...'))
+
+
+class PackTextTests(SimpleTestCase):
+    def test_short_text_is_kept_whole(self):
+        text = 'The accused entered the house.\n\nThe phone was recovered.'
+        packed = pack_text(text, budget=100)
+        self.assertEqual(packed.text, text)
+        self.assertEqual(packed.dropped, 0)
+
+    def test_repeated_passages_are_dropped(self):
+        text = '\n\n'.join(['Page header of the FIR', 'The accused stole a bike.'] * 3)
+        packed = pack_text(text, budget=1000)
+        self.assertEqual(packed.included, 2)
+        self.assertEqual(packed.dropped, 4)
+
+    def test_budget_keeps_relevant_passages_in_order(self):
+        filler = [f'Paragraph {n} about unrelated procedure and routine paperwork.' for n in range(30)]
+        text = '\n\n'.join(filler[:10] + ['The stolen motorcycle was found near the station.'] + filler[10:])
+        packed = pack_text(text, budget=60, query='stolen motorcycle')
+        self.assertLessEqual(packed.tokens, 60)
+        self.assertIn('stolen motorcycle', packed.text)
+        self.assertEqual(packed.included + packed.dropped, 31)
+        positions = [text.index(passage) for passage in packed.text.split('\n\n')]
+        self.assertEqual(positions, sorted(positions))
+
+
+class IndexPlannerTests(SimpleTestCase):
+    def test_index_type_follows_collection_size(self):
+        self.assertEqual(plan_index(FLAT_MAX_ENTITIES, 768)['index_type'], 'FLAT')
+        hnsw = plan_index(FLAT_MAX_ENTITIES + 1, 768)
+        self.assertEqual(hnsw['index_type'], 'HNSW')
+        self.assertEqual(hnsw['params'], {'M': 32, 'efConstruction': 256})
+        self.assertEqual(plan_index(FLAT_MAX_ENTITIES + 1, 256)['params']['M'], 16)
+        ivf = plan_index(HNSW_MAX_ENTITIES + 1, 768)
+        self.assertEqual(ivf['index_type'], 'IVF_SQ8')
+        self.assertEqual(ivf['params']['nlist'], 4000)
+
+    def test_search_params_match_the_index(self):
+        hnsw = plan_index(50_000, 768)
+        self.assertEqual(plan_search_params(hnsw, top_k=5)['params'], {'ef': 128})
+        self.assertEqual(plan_search_params(hnsw, top_k=500)['params'], {'ef': 500})
+        self.assertEqual(plan_search_params(hnsw, top_k=5, profile='latency')['params'], {'ef': 16})
+
+        ivf = plan_index(4_000_000, 768)
+        self.assertEqual(plan_search_params(ivf, profile='recall')['params'], {'nprobe': 256})
+        self.assertEqual(plan_search_params(ivf, profile='latency')['params'], {'nprobe': 32})
+        self.assertEqual(plan_search_params(None)['params'], {})
+
+    def test_unknown_profile(self):
+        with self.assertRaises(ValueError):
+            plan_search_params(None, profile='fast')
+
+
+class ParseRangeTests(SimpleTestCase):
+    def test_ranges(self):
+        self.assertEqual(parse_range('bytes=0-99', 1000), (0, 99))
+        self.assertEqual(parse_range('bytes=900-', 1000), (900, 999))
+        self.assertEqual(parse_range('bytes=900-5000', 1000), (900, 999))
+        self.assertEqual(parse_range('bytes=-100', 1000), (900, 999))
+        self.assertEqual(parse_range('bytes=-5000', 1000), (0, 999))
+
+    def test_unsatisfiable(self):
+        self.assertIs(parse_range('bytes=1000-', 1000), False)
+        self.assertIs(parse_range('bytes=50-10', 1000), False)
+        self.assertIs(parse_range('bytes=-0', 1000), False)
+
+    def test_ignored(self):
+        self.assertIsNone(parse_range('bytes=0-1,5-9', 1000))
+        self.assertIsNone(parse_range('items=0-1', 1000))
+        self.assertIsNone(parse_range('bytes=-', 1000))
+
+
+class IPCSectionIndexTests(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.directory = tempfile.mkdtemp()
+        path = os.path.join(cls.directory, 'ipc_sections.csv')
+        with open(path, 'w', newline='', encoding='utf-8') as file:
+            writer = csv.writer(file)
+            writer.writerow(['Description', 'Offense', 'Punishment', 'Section'])
+            writer.writerow(['Whoever commits murder', 'Murder', 'Death or life imprisonment', 'IPC_302'])
+            writer.writerow(['Whoever commits murder', 'Murder', 'Death or life imprisonment', 'IPC_302'])
+            writer.writerow(['Attempt to murder', 'Attempt to murder', 'Ten years', 'IPC_307'])
+            writer.writerow(['Acts done by several persons', 'Common intention', 'Same as the act', 'IPC_34'])
+            writer.writerow(['Sedition', 'Sedition', 'Life imprisonment', 'IPC_124A'])
+        cls.index = IPCSectionIndex(path)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.directory)
+        super().tearDownClass()
+
+    def sections(self, query):
+        return [entry['section'] for entry in self.index.route(query) or []]
+
+    def test_duplicate_rows_are_kept_once(self):
+        self.assertEqual(len(self.index), 4)
+
+    def test_single_references(self):
+        self.assertEqual(self.sections('what is IPC 302'), ['IPC_302'])
+        self.assertEqual(self.sections('booked u/s 124a'), ['IPC_124A'])
+        self.assertEqual(self.sections('sec. 307 applies?'), ['IPC_307'])
+
+    def test_multiple_sections(self):
+        self.assertEqual(self.sections('sections 302 and 307'), ['IPC_302', 'IPC_307'])
+        self.assertEqual(self.sections('charged u/s 302/34'), ['IPC_302', 'IPC_34'])
+        self.assertEqual(self.sections('IPC 307, 34 and 302'), ['IPC_307', 'IPC_34', 'IPC_302'])
+        self.assertEqual(self.sections('section 302 read with section 34'), ['IPC_302', 'IPC_34'])
+
+    def test_exact_title_and_fallback(self):
+        self.assertEqual(self.sections('attempt to murder!'), ['IPC_307'])
+        self.assertIsNone(self.index.route('someone stole my phone'))
+        self.assertEqual([entry['section'] for entry in self.index.prefix_search('murd')], ['IPC_302'])
+
+
+class TrigramIndexTests(SimpleTestCase):
+    def setUp(self):
+        self.index = TrigramIndex()
+        for row_id, name in enumerate(['Ramesh Kumar', 'Ramesh Kumar', 'Suresh Kumar', 'Rameshwar Rao', 'ramesh kumar', 'Mohan Lal']):
+            self.index.add(name, row_id)
+
+    def test_exact_is_case_insensitive(self):
+        self.assertEqual(self.index.lookup('RAMESH  kumar', 'exact'), {0, 1, 4})
+        self.assertEqual(self.index.raw_matches('ramesh kumar', 'exact'), {'Ramesh Kumar', 'ramesh kumar'})
+
+    def test_prefix(self):
+        self.assertEqual(self.index.lookup('rames', 'prefix'), {0, 1, 3, 4})
+        self.assertEqual(self.index.lookup('kumar', 'prefix'), set())
+
+    def test_fuzzy_tolerates_typos(self):
+        matches = self.index.lookup('Ramesh Kumaar', 'fuzzy')
+        self.assertLessEqual({0, 1, 4}, matches)
+        self.assertNotIn(5, matches)
+        self.assertEqual(self.index.lookup('Mohn Lal', 'fuzzy'), {5})
+
+    def test_remove(self):
+        self.index.remove('Rameshwar Rao', 3)
+        self.index.remove('Rameshwar Rao', 99)
+        self.assertEqual(self.index.lookup('rames', 'prefix'), {0, 1, 4})
+        self.assertNotIn('rameshwar rao', self.index.sorted_values)
+        self.index.remove('ramesh kumar', 4)
+        self.assertEqual(self.index.raw_matches('ramesh kumar', 'exact'), {'Ramesh Kumar'})
+
+    def test_bulk_add_then_sort(self):
+        index = TrigramIndex()
+        for row_id, name in enumerate(['Zed', 'Amar', 'Mala']):
+            index.add(name, row_id, keep_sorted=False)
+        index.sort()
+        self.assertEqual(index.sorted_values, ['amar', 'mala', 'zed'])
+        self.assertEqual(index.lookup('ma', 'prefix'), {2})
+
+
+class GroupByModelTests(SimpleTestCase):
+    def test_resident_models_first_and_order_kept(self):
+        jobs_ = [('a', 1), ('b', 2), ('a', 3), (None, 4), ('c', 5), ('b', 6)]
+        groups = group_by_model(jobs_, lambda job: job[0], resident=[None, 'b'])
+        self.assertEqual([model for model, _ in groups], [None, 'b', 'a', 'c'])
+        self.assertEqual(dict(groups)['b'], [('b', 2), ('b', 6)])
+        self.assertEqual(dict(groups)['a'], [('a', 1), ('a', 3)])
+
+
+@override_settings(LLM={**settings.LLM, 'USAGE_LEDGER': False})
+class OllamaClientTests(SimpleTestCase):
+    def setUp(self):
+        self.ollama = mock.Mock()
+        self.ollama.Client.return_value.generate.return_value = {'response': 'advice'}
+        for patcher in (
+            mock.patch.dict('sys.modules', {'ollama': self.ollama}),
+            mock.patch.object(llm, '_timed_clients', {}),
+            mock.patch.object(llm, '_client_replaced', False),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_timed_calls_share_a_client_per_rounded_timeout(self):
+        for timeout in (11.2, 14.9, 15, 12.0):
+            self.assertEqual(llm.generate('summarize', 'text', timeout=timeout)['llm_response'], 'advice')
+        llm.generate('summarize', 'text', timeout=16)
+        self.assertEqual(self.ollama.Client.call_args_list, [
+            mock.call(host=settings.LLM['HOST'], timeout=15),
+            mock.call(host=settings.LLM['HOST'], timeout=20),
+        ])
+
+    def test_resident_models_use_a_short_timeout_and_are_cached(self):
+        self.ollama.Client.return_value.ps.side_effect = [TimeoutError('hung'), {'models': [{'model': 'llama3'}]}]
+        with mock.patch.object(llm, '_resident', (0.0, [])), mock.patch('novathon.llm.time.monotonic') as now:
+            now.return_value = 100.0
+            self.assertEqual((llm.resident_models(), llm.resident_models()), ([], []))
+            now.return_value = 100.0 + llm.RESIDENT_MODELS_TTL_SECONDS
+            self.assertEqual(llm.resident_models(), ['llama3'])
+        self.assertEqual(self.ollama.Client.return_value.ps.call_count, 2)
+        self.ollama.Client.assert_called_once_with(host=settings.LLM['HOST'],
+                                                   timeout=llm.RESIDENT_MODELS_TIMEOUT_SECONDS)
+
+
+def usage_row(model='llama3'):
+    return LLMUsage(task='summarize', model=model, total_ms=10)
+
+
+class UsageWriterTests(TestCase):
+    def test_rows_are_written_in_batches_off_the_calling_thread(self):
+        writer = UsageWriter()
+        batches = []
+        writer.write = lambda batch: batches.append((threading.current_thread(), batch))
+        rows = [usage_row() for _ in range(3)]
+        for row in rows:
+            writer.submit(row)
+        self.assertTrue(writer.flush())
+        self.assertEqual([row for _, batch in batches for row in batch], rows)
+        self.assertNotIn(threading.current_thread(), [thread for thread, _ in batches])
+
+    def test_write_saves_rows_and_survives_database_errors(self):
+        writer = UsageWriter()
+        with mock.patch('novathon.llm.close_old_connections'):
+            writer.write([usage_row('llama3'), usage_row('qwen2')])
+            self.assertEqual(sorted(LLMUsage.objects.values_list('model', flat=True)), ['llama3', 'qwen2'])
+            with mock.patch.object(LLMUsage.objects, 'bulk_create', side_effect=DatabaseError('locked')), \
+                    mock.patch('novathon.llm.connection') as connection, \
+                    self.assertLogs('novathon.llm', 'ERROR'):
+                writer.write([usage_row()])
+        connection.close.assert_called_once_with()
+
+    def test_disabled_ledger_records_nothing(self):
+        with override_settings(LLM={**settings.LLM, 'USAGE_LEDGER': False}), \
+                mock.patch('novathon.llm.usage_writer') as writer:
+            record_usage('summarize', 'llama3', LLMUsage.OUTCOME_OK, 0, 1)
+        writer.submit.assert_not_called()
+
+
+class ReduceSummariesTests(SimpleTestCase):
+    def test_multi_case_rounds_keep_the_prompt_and_labels(self):
+        calls = []
+
+        def generate(task, prompt, system=None):
+            calls.append((prompt, system))
+            return {'llm_response': f'merged {len(calls)}'}
+
+        llm = dict(settings.LLM, CONTEXT_TOKENS={'summarize': 80})
+        summaries = ['x' * 120 for _ in range(4)]
+        with override_settings(LLM=llm), mock.patch('novathon.summarize.generate', side_effect=generate), \
+                mock.patch('novathon.summarize.stages_inline', return_value=True):
+            reduce_summaries(summaries, system=MULTI_CASE_REDUCE_SYSTEM_PROMPT,
+                             labels=['Case 1', 'Case 2', 'Case 3', 'Case 4'])
+
+        self.assertEqual(len(calls), 3)
+        self.assertEqual({system for _, system in calls}, {MULTI_CASE_REDUCE_SYSTEM_PROMPT})
+        self.assertTrue(calls[0][0].startswith('Case 1: '))
+        self.assertIn('Case 2: ', calls[0][0])
+        self.assertEqual(calls[-1][0], 'Case 1, Case 2: merged 1\n\nCase 3, Case 4: merged 2')
+
+
+class DebouncerTests(SimpleTestCase):
+    def test_paths_wait_until_quiet(self):
+        debouncer = Debouncer(delay=2)
+        debouncer.add(['a.pdf', 'b.pdf'], now=0)
+        debouncer.add(['a.pdf'], now=1.5)
+        self.assertEqual(debouncer.ready(now=1.9), [])
+        self.assertEqual(debouncer.ready(now=2.5), ['b.pdf'])
+        self.assertEqual(len(debouncer), 1)
+        self.assertEqual(debouncer.ready(now=3.5), ['a.pdf'])
+        self.assertEqual(len(debouncer), 0)
+
+    def test_limit(self):
+        debouncer = Debouncer(delay=0)
+        debouncer.add(['a', 'b', 'c'], now=0)
+        self.assertEqual(debouncer.ready(limit=2, now=0), ['a', 'b'])
+        self.assertEqual(debouncer.ready(now=0), ['c'])
+
+
+class DeadlineTests(SimpleTestCase):
+    def test_overrunning_stage_raises_with_its_future(self):
+        deadline = Deadline(0.05)
+        with self.assertRaises(DeadlineExceeded) as raised:
+            deadline.run('llm', time.sleep, 0.2, cancel=False)
+        self.assertEqual(raised.exception.stage, 'llm')
+        self.assertIsNone(raised.exception.future.result())
+        self.assertIn('llm', deadline.timings)
+
+    def test_profiled_requests_run_stages_on_their_own_thread(self):
+        deadline = Deadline(5)
+        self.assertNotEqual(deadline.run('embed', threading.current_thread), threading.current_thread())
+        with run_stages_inline():
+            self.assertIs(deadline.run('search', threading.current_thread), threading.current_thread())
+        self.assertEqual(set(deadline.timings), {'embed', 'search'})
+
+
+
+class MmapVectorStoreTests(SimpleTestCase):
+    def setUp(self):
+        self.store = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.store)
+        MmapVectorStore.write(self.store, [3, 1, 2], [[3, 0], [1, 0], [2, 0]])
+
+    def versions(self):
+        return sorted(os.listdir(os.path.join(self.store, VERSIONS_DIR)))
+
+    def test_write_sorts_by_id(self):
+        store = open_vector_store(self.store)
+        self.assertEqual(store.ids.tolist(), [1, 2, 3])
+        self.assertEqual(store.vectors[:, 0].tolist(), [1, 2, 3])
+        found, vectors = store.lookup([2, 7])
+        self.assertEqual((found.tolist(), vectors.tolist()), ([2], [[2, 0]]))
+
+    def test_update_swaps_in_a_new_version(self):
+        old = open_vector_store(self.store)
+        MmapVectorStore.update(self.store, [4, 2], [[4, 0], [2, 5]], removed_ids=[1])
+
+        new = open_vector_store(self.store)
+        self.assertIsNot(new, old)
+        self.assertEqual(new.version, current_version(self.store))
+        self.assertEqual(new.ids.tolist(), [2, 3, 4])
+        self.assertEqual(new.lookup([2])[1].tolist(), [[2, 5]])
+        # Readers of the previous version keep a consistent view
+        self.assertEqual(old.ids.tolist(), [1, 2, 3])
+        self.assertEqual(old.lookup([2])[1].tolist(), [[2, 0]])
+        self.assertEqual(self.versions(), sorted([old.version, new.version]))
+
+        MmapVectorStore.update(self.store, [5], [[5, 0]])
+        self.assertNotIn(old.version, self.versions())
+        self.assertEqual(len(self.versions()), 2)
+        with self.assertRaises(ValueError):
+            MmapVectorStore.update(self.store, [6], [[6, 0, 0]])
+
+    def test_rerank_orders_by_exact_distance(self):
+        store = open_vector_store(self.store)
+        ranked = store.rerank([2.9, 0], [1, 2, 3, 99], top_k=2)
+        self.assertEqual([case for case, _ in ranked], [3, 2])
+        self.assertEqual([round(distance, 4) for _, distance in ranked], [0.01, 0.81])
+        self.assertEqual([case for case, _ in store.rerank([0, 0], [3, 1, 2], top_k=5)], [1, 2, 3])
+        self.assertEqual(store.rerank([0, 0], [99], top_k=3), [])
+
+    def test_remove(self):
+        MmapVectorStore.remove(self.store)
+        self.assertIsNone(open_vector_store(self.store))
+        self.assertFalse(os.path.exists(os.path.join(self.store, CURRENT_FILE)))
+        MmapVectorStore.update(self.store, [1], [[1, 1]])
+        self.assertEqual(open_vector_store(self.store).ids.tolist(), [1])
+
+
+class FieldStatsTests(SimpleTestCase):
+    rows = [
+        {'year': 2020, 'criminal_name': 'Ravi', 'police_station': 'Indiranagar', 'crime_type': 'Theft'},
+        {'year': 2020, 'criminal_name': 'Ravi', 'police_station': 'Koramangala', 'crime_type': 'Fraud'},
+        {'year': 2021, 'criminal_name': 'Raju', 'police_station': 'Indiranagar', 'crime_type': 'Theft'},
+    ]
+
+    def test_estimate_and_remove(self):
+        stats = FieldStats.from_rows(self.rows)
+        self.assertEqual(stats.estimate({}), 3)
+        # An upper bound: the smallest per-field count
+        self.assertEqual(stats.estimate({'year': 2020, 'crime_type': 'Theft'}), 2)
+        self.assertEqual(stats.estimate({'year': 2021, 'crime_type': 'Fraud'}), 1)
+        stats.remove(self.rows[:1])
+        self.assertEqual(stats.count('criminal_name', 'Ravi'), 1)
+        self.assertEqual(stats.estimate({'crime_type': 'Theft'}), 1)
+
+    def test_save_and_reload(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = stats_path(directory)
+        FieldStats.from_rows(self.rows).save(path)
+        loaded = open_field_stats(path)
+        self.assertEqual(loaded.to_dict(), FieldStats.load(path).to_dict())
+        self.assertEqual(loaded.count('year', 2020), 2)
+        self.assertIs(open_field_stats(path), loaded)
+
+
+class FacetIndexTests(SimpleTestCase):
+    rows = FieldStatsTests.rows
+
+    def test_value_combinations_follow_adds_and_removals(self):
+        stats = FieldStats.from_rows(self.rows)
+        self.assertEqual(stats.combos[('2020', 'Indiranagar', 'Theft')], 1)
+        stats.remove(self.rows[:1])
+        self.assertNotIn(('2020', 'Indiranagar', 'Theft'), stats.combos)
+
+    def test_facet_counts_are_disjunctive(self):
+        index = FacetIndex(FieldStats.from_rows(self.rows))
+        total, facets = index.facet_counts({'year': 2020, 'crime_type': 'Theft'})
+        self.assertEqual(total, 1)
+        # Each facet ignores its own filter
+        self.assertEqual(facets['year'], {'2020': 1, '2021': 1})
+        self.assertEqual(facets['crime_type'], {'Fraud': 1, 'Theft': 1})
+        self.assertEqual(facets['police_station'], {'Indiranagar': 1})
+        # Memoized per selection, whatever the key order or value type
+        self.assertIs(index.facet_counts({'crime_type': 'Theft', 'year': '2020'}),
+                      index.facet_counts({'year': 2020, 'crime_type': 'Theft'}))
+
+    def test_typeahead(self):
+        index = FacetIndex(FieldStats.from_rows(self.rows))
+        self.assertEqual(index.typeahead('criminal_name', 'ra'),
+                         [{'value': 'Ravi', 'count': 2}, {'value': 'Raju', 'count': 1}])
+        self.assertEqual(index.typeahead('police_station', 'KORA'), [{'value': 'Koramangala', 'count': 1}])
+        self.assertEqual(index.typeahead('crime_type', 'x'), [])
+
+    def test_typeahead_view_checks_limit(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        FieldStats.from_rows(self.rows).save(stats_path(directory))
+        with override_settings(CASE_FILES_VECTOR_STORE=directory):
+            url = '/facets/typeahead/'
+            response = self.client.get(url, {'field': 'criminal_name', 'prefix': 'ra', 'limit': 1})
+            self.assertEqual([s['value'] for s in response.json()['suggestions']], ['Ravi'])
+            for limit in ('0', '-3', 'all'):
+                self.assertEqual(self.client.get(url, {'field': 'criminal_name', 'limit': limit}).status_code, 400)
+
+
+class KnnGraphTests(TestCase):
+    def setUp(self):
+        self.store = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.store)
+        # Cases 1-3 lie close together on one axis, case 5 far away
+        MmapVectorStore.write(self.store, [5, 1, 2, 3], [[0, 9], [1, 0], [1.1, 0], [1.3, 0]])
+        build_knn_graph(self.store, k=2, block_size=3)
+
+    def test_neighbours_closest_first(self):
+        graph = open_knn_graph(self.store)
+        self.assertEqual([n['case_file_id'] for n in graph.similar(1)], [2, 3])
+        self.assertEqual([n['case_file_id'] for n in graph.similar(5)], [1, 2])
+        self.assertTrue(graph.similar(1)[0]['near_duplicate'])
+        self.assertIsNone(graph.similar(4))
+        with self.assertRaises(ValueError):
+            graph.similar(1, top_k=-1)
+
+    def test_view_checks_top_k(self):
+        with override_settings(CASE_FILES_VECTOR_STORE=self.store):
+            url = '/similar-cases/2/'
+            self.assertEqual(len(self.client.get(url, {'top_k': 1}).json()['similar_cases']), 1)
+            self.assertEqual(len(self.client.get(url, {'top_k': 50}).json()['similar_cases']), 2)
+            for top_k in ('0', '-1', 'many'):
+                self.assertEqual(self.client.get(url, {'top_k': top_k}).status_code, 400)
+            self.assertEqual(self.client.get('/similar-cases/9/').status_code, 404)
+
+
+class RecordingCollection:
+    """Stands in for the empty collection import_snapshot recreates"""
+
+    def __init__(self, schema):
+        self.schema = schema
+        self.partitions = []
+        self.rows = []
+
+    def create_partition(self, name):
+        self.partitions.append(SimpleNamespace(name=name))
+
+    def insert(self, rows, partition_name=None):
+        self.rows.extend(dict(row, partition=partition_name) for row in rows)
+
+    def load(self):
+        pass
+
+
+class SnapshotTests(SimpleTestCase):
+    fields = ['case_file_id', 'year', 'criminal_name', 'police_station', 'crime_type', 'case_details']
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.store = os.path.join(self.directory, 'store')
+        self.snapshot = os.path.join(self.directory, 'snapshot')
+
+        vectors = np.arange(12, dtype=np.float32).reshape(3, 4)
+        frame = pd.DataFrame({
+            'case_file_id': [3, 1, 2],
+            'year': [2023, 2024, 2024],
+            'criminal_name': ['A', 'B', 'C'],
+            'police_station': ['North', 'South', 'North'],
+            'crime_type': ['Theft', 'Fraud', 'Theft'],
+            'case_details': ['x', 'y', 'z'],
+            'case_embedding': vectors.tolist(),
+        })
+        self.schema = SimpleNamespace(fields=[SimpleNamespace(name=name, params={}) for name in self.fields] + [
+            SimpleNamespace(name='case_embedding', params={'dim': 4})
+        ])
+        self.source = FakeCollection('case_files', frame, 'case_embedding', 'case_file_id', FakeLatency(0, 0, 0))
+        self.source.schema = self.schema
+        MmapVectorStore.write(self.store, [3, 1, 2], vectors * 10)
+
+    def restore(self, vector_store_path):
+        target = RecordingCollection(self.schema)
+        owner = SimpleNamespace(collection=target, build_index=lambda: None)
+        with mock.patch('novathon.snapshot._create_collection', return_value=owner):
+            import_snapshot(self.snapshot, batch_size=2, vector_store_path=vector_store_path)
+        return target
+
+    def test_round_trip(self):
+        manifest = export_collection(self.source, self.snapshot, 'fake-model', batch_size=2,
+                                     vector_store_path=self.store)
+        self.assertEqual((manifest['num_rows'], manifest['dim']), (3, 4))
+
+        restored = os.path.join(self.directory, 'restored')
+        target = self.restore(restored)
+        self.assertEqual(sorted(row['case_file_id'] for row in target.rows), [1, 2, 3])
+        row = next(row for row in target.rows if row['case_file_id'] == 2)
+        self.assertEqual((row['partition'], row['criminal_name']), ('year_2024', 'C'))
+        self.assertEqual(row['case_embedding'], [8.0, 9.0, 10.0, 11.0])
+
+        store = open_vector_store(restored)
+        self.assertEqual(store.ids.tolist(), [1, 2, 3])
+        self.assertEqual(store.lookup([2])[1].tolist(), [[80.0, 90.0, 100.0, 110.0]])
+
+    def test_import_without_full_vectors_drops_the_old_store_and_graph(self):
+        export_collection(self.source, self.snapshot, 'fake-model')
+        self.assertFalse(os.path.exists(os.path.join(self.snapshot, FULL_VECTORS_DIR)))
+        build_knn_graph(self.store, k=1)
+        self.assertIsNotNone(open_vector_store(self.store))
+
+        self.restore(self.store)
+        self.assertIsNone(open_vector_store(self.store))
+        self.assertIsNone(open_knn_graph(self.store))
+
+
+class SyncCaseFilesTests(TestCase):
+    def test_default_folders_do_not_depend_on_the_working_directory(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.addCleanup(os.chdir, os.getcwd())
+        os.chdir(directory)
+
+        # An empty source folder so no shipped PDF can be moved
+        RenamedCaseFile.objects.create(case_id='121', file_path='old/121.pdf')
+        call_command('sync_case_files', source_dir=directory, stdout=io.StringIO())
+        self.assertEqual(RenamedCaseFile.objects.count(), 50)
+        self.assertEqual(
+            RenamedCaseFile.objects.get(case_id='121').file_path,
+            'novathon/renamed_case_files/121_2024_Paula_Johnson_Cybercrime.pdf'
+        )
+
+    def test_missing_folder_is_an_error(self):
+        RenamedCaseFile.objects.create(case_id='121', file_path='novathon/renamed_case_files/121.pdf')
+        with self.assertRaises(CommandError):
+            call_command('sync_case_files', renamed_dir='novathon/no_such_folder')
+        self.assertEqual(RenamedCaseFile.objects.count(), 1)
+
+    def make_catalog(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        source, renamed = os.path.join(directory, 'case_file'), os.path.join(directory, 'renamed')
+        os.makedirs(source)
+        os.makedirs(renamed)
+        for case_id in (1, 2, 3):
+            open(os.path.join(source, f'case_file_{case_id}.pdf'), 'wb').close()
+        csv_path = os.path.join(directory, 'cases.csv')
+        with open(csv_path, 'w', encoding='utf-8') as f:
+            f.write('case_file_id,year,criminal_name,police_station,crime_type,case_details,keywords\n'
+                    '1,2020,Ravi Kumar,Indiranagar,Theft\n'
+                    '2,2021,Raju\n'
+                    '3,2022,Anil,Koramangala,Fraud,details,"fraud, scam"\n')
+        return source, renamed, csv_path
+
+    def test_short_csv_rows_are_skipped(self):
+        source, renamed, csv_path = self.make_catalog()
+        out = io.StringIO()
+        call_command('sync_case_files', source_dir=source, renamed_dir=renamed, csv=csv_path, stdout=out)
+        self.assertIn('Skipped case 2: line 3 of the case CSV has no police_station, crime_type', out.getvalue())
+        self.assertEqual(sorted(os.listdir(renamed)), ['1_2020_Ravi_Kumar_Theft.pdf', '3_2022_Anil_Fraud.pdf'])
+        self.assertEqual(sorted(RenamedCaseFile.objects.values_list('case_id', flat=True)), ['1', '3'])
+
+    def test_watcher_reports_short_csv_rows_once(self):
+        source, renamed, csv_path = self.make_catalog()
+        rag = mock.Mock()
+        indexer = CaseFileIndexer(rag, source, renamed, csv_path)
+        result = indexer.process([(source, 'case_file_3.pdf')])
+        self.assertEqual(result['skipped'], [('2', 'line 3 of the case CSV has no police_station, crime_type')])
+        self.assertEqual([row['case_file_id'] for row in rag.upsert_case_files.call_args.args[0]], [3])
+        self.assertEqual(indexer.process([])['skipped'], [])
+
+
+class SearchErrorTests(TestCase):
+    def search(self, error):
+        with mock.patch('novathon.views.get_case_searcher') as searcher:
+            searcher.return_value.search_case_files.side_effect = error
+            searcher.return_value.iter_case_files.side_effect = error
+            search = self.client.post('/search_case_files/', {'criminal_name': 'ra', 'name_match': 'prefix'},
+                                      content_type='application/json')
+            export = self.client.get('/search_case_files/export/', {'criminal_name': 'ra', 'name_match': 'prefix'})
+        return search.status_code, export.status_code
+
+    def test_only_broad_name_filters_are_client_errors(self):
+        self.assertEqual(self.search(NameFilterTooBroad('too many names')), (400, 400))
+        self.assertEqual(self.search(ValueError('shapes not aligned')), (500, 500))
+
+    def test_top_k_below_one_is_rejected(self):
+        with mock.patch('novathon.views.get_case_searcher') as searcher:
+            for top_k in (0, -1, 'five', None):
+                response = self.client.post('/search_case_files/', {'query': 'theft', 'top_k': top_k},
+                                            content_type='application/json')
+                self.assertEqual(response.status_code, 400)
+        searcher.return_value.search_case_files.assert_not_called()
+
+
+
+@override_settings(CASE_FILES_PRELOAD_YEARS=[2024], CASE_FILES_ON_DEMAND_PARTITIONS=0)
+class ExportStreamTests(TestCase):
+    def setUp(self):
+        collections = build_fake_collections(
+            os.path.join(settings.BASE_DIR, 'novathon', 'data', 'case_files_data.csv'),
+            settings.IPC_SECTIONS_CSV,
+            FakeLatency(embed_ms=0, search_ms=0, llm_ms=0)
+        )
+        self.collection = collections['case_files']
+        self.iterators = []
+        query_iterator = self.collection.query_iterator
+
+        def recording_iterator(*args, **kwargs):
+            iterator = mock.Mock(wraps=query_iterator(*args, **kwargs))
+            self.iterators.append(iterator)
+            return iterator
+
+        for patcher in (
+            mock.patch.object(milvus_connection, 'connect'),
+            mock.patch.object(milvus_connection, 'open_collection', lambda name: collections[name]),
+            mock.patch.object(embedders, '_embedder', FakeEmbedder()),
+            mock.patch.object(case_searcher, '_searcher', None),
+            mock.patch.object(self.collection, 'query_iterator', recording_iterator),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def export(self, **params):
+        return self.client.get('/search_case_files/export/', dict(params, year=2020))
+
+    def test_closing_an_unread_export_frees_its_partitions(self):
+        for export_format in ('ndjson', 'csv'):
+            response = self.export(format=export_format)
+            self.assertIn('year_2020', self.collection.loaded_partitions)
+            response.close()
+            self.assertNotIn('year_2020', self.collection.loaded_partitions)
+            self.iterators[-1].close.assert_called_once_with()
+        self.assertEqual(dict(case_searcher.get_case_searcher().on_demand.leases), {})
+
+    def test_read_export_frees_its_partitions_once(self):
+        response = self.export()
+        rows = b''.join(response.streaming_content).decode().splitlines()
+        response.close()
+        self.assertEqual(len(rows), 7)
+        self.assertNotIn('year_2020', self.collection.loaded_partitions)
+        self.iterators[-1].close.assert_called_once_with()
+
+    def test_limit(self):
+        self.assertEqual(len(b''.join(self.export(limit=3).streaming_content).splitlines()), 3)
+        for limit in ('0', '-2', 'all'):
+            self.assertEqual(self.export(limit=limit).status_code, 400)
+        response = self.client.post('/search_case_files/export/', {'year': 2020, 'limit': 0},
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.iterators[1:], [])
+
+
+class JobStreamTests(TestCase):
+    def stream(self, status):
+        job = CaseJob.objects.create(kind=CaseJob.KIND_EXTRACT, case_id='7', status=status)
+        jobs_settings = dict(settings.JOBS, STREAM_SECONDS=0.05, POLL_INTERVAL_SECONDS=0.01)
+        with override_settings(JOBS=jobs_settings):
+            response = self.client.get(f'/jobs/{job.id}/stream/')
+            return b''.join(response.streaming_content).decode()
+
+    def test_stream_is_a_short_long_poll(self):
+        body = self.stream(CaseJob.STATUS_QUEUED)
+        self.assertTrue(body.startswith(f"retry: {settings.JOBS['STREAM_RETRY_MS']}\n\n"))
+        self.assertEqual(body.count('event: status'), 1)
+
+    def test_stream_ends_with_the_job(self):
+        self.assertIn('"status": "done"', self.stream(CaseJob.STATUS_DONE))
+
+
+class GetFileTextTests(TestCase):
+    def test_failed_extraction_does_not_call_the_model(self):
+        RenamedCaseFile.objects.create(case_id='7', file_path='novathon/missing.pdf')
+        with mock.patch('novathon.views.extract_text_from_pdf', return_value=(None, 'unreadable')), \
+                mock.patch('novathon.views.interact_with_model') as model:
+            response = self.client.get('/get-file-text/7/')
+        self.assertEqual((response.status_code, response.json()), (400, {'error': 'unreadable'}))
+        model.assert_not_called()
+
+
+class LoadTestSendTests(SimpleTestCase):
+    def _send_answering(self, code, **kwargs):
+        error = urllib.error.HTTPError('http://testserver/x/', code, 'error', {}, io.BytesIO(b'{}'))
+        with mock.patch('novathon.loadtest.urllib.request.urlopen', side_effect=error):
+            return loadtest._send('http://testserver', 'GET', '/x/', None, 1, **kwargs)
+
+    def test_404_is_a_failure_unless_no_match_is_valid(self):
+        self.assertFalse(self._send_answering(404))
+        self.assertTrue(self._send_answering(404, not_found_ok=True))
+        self.assertFalse(self._send_answering(500, not_found_ok=True))
+        self.assertEqual(loadtest.NOT_FOUND_OK, {'legal'})
+
+
+@override_settings(JOBS={'MAX_ATTEMPTS': 2, 'RETRY_BACKOFF_SECONDS': 30})
+@mock.patch('novathon.jobs.resident_models', return_value=[])
+class JobQueueTests(TestCase):
+    def setUp(self):
+        handle, self.pdf = tempfile.mkstemp(suffix='.pdf')
+        os.close(handle)
+        self.addCleanup(os.remove, self.pdf)
+        RenamedCaseFile.objects.create(case_id='7', file_path=self.pdf)
+
+    def test_submit_is_idempotent(self, _):
+        job, created = jobs.submit_job(CaseJob.KIND_EXTRACT, 7)
+        again, created_again = jobs.submit_job(CaseJob.KIND_EXTRACT, '7')
+        self.assertTrue(created)
+        self.assertFalse(created_again)
+        self.assertEqual(job.pk, again.pk)
+
+    def test_claim_prefers_jobs_without_a_model(self, _):
+        summary, _ = jobs.submit_job(CaseJob.KIND_SUMMARIZE, 7)
+        extract, _ = jobs.submit_job(CaseJob.KIND_EXTRACT, 7)
+        claimed = jobs.claim_next_job('worker-1')
+        self.assertEqual(claimed.pk, extract.pk)
+        self.assertEqual((claimed.status, claimed.attempts, claimed.worker), (CaseJob.STATUS_RUNNING, 1, 'worker-1'))
+        self.assertEqual(jobs.claim_next_job('worker-2').pk, summary.pk)
+        self.assertIsNone(jobs.claim_next_job('worker-3'))
+
+    def test_failure_backs_off_then_fails(self, _):
+        job, _ = jobs.submit_job(CaseJob.KIND_EXTRACT, 7)
+        with mock.patch('novathon.jobs.extract_text_from_pdf', return_value=(None, 'Ollama is down')):
+            job = jobs.run_job(jobs.claim_next_job('worker'))
+            self.assertEqual(job.status, CaseJob.STATUS_QUEUED)
+            self.assertGreater(job.not_before, timezone.now() + timedelta(seconds=25))
+            self.assertIsNone(jobs.claim_next_job('worker'))
+
+            CaseJob.objects.filter(pk=job.pk).update(not_before=timezone.now())
+            job = jobs.run_job(jobs.claim_next_job('worker'))
+        self.assertEqual((job.status, job.attempts, job.error), (CaseJob.STATUS_FAILED, 2, 'Ollama is down'))
+
+        job, _ = jobs.submit_job(CaseJob.KIND_EXTRACT, 7)
+        self.assertEqual((job.status, job.attempts), (CaseJob.STATUS_QUEUED, 0))
+
+    def test_done_job_is_requeued_when_the_file_changes(self, _):
+        jobs.submit_job(CaseJob.KIND_EXTRACT, 7)
+        with mock.patch('novathon.jobs.extract_text_from_pdf', return_value=('FIR text', None)):
+            job = jobs.run_job(jobs.claim_next_job('worker'))
+        self.assertEqual((job.status, job.result['text']), (CaseJob.STATUS_DONE, 'FIR text'))
+        self.assertEqual(jobs.submit_job(CaseJob.KIND_EXTRACT, 7)[0].status, CaseJob.STATUS_DONE)
+
+        with open(self.pdf, 'w') as file:
+            file.write('a corrected scan')
+        job, _ = jobs.submit_job(CaseJob.KIND_EXTRACT, 7)
+        self.assertEqual((job.status, job.result), (CaseJob.STATUS_QUEUED, None))
+
+    def test_stale_running_jobs_are_requeued(self, _):
+        jobs.submit_job(CaseJob.KIND_EXTRACT, 7)
+        job = jobs.claim_next_job('worker')
+        CaseJob.objects.filter(pk=job.pk).update(started_at=timezone.now() - timedelta(hours=1))
+        self.assertEqual(jobs.requeue_stale_jobs(stale_after=60), (1, 0))
+        self.assertEqual(jobs.claim_next_job('worker').pk, job.pk)
+
+        CaseJob.objects.filter(pk=job.pk).update(started_at=timezone.now() - timedelta(hours=1))
+        self.assertEqual(jobs.requeue_stale_jobs(stale_after=60), (0, 1))
+        self.assertEqual(CaseJob.objects.get(pk=job.pk).status, CaseJob.STATUS_FAILED)
+
+
+class SharedMilvusConnectionTests(TestCase):
+    def setUp(self):
+        self.connections = FakeConnections()
+        collections = build_fake_collections(
+            os.path.join(settings.BASE_DIR, 'novathon', 'data', 'case_files_data.csv'),
+            settings.IPC_SECTIONS_CSV,
+            FakeLatency(embed_ms=0, search_ms=0, llm_ms=0),
+            self.connections
+        )
+        for patcher in (
+            mock.patch.object(milvus_connection, 'connect', self.connections.connect),
+            mock.patch.object(milvus_connection, 'disconnect', self.connections.disconnect),
+            mock.patch.object(milvus_connection, 'open_collection', lambda name: collections[name]),
+            mock.patch.object(embedders, '_embedder', FakeEmbedder()),
+            mock.patch.object(case_searcher, '_searcher', None),
+            mock.patch.object(views, '_ipc_handler', None),
+            mock.patch('novathon.views.generate', return_value='advice'),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def search(self):
+        return self.client.post('/search_case_files/', {'query': 'stolen phone'}, content_type='application/json')
+
+    def test_fake_collections_need_a_connection(self):
+        self.connections.connect()
+        self.assertEqual(self.search().status_code, 200)
+        self.connections.disconnect('default')
+        self.assertEqual(self.search().status_code, 500)
+
+    def test_legal_analysis_keeps_the_shared_connection(self):
+        self.assertEqual(self.search().status_code, 200)
+        for _ in range(2):
+            response = self.client.post('/legal-analysis/', {'query': 'someone stole my phone'},
+                                        content_type='application/json')
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual((response.json()['route'], response.json()['legal_analysis']), ('semantic', 'advice'))
+        self.assertEqual(self.search().status_code, 200)
+        self.assertIs(views.get_ipc_handler(), views.get_ipc_handler())
@@ -0,0 +1,84 @@
+"""
+Summaries of the LLMUsage ledger for capacity planning
+"""
+from collections import defaultdict
+
+import numpy as np
+from django.db.models import Avg, Count, Q, Sum
+from django.db.models.functions import TruncDate
+
+from .models import LLMUsage
+
+PERCENTILES = (50, 90, 99)
+
+# Ledger columns summarized as percentiles
+LATENCY_FIELDS = ('queue_wait_ms', 'time_to_first_token_ms', 'total_ms', 'tokens_per_second')
+
+
+def _percentiles(values):
+    values = [value for value in values if value is not None]
+    if not values:
+        return None
+    return dict(zip(PERCENTILES, np.percentile(values, PERCENTILES).round(1).tolist()))
+
+
+def model_percentiles(usage):
+    """
+    Per-model call counts and latency/throughput percentiles
+
+    Only the numeric columns are read, one model at a time, so large ledgers
+    are summarized without loading whole rows.
+
+    :param usage: LLMUsage queryset (already filtered by date, task...)
+    :return: {model: {'calls', 'errors', 'reloads', 'prompt_tokens', 'completion_tokens',
+                      field: {percentile: value}}}
+    """
+    summary = {}
+    totals = usage.values('model').annotate(
+        calls=Count('id'),
+        errors=Count('id', filter=Q(outcome=LLMUsage.OUTCOME_ERROR)),
+        reloads=Count('id', filter=Q(reloaded=True)),
+        prompt_tokens=Sum('prompt_tokens'),
+        completion_tokens=Sum('completion_tokens'),
+    ).order_by('model')
+
+    for row in totals:
+        model = row.pop('model')
+        ok = usage.filter(model=model, outcome=LLMUsage.OUTCOME_OK)
+        columns = list(zip(*ok.values_list(*LATENCY_FIELDS).iterator())) or [()] * len(LATENCY_FIELDS)
+        summary[model] = dict(row, **{field: _percentiles(values) for field, values in zip(LATENCY_FIELDS, columns)})
+    return summary
+
+
+def task_costs(usage):
+    """Average tokens and time to first token per task and prompt version"""
+    return list(usage.filter(outcome=LLMUsage.OUTCOME_OK).values('task', 'prompt_version').annotate(
+        calls=Count('id'),
+        avg_prompt_tokens=Avg('prompt_tokens'),
+        avg_completion_tokens=Avg('completion_tokens'),
+        avg_time_to_first_token_ms=Avg('time_to_first_token_ms'),
+    ).order_by('-avg_prompt_tokens'))
+
+
+def daily_throughput(usage):
+    """
+    Calls and tokens per day and model
+
+    :return: {date: {model: {'calls', 'prompt_tokens', 'completion_tokens', 'busy_seconds'}}}
+    """
+    days = defaultdict(dict)
+    rows = usage.annotate(day=TruncDate('created_at')).values('day', 'model').annotate(
+        calls=Count('id'),
+        prompt_tokens=Sum('prompt_tokens'),
+        completion_tokens=Sum('completion_tokens'),
+        busy_ms=Sum('total_ms'),
+    ).order_by('day', 'model')
+    for row in rows:
+        days[row['day']][row['model']] = {
+            'calls': row['calls'],
+            'prompt_tokens': row['prompt_tokens'] or 0,
+            'completion_tokens': row['completion_tokens'] or 0,
+            # Time Ollama spent on this model's calls; against 86400 it shows how busy a host is
+            'busy_seconds': round((row['busy_ms'] or 0) / 1000, 1),
+        }
+    return dict(days)
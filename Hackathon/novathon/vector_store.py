@@ -0,0 +1,228 @@
+import os
+import shutil
+import threading
+import time
+
+import numpy as np
+
+# Default location of the full-precision case embeddings, next to manage.py
+DEFAULT_CASE_FILES_STORE = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'vector_store', 'case_files'
+)
+
+IDS_FILE = 'ids.npy'
+VECTORS_FILE = 'vectors.npy'
+
+# Each write goes to a new versions/<name>/ directory holding both files;
+# CURRENT names the live one and is switched with a single os.replace, so a
+# reader never pairs new ids with old vectors
+CURRENT_FILE = 'CURRENT'
+VERSIONS_DIR = 'versions'
+
+
+def current_version(path):
+    """Name of the live version, or None (no store, or one written before versioning)"""
+    try:
+        with open(os.path.join(path, CURRENT_FILE), encoding='utf-8') as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def store_files_dir(path):
+    """
+    Directory holding the live ids.npy and vectors.npy
+
+    :return: The current version's directory, the store directory itself for
+             unversioned stores, or None if nothing has been written
+    """
+    version = current_version(path)
+    if version is not None:
+        return os.path.join(path, VERSIONS_DIR, version)
+    if os.path.exists(os.path.join(path, VECTORS_FILE)):
+        return path
+    return None
+
+
+class MmapVectorStore:
+    """
+    Read-only float32 vectors keyed by integer id, backed by memory-mapped .npy files
+
+    Rows are stored sorted by id so lookups are a binary search. The files are
+    opened with mmap, so every worker process on a host shares the same page
+    cache instead of holding its own copy of the matrix.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.version = current_version(path)
+        files_dir = os.path.join(path, VERSIONS_DIR, self.version) if self.version else path
+        self.ids = np.load(os.path.join(files_dir, IDS_FILE), mmap_mode='r')
+        self.vectors = np.load(os.path.join(files_dir, VECTORS_FILE), mmap_mode='r')
+        self.mtime = os.path.getmtime(os.path.join(files_dir, VECTORS_FILE))
+
+    @property
+    def dim(self):
+        return self.vectors.shape[1]
+
+    def __len__(self):
+        return len(self.ids)
+
+    @staticmethod
+    def write(path, ids, vectors):
+        """
+        Write a new store, replacing any existing one atomically
+
+        :param path: Store directory
+        :param ids: Sequence of integer ids
+        :param vectors: Matching 2-D array-like of vectors
+        """
+        ids = np.asarray(ids, dtype=np.int64)
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if vectors.ndim != 2 or len(ids) != len(vectors):
+            raise ValueError("Expected one vector per id")
+
+        order = np.argsort(ids, kind='stable')
+        version = f'v{time.time_ns()}'
+        version_dir = os.path.join(path, VERSIONS_DIR, version)
+        os.makedirs(version_dir)
+
+        for file_name, array in ((IDS_FILE, ids[order]), (VECTORS_FILE, vectors[order])):
+            out = np.lib.format.open_memmap(
+                os.path.join(version_dir, file_name), mode='w+', dtype=array.dtype, shape=array.shape
+            )
+            out[:] = array
+            out.flush()
+            del out
+
+        # Switch readers to the new pair in one step
+        previous = current_version(path)
+        tmp_path = os.path.join(path, f'.{CURRENT_FILE}.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(version)
+        os.replace(tmp_path, os.path.join(path, CURRENT_FILE))
+        MmapVectorStore.prune(path, keep=(version, previous))
+
+    @staticmethod
+    def prune(path, keep):
+        """
+        Delete old versions and unversioned files
+
+        The previous version is kept for readers that read CURRENT just before
+        the switch; open memory maps stay valid after their files are deleted.
+        """
+        for file_name in (IDS_FILE, VECTORS_FILE):
+            if os.path.exists(os.path.join(path, file_name)):
+                os.remove(os.path.join(path, file_name))
+        with os.scandir(os.path.join(path, VERSIONS_DIR)) as entries:
+            for entry in entries:
+                if entry.is_dir() and entry.name not in keep:
+                    shutil.rmtree(entry.path, ignore_errors=True)
+
+    @staticmethod
+    def remove(path):
+        """
+        Drop the store so readers see none (open_vector_store returns None)
+
+        Other files in the directory (field stats, name index) are left alone;
+        open memory maps stay valid after their files are deleted.
+        """
+        for file_name in (CURRENT_FILE, IDS_FILE, VECTORS_FILE):
+            if os.path.exists(os.path.join(path, file_name)):
+                os.remove(os.path.join(path, file_name))
+        shutil.rmtree(os.path.join(path, VERSIONS_DIR), ignore_errors=True)
+
+    @staticmethod
+    def update(path, ids, vectors, removed_ids=()):
+        """
+        Add or replace vectors by id and drop removed ids, rewriting the store atomically
+
+        Costs one copy of the store on disk, not a re-embedding of the other rows.
+
+        :param path: Store directory (created if missing)
+        :param ids: Ids to add or replace
+        :param vectors: Matching vectors
+        :param removed_ids: Ids to drop (ids also present in ids are kept with their new vector)
+        """
+        ids = np.asarray(ids, dtype=np.int64)
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if store_files_dir(path) is None:
+            MmapVectorStore.write(path, ids, vectors.reshape(len(ids), -1))
+            return
+
+        store = MmapVectorStore(path)
+        if len(ids) and vectors.shape[-1] != store.dim:
+            raise ValueError(f"Expected {store.dim}-dim vectors, got {vectors.shape[-1]}")
+
+        vectors = vectors.reshape(len(ids), store.dim)
+
+        replaced = np.concatenate([ids, np.asarray(removed_ids, dtype=np.int64)])
+        keep = ~np.isin(store.ids, replaced)
+        MmapVectorStore.write(
+            path,
+            np.concatenate([store.ids[keep], ids]),
+            np.concatenate([store.vectors[keep], vectors])
+        )
+
+    def lookup(self, ids):
+        """
+        Fetch vectors for the given ids
+
+        :param ids: Sequence of integer ids
+        :return: (found_ids, vectors) for the ids present in the store
+        """
+        ids = np.asarray(ids, dtype=np.int64)
+        if len(self.ids) == 0 or len(ids) == 0:
+            return ids[:0], np.empty((0, self.dim), dtype=np.float32)
+
+        positions = np.searchsorted(self.ids, ids)
+        positions = np.clip(positions, 0, len(self.ids) - 1)
+        found = self.ids[positions] == ids
+        return ids[found], self.vectors[positions[found]]
+
+    def rerank(self, query, candidate_ids, top_k):
+        """
+        Rank candidates exactly by squared L2 distance to the query
+
+        :param query: Full-precision query vector
+        :param candidate_ids: Ids returned by the approximate search
+        :param top_k: Number of results to keep
+        :return: List of (id, distance) tuples, closest first
+        """
+        found_ids, candidates = self.lookup(candidate_ids)
+        if len(found_ids) == 0:
+            return []
+
+        query = np.asarray(query, dtype=np.float32)
+        diff = candidates - query
+        distances = np.einsum('ij,ij->i', diff, diff)
+
+        top_k = min(top_k, len(found_ids))
+        best = np.argpartition(distances, top_k - 1)[:top_k]
+        best = best[np.argsort(distances[best], kind='stable')]
+        return [(int(found_ids[i]), float(distances[i])) for i in best]
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def open_vector_store(path):
+    """
+    Return the process-wide store for a path, or None if it has not been built
+
+    The store is reopened when a new version is written.
+    """
+    files_dir = store_files_dir(path)
+    if files_dir is None:
+        return None
+
+    version = current_version(path)
+    with _stores_lock:
+        store = _stores.get(path)
+        if store is None or store.version != version or (
+            version is None and store.mtime != os.path.getmtime(os.path.join(files_dir, VECTORS_FILE))
+        ):
+            store = MmapVectorStore(path)
+            _stores[path] = store
+        return store
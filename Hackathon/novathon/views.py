@@ -1,21 +1,55 @@
 from django.views import View
-import os,json,ollama
-from PyPDF2 import PdfReader
+import os,csv,json,time,threading
+from django.conf import settings
 from django.shortcuts import render
-from django.http import JsonResponse
+from django.http import HttpResponseNotModified, JsonResponse, StreamingHttpResponse
 from django.views.decorators.csrf import csrf_exempt
-from pymilvus import connections, Collection
-from llmware.models import ModelCatalog
-from .case_searcher import CaseFileSearcher  # Assuming your provided code is saved as case_searcher.py in the same app directory
+from .context_packer import pack_documents
+from .case_searcher import OUTPUT_FIELDS, NameFilterTooBroad, get_case_searcher  # Assuming your provided code is saved as case_searcher.py in the same app directory
+from .index_planner import DEFAULT_PROFILE, SEARCH_PROFILES, get_index_params, plan_search_params
 from django.shortcuts import get_object_or_404
-from django.core.exceptions import ObjectDoesNotExist
-from .models import RenamedCaseFile  # Make sure the model is imported
+from django.urls import reverse
+from .models import CaseJob, RenamedCaseFile  # Make sure the model is imported
 from .llllmware import interact_with_model
-from django.views.decorators.http import require_POST
+from . import milvus_connection
+from .llm import generate, llm_metrics
+from .prompts import LEGAL_ADVISOR_SYSTEM_PROMPT, legal_analysis_prompt
+from .summarize import summarize_documents
+from django.views.decorators.http import require_POST, require_http_methods
+from .deadlines import Deadline, DeadlineExceeded, ExecutorFull, defer_result, get_deferred_result, get_llm_executor
+from .downloads import resolve_file_path, serve_file
+from .pdf_text import extract_text_from_pdf
+from .embedders import get_embedder
+from .facets import TYPEAHEAD_FIELDS, get_facet_index
+from .ipc_index import get_ipc_index
+from .jobs import job_payload, submit_job
+from .knn_graph import open_knn_graph
+from .name_index import NAME_MATCH_MODES
+
+# Bulk export formats: content type and file extension
+EXPORT_FORMATS = {
+    'ndjson': ('application/x-ndjson', 'ndjson'),
+    'csv': ('text/csv', 'csv'),
+}
+
+def parse_bool(value):
+    """JSON booleans, 0/1 and the strings true/false/yes/no/on/off (any case)"""
+    if isinstance(value, bool) or value is None:
+        return bool(value)
+    if isinstance(value, int) and value in (0, 1):
+        return bool(value)
+    if isinstance(value, str):
+        lowered = value.strip().lower()
+        if lowered in ('1', 'true', 'yes', 'on'):
+            return True
+        if lowered in ('', '0', 'false', 'no', 'off'):
+            return False
+    raise ValueError(f'Not a boolean: {value!r}')
+
 @csrf_exempt
 def search_case_files_view(request):
-    # Initialize the searcher
-    case_searcher = CaseFileSearcher()
+    # Process-wide searcher; connects and loads partitions on the first request only
+    case_searcher = get_case_searcher()
 
     # Extract parameters from request body
     if request.method == 'POST':
@@ -30,6 +64,9 @@ def search_case_files_view(request):
         police_station = data.get('police_station', None)
         crime_type = data.get('crime_type', None)
         top_k = data.get('top_k', 5)
+        profile = data.get('profile', DEFAULT_PROFILE)
+        rerank = data.get('rerank', False)
+        name_match = data.get('name_match', 'exact')
     else:
         return JsonResponse({'error': 'Only POST method is allowed'}, status=405)
 
@@ -43,8 +80,22 @@ def search_case_files_view(request):
     # Convert top_k to integer if it exists
     try:
         top_k = int(top_k)
-    except ValueError:
+    except (TypeError, ValueError):
         return JsonResponse({'error': 'Invalid top_k parameter'}, status=400)
+    if top_k < 1:
+        # Otherwise the exact-scan and ANN paths would each fail in their own way
+        return JsonResponse({'error': 'top_k must be at least 1'}, status=400)
+
+    if profile not in SEARCH_PROFILES:
+        return JsonResponse({'error': 'Invalid profile parameter'}, status=400)
+
+    try:
+        rerank = parse_bool(rerank)
+    except ValueError:
+        return JsonResponse({'error': 'Invalid rerank parameter'}, status=400)
+
+    if name_match not in NAME_MATCH_MODES:
+        return JsonResponse({'error': 'Invalid name_match parameter'}, status=400)
 
     # Perform the search
     try:
@@ -54,41 +105,123 @@ def search_case_files_view(request):
             criminal_name=criminal_name,
             police_station=police_station,
             crime_type=crime_type,
-            top_k=top_k
+            top_k=top_k,
+            profile=profile,
+            rerank=rerank,
+            name_match=name_match
         )
+    except NameFilterTooBroad as e:
+        # A prefix/fuzzy name filter too broad to express
+        return JsonResponse({'error': str(e)}, status=400)
     except Exception as e:
         return JsonResponse({'error': str(e)}, status=500)
 
-    # Add file path to each result
-    enriched_results = []
-    for result in results:
-        case_file_id = result.get('case_file_id')
-        try:
-            renamed_case_file = RenamedCaseFile.objects.get(case_id=case_file_id)
-            result['file_path'] = renamed_case_file.file_path
-        except ObjectDoesNotExist:
-            result['file_path'] = None  # If file path is not found, set it as None
-
-        enriched_results.append(result)
+    # Add file path to each result (None if the PDF is not catalogued)
+    enriched_results = attach_file_paths(results)
 
     # Return the enriched results as JSON
     return JsonResponse({'results': enriched_results}, safe=False)
 
-def extract_text_from_pdf(file_path):
+def attach_file_paths(case_files):
+    """Set 'file_path' on each case file dict with one RenamedCaseFile query"""
+    file_paths = dict(RenamedCaseFile.objects.filter(
+        case_id__in=[str(case_file['case_file_id']) for case_file in case_files]
+    ).values_list('case_id', 'file_path'))
+    for case_file in case_files:
+        case_file['file_path'] = file_paths.get(str(case_file['case_file_id']))
+    return case_files
+
+class Echo:
+    """File-like object whose write() hands the value back, for streaming csv.writer output"""
+
+    def write(self, value):
+        return value
+
+class ClosingContent:
     """
-    Extract text from a PDF file.
+    Streaming response content that closes its source along with the response
+
+    Django closes the response (and so this) when the client goes away, even
+    before the first chunk, when a wrapping generator would never have started.
     """
-    if not os.path.exists(file_path):
-        return None, f"File not found: {file_path}"
-    
+
+    def __init__(self, chunks, source):
+        self.chunks = chunks
+        self.source = source
+
+    def __iter__(self):
+        return iter(self.chunks)
+
+    def close(self):
+        try:
+            self.chunks.close()
+        finally:
+            self.source.close()
+
+@csrf_exempt
+@require_http_methods(["GET", "POST"])
+def export_case_files_view(request):
+    """
+    View to stream every case file matching the search filters as NDJSON or CSV.
+    """
+    if request.method == 'POST':
+        try:
+            data = json.loads(request.body)
+        except ValueError:
+            return JsonResponse({'error': 'Invalid JSON'}, status=400)
+    else:
+        data = request.GET
+
+    export_format = data.get('format', 'ndjson')
+    if export_format not in EXPORT_FORMATS:
+        return JsonResponse({'error': 'Invalid format parameter'}, status=400)
+
+    name_match = data.get('name_match', 'exact')
+    if name_match not in NAME_MATCH_MODES:
+        return JsonResponse({'error': 'Invalid name_match parameter'}, status=400)
+
     try:
-        reader = PdfReader(file_path)
-        text = ""
-        for page in reader.pages:
-            text += page.extract_text()  # Extract text from each page
-        return text.strip(), None
+        year = int(data['year']) if data.get('year') else None
+        limit = int(data['limit']) if data.get('limit') not in (None, '') else None
+    except ValueError:
+        return JsonResponse({'error': 'Invalid year or limit parameter'}, status=400)
+    if limit is not None and limit < 1:
+        return JsonResponse({'error': 'limit must be at least 1'}, status=400)
+
+    try:
+        batches = get_case_searcher().iter_case_files(
+            year=year,
+            criminal_name=data.get('criminal_name'),
+            police_station=data.get('police_station'),
+            crime_type=data.get('crime_type'),
+            name_match=name_match,
+            limit=limit
+        )
+    except NameFilterTooBroad as e:
+        return JsonResponse({'error': str(e)}, status=400)
     except Exception as e:
-        return None, str(e)
+        # Connection and query errors surface here, before any row is sent
+        return JsonResponse({'error': str(e)}, status=500)
+
+    def ndjson_rows():
+        for batch in batches:
+            yield ''.join(json.dumps(case_file) + '\n' for case_file in attach_file_paths(batch))
+
+    def csv_rows():
+        fields = OUTPUT_FIELDS + ['file_path']
+        writer = csv.DictWriter(Echo(), fieldnames=fields)
+        yield writer.writeheader()
+        for batch in batches:
+            yield ''.join(writer.writerow(case_file) for case_file in attach_file_paths(batch))
+
+    # Only one batch is ever in memory; the response is written as batches arrive
+    content_type, extension = EXPORT_FORMATS[export_format]
+    rows = ndjson_rows() if export_format == 'ndjson' else csv_rows()
+    # The response closes the batches, releasing the query iterator and partition leases
+    response = StreamingHttpResponse(ClosingContent(rows, batches), content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="case_files.{extension}"'
+    response['X-Accel-Buffering'] = 'no'
+    return response
 
 def get_file_text(request, case_id):
     """
@@ -96,16 +229,21 @@ def get_file_text(request, case_id):
     """
     # Get the RenamedCaseFile object or return 404
     renamed_case_file = get_object_or_404(RenamedCaseFile, case_id=case_id)
+
+    # ?async=1 queues the summary for a run_jobs worker instead of waiting for it
+    if request.GET.get('async') in ('1', 'true'):
+        job, _ = submit_job(CaseJob.KIND_SUMMARIZE, case_id)
+        return job_accepted_response(job)
     
     # Extract file_path from the model
     file_path = renamed_case_file.file_path
     
     # Extract text from the file
     extracted_text, error = extract_text_from_pdf(file_path)
-    print(extracted_text)
-    summarizer=interact_with_model(context=extracted_text)
     if error:
         return JsonResponse({"error": error}, status=400)
+
+    summarizer=interact_with_model(context=extracted_text)
     
     return JsonResponse({
         "case_id": case_id,
@@ -113,32 +251,261 @@ def get_file_text(request, case_id):
         "extracted_text": summarizer
     })
 
+def job_accepted_response(job):
+    payload = job_payload(job)
+    payload['url'] = reverse('job_status', args=[job.id])
+    payload['stream_url'] = reverse('job_stream', args=[job.id])
+    return JsonResponse(payload, status=200 if job.status == CaseJob.STATUS_DONE else 202)
+
+@csrf_exempt
+@require_POST
+def submit_job_view(request):
+    """
+    View to queue a summarization or text extraction job and return its id at once.
+
+    Expected JSON payload:
+    {
+        "kind": "summarize" | "extract",
+        "case_id": "12"
+    }
+    """
+    try:
+        data = json.loads(request.body)
+    except ValueError:
+        return JsonResponse({"error": "Invalid JSON"}, status=400)
+
+    kind = data.get('kind', CaseJob.KIND_SUMMARIZE)
+    case_id = data.get('case_id')
+    if kind not in dict(CaseJob.KIND_CHOICES):
+        return JsonResponse({"error": "Invalid kind parameter"}, status=400)
+    if not case_id:
+        return JsonResponse({"error": "No case_id provided"}, status=400)
+    if not RenamedCaseFile.objects.filter(case_id=str(case_id)).exists():
+        return JsonResponse({"error": f"Unknown case id {case_id}"}, status=404)
+
+    job, _ = submit_job(kind, case_id)
+    return job_accepted_response(job)
+
+@require_http_methods(["GET"])
+def job_status_view(request, job_id):
+    """
+    View to poll a job's status; the result is included once it is done.
+    """
+    job = get_object_or_404(CaseJob, id=job_id)
+    return JsonResponse(job_payload(job))
+
+@require_http_methods(["GET"])
+def job_stream_view(request, job_id):
+    """
+    View to follow a job as server-sent events until it finishes or the stream times out.
+
+    Each stream is a short long-poll (JOBS['STREAM_SECONDS']) because it ties
+    up a sync worker; clients reconnect until they see a done or failed status.
+    """
+    job = get_object_or_404(CaseJob, id=job_id)
+
+    def events():
+        deadline = time.monotonic() + settings.JOBS['STREAM_SECONDS']
+        last_status = None
+        current = job
+        # EventSource reconnects on its own after this delay when the stream ends
+        yield f"retry: {settings.JOBS['STREAM_RETRY_MS']}\n\n"
+        while True:
+            if current.status != last_status:
+                last_status = current.status
+                yield f"event: status\ndata: {json.dumps(job_payload(current))}\n\n"
+            if current.status in (CaseJob.STATUS_DONE, CaseJob.STATUS_FAILED) or time.monotonic() > deadline:
+                return
+            time.sleep(settings.JOBS['POLL_INTERVAL_SECONDS'])
+            current = CaseJob.objects.get(id=job_id)
+
+    response = StreamingHttpResponse(events(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+@csrf_exempt
+@require_POST
+def summarize_case_files_view(request):
+    """
+    View to summarize one or more case files with map-reduce.
+
+    Expected JSON payload:
+    {
+        "case_id": "12"            (or)
+        "case_ids": ["12", "15"]
+    }
+    """
+    try:
+        data = json.loads(request.body)
+    except ValueError:
+        return JsonResponse({"error": "Invalid JSON"}, status=400)
+
+    case_ids = data.get('case_ids')
+    if case_ids is None and data.get('case_id') is not None:
+        case_ids = [data['case_id']]
+    if not isinstance(case_ids, list) or not case_ids:
+        return JsonResponse({"error": "Provide case_id or a non-empty case_ids list"}, status=400)
+
+    case_ids = list(dict.fromkeys(str(case_id) for case_id in case_ids))
+    if len(case_ids) > settings.LLM['SUMMARY']['MAX_CASES']:
+        return JsonResponse({"error": f"At most {settings.LLM['SUMMARY']['MAX_CASES']} cases per request"}, status=400)
+
+    # One query for every requested case
+    file_paths = dict(RenamedCaseFile.objects.filter(case_id__in=case_ids).values_list('case_id', 'file_path'))
+    missing = [case_id for case_id in case_ids if case_id not in file_paths]
+    if missing:
+        return JsonResponse({"error": "Unknown case ids", "case_ids": missing}, status=404)
+
+    documents = {}
+    for case_id in case_ids:
+        text, error = extract_text_from_pdf(file_paths[case_id])
+        if error:
+            return JsonResponse({"error": error, "case_id": case_id}, status=400)
+        documents[case_id] = text
+
+    try:
+        result = summarize_documents(documents)
+    except Exception as e:
+        return JsonResponse({"error": f"Error during summarization: {str(e)}"}, status=500)
+
+    return JsonResponse({"case_ids": case_ids, **result})
+
+@require_http_methods(["GET", "HEAD"])
+def download_case_file(request, case_id):
+    """
+    View to stream the raw PDF for a case_id, with Range and conditional request support.
+    """
+    renamed_case_file = get_object_or_404(RenamedCaseFile, case_id=case_id)
+    file_path = resolve_file_path(renamed_case_file.file_path)
+
+    if not os.path.exists(file_path):
+        return JsonResponse({"error": f"File not found: {renamed_case_file.file_path}"}, status=404)
+
+    return serve_file(request, file_path)
+
+def facet_response(request, facet_index, payload):
+    """
+    JSON response tagged with the stats version, so clients can revalidate cheaply
+    """
+    etag = f'"facets-{facet_index.version}"'
+    if request.headers.get('If-None-Match') == etag:
+        response = HttpResponseNotModified()
+    else:
+        payload['version'] = facet_index.version
+        response = JsonResponse(payload)
+    response['ETag'] = etag
+    response['Cache-Control'] = 'no-cache'
+    return response
+
+@require_http_methods(["GET"])
+def similar_cases_view(request, case_id):
+    """
+    View to return the precomputed nearest neighbours of a case, flagging near-duplicates.
+    """
+    graph = open_knn_graph(settings.CASE_FILES_VECTOR_STORE)
+    if graph is None:
+        return JsonResponse({"error": "Similar cases have not been computed; run build_knn_graph"}, status=503)
+
+    try:
+        top_k = int(request.GET.get('top_k', graph.meta['k']))
+    except ValueError:
+        return JsonResponse({"error": "Invalid top_k parameter"}, status=400)
+    if top_k < 1:
+        return JsonResponse({"error": "top_k must be at least 1"}, status=400)
+
+    try:
+        # The graph only holds k neighbours per case
+        neighbors = graph.similar(case_id, top_k=min(top_k, graph.meta['k']),
+                                  duplicate_threshold=settings.CASE_FILES_NEAR_DUPLICATE_SIMILARITY)
+    except ValueError:
+        return JsonResponse({"error": "Invalid case_id parameter"}, status=400)
+
+    if neighbors is None:
+        return JsonResponse({"error": f"Case {case_id} is not in the similar-cases graph"}, status=404)
+
+    # One lookup for every neighbour's file path
+    attach_file_paths(neighbors)
+
+    return JsonResponse({
+        "case_id": case_id,
+        "built_at": graph.meta['built_at'],
+        "similar_cases": neighbors,
+        "near_duplicates": [neighbor['case_file_id'] for neighbor in neighbors if neighbor['near_duplicate']]
+    })
+
+@require_http_methods(["GET"])
+def facets_view(request):
+    """
+    View to return year, police station and crime type counts for the current filters.
+    """
+    facet_index = get_facet_index(settings.CASE_FILES_VECTOR_STORE)
+    if facet_index is None:
+        return JsonResponse({"error": "Facet counts are not available until case files are loaded"}, status=503)
+
+    selected = {}
+    for field in ('year', 'police_station', 'crime_type'):
+        value = request.GET.get(field)
+        if value:
+            selected[field] = value
+
+    if 'year' in selected:
+        try:
+            selected['year'] = int(selected['year'])
+        except ValueError:
+            return JsonResponse({"error": "Invalid year parameter"}, status=400)
+
+    total, facets = facet_index.facet_counts(selected)
+    return facet_response(request, facet_index, {"selected": selected, "total": total, "facets": facets})
+
+@require_http_methods(["GET"])
+def facet_typeahead_view(request):
+    """
+    View to complete a filter value from its prefix, without running a search.
+    """
+    field = request.GET.get('field')
+    prefix = request.GET.get('prefix', '')
+    if field not in TYPEAHEAD_FIELDS:
+        return JsonResponse({"error": "Invalid field parameter"}, status=400)
+
+    try:
+        limit = min(int(request.GET.get('limit', 10)), 100)
+    except ValueError:
+        return JsonResponse({"error": "Invalid limit parameter"}, status=400)
+    if limit < 1:
+        return JsonResponse({"error": "limit must be at least 1"}, status=400)
+
+    facet_index = get_facet_index(settings.CASE_FILES_VECTOR_STORE)
+    if facet_index is None:
+        return JsonResponse({"error": "Facet counts are not available until case files are loaded"}, status=503)
+
+    suggestions = facet_index.typeahead(field, prefix, limit)
+    return facet_response(request, facet_index, {"field": field, "prefix": prefix, "suggestions": suggestions})
+
 
 
 
 
 class MilvusOllamaHandler:
     def __init__(self, collection_name='ipc_sections', host='localhost', port='19530'):
-        connections.connect(host=host, port=port)
-        self.collection = Collection(collection_name)
+        # The "default" alias is shared with the case searcher, so it is never disconnected here
+        milvus_connection.connect(host=host, port=port)
+        self.collection = milvus_connection.open_collection(collection_name)
         self.collection.load()
+        self.index_params = get_index_params(self.collection, 'embedding')
 
     def generate_embedding(self, text):
-        """Generate embedding using Ollama's mxbai-embed-large model"""
-        response = ollama.embeddings(
-            model='mxbai-embed-large',
-            prompt=text
-        )
-        return response['embedding']
+        """Generate a full-width mxbai-embed-large embedding with the configured backend"""
+        return get_embedder().encode(text, dim=None)
 
-    def search_similar(self, query_text, top_k=5):
+    def search_similar(self, query_text, top_k=5, profile=DEFAULT_PROFILE):
         """Search for similar documents based on query"""
-        query_embedding = self.generate_embedding(query_text)
+        return self.search_by_embedding(self.generate_embedding(query_text), top_k=top_k, profile=profile)
 
-        search_params = {
-            "metric_type": "L2",
-            "params": {"nprobe": 10}
-        }
+    def search_by_embedding(self, query_embedding, top_k=5, profile=DEFAULT_PROFILE):
+        """Search for similar documents given an already computed query embedding"""
+        # Derive params from the actual index (HNSW takes ef, IVF takes nprobe)
+        search_params = plan_search_params(self.index_params, top_k=top_k, profile=profile)
 
         results = self.collection.search(
             data=[query_embedding],
@@ -162,9 +529,28 @@ class MilvusOllamaHandler:
 
         return similar_docs
 
-    def close(self):
-        """Close Milvus connection"""
-        connections.disconnect("default")
+_ipc_handler = None
+_ipc_handler_lock = threading.Lock()
+
+def get_ipc_handler():
+    """
+    Process-wide IPC section handler, connected and loaded on first use like get_case_searcher()
+    """
+    global _ipc_handler
+    if _ipc_handler is None:
+        with _ipc_handler_lock:
+            if _ipc_handler is None:
+                _ipc_handler = MilvusOllamaHandler()
+    return _ipc_handler
+
+def run_legal_analysis(query, results, timeout=None):
+    """Ask the chat model for advice on the retrieved IPC sections"""
+    # The closest sections, deduplicated and cut to the context budget
+    context = pack_documents(results, settings.LLM['CONTEXT_TOKENS']['legal_analysis'])
+
+    # The guidelines are a fixed system prompt so Ollama can reuse their evaluated tokens
+    llm_prompt = legal_analysis_prompt(query, context.text)
+    return generate("legal_analysis", llm_prompt, system=LEGAL_ADVISOR_SYSTEM_PROMPT, timeout=timeout)
 
 @csrf_exempt
 @require_POST
@@ -174,83 +560,102 @@ def legal_analysis_view(request):
     
     Expected JSON payload:
     {
-        "query": "crime description here"
+        "query": "crime description here",
+        "timeout": 10  (optional, seconds; capped by LEGAL_ANALYSIS_DEADLINE)
     }
+
+    The request deadline is shared out across the embed, search and LLM
+    stages. If the LLM cannot answer in time, the retrieved sections are
+    returned with "partial": true and, when enabled, a link to the analysis.
     """
     try:
         # Parse request body
         data = json.loads(request.body)
         query = data.get('query', '')
+        profile = data.get('profile', DEFAULT_PROFILE)
 
         if not query:
             return JsonResponse({
                 'error': 'No query provided'
             }, status=400)
 
-        # Initialize Milvus-Ollama handler
-        handler = MilvusOllamaHandler()
+        if profile not in SEARCH_PROFILES:
+            return JsonResponse({
+                'error': 'Invalid profile parameter'
+            }, status=400)
 
+        budget = settings.LEGAL_ANALYSIS_DEADLINE
         try:
-            # Search for similar legal documents
-            results = handler.search_similar(query)
+            timeout = min(float(data.get('timeout', budget['TOTAL_SECONDS'])), budget['TOTAL_SECONDS'])
+        except (TypeError, ValueError):
+            timeout = -1
+        if timeout <= 0:
+            return JsonResponse({
+                'error': 'Invalid timeout parameter'
+            }, status=400)
+
+        deadline = Deadline(timeout)
+
+        try:
+            # Explicit section references ("IPC 420") are answered from the
+            # in-memory index; everything else goes through semantic search
+            results = get_ipc_index().route(query)
+            route = 'exact'
+
+            if results is None:
+                # Process-wide Milvus-Ollama handler
+                handler = get_ipc_handler()
+
+                # Search for similar legal documents, each stage within its budget
+                query_embedding = deadline.run('embed', handler.generate_embedding, query,
+                                               cap=budget['EMBED_SECONDS'])
+                results = deadline.run('search', handler.search_by_embedding, query_embedding,
+                                       profile=profile, cap=budget['SEARCH_SECONDS'])
+                route = 'semantic'
 
             if not results:
                 return JsonResponse({
                     'error': 'No similar legal documents found'
                 }, status=404)
 
-            # Register and load Ollama model
-            ModelCatalog().register_ollama_model(
-                model_name="llama3.2:latest",
-                model_type="chat",
-                host="localhost",
-                port=11434,
-                temperature=0
-            )
-            model = ModelCatalog().load_model("llama3.2:latest",temperature=0)
-
-            # Prepare detailed analysis for the first result
-            result = results[0]
-            # print( {result['punishment']})
-            # print(print(f"Description: {result['description']}"))
-            # print(f"offense: {result['offense']}")
-            # print({result['section']})
-            llm_prompt = f"""You are a seasoned legal advisor with expertise in interpreting and referencing legal provisions, specializing in providing accurate and concise guidance on matters related to the Indian Penal Code (IPC).
-
-Guidelines:
-Scope of Advice:
-
-Address only queries related to the Indian Penal Code (IPC) sections provided in the context.
-If a query falls outside the IPC or your scope of expertise, state clearly: "My specialization is limited to legal advice on IPC-related matters."
-Integrity of Response:
-
-If unsure about a particular question, respond with: "I don't know," rather than providing inaccurate information.
-Input Format:
-
-Question: {query}
-Context: Section: IPC {result['section']} (Details include only IPC sections and their descriptions).
-Response Instructions:
-
-Focus solely on the legal aspects relevant to the provided IPC section.
-Ensure the advice is concise, precise, and devoid of extraneous details or unrelated information.
-
-"""
-
-            # LLMWARE 
-            llm_response = model.inference(llm_prompt)
-
-            # Close Milvus connection
-            handler.close()
-
-            # Prepare response
-            return JsonResponse({
+            # Prepare detailed analysis from the retrieved sections
+            response = {
                 'query': query,
+                'route': route,
                 'similar_documents': results,
-                'legal_analysis': llm_response
-            })
+                'partial': False
+            }
+            defer = budget['DEFER_RESULTS']
+            # The Ollama call itself gives up once nobody can use its answer
+            llm_timeout = deadline.remaining() + (budget['DEFERRED_LLM_SECONDS'] if defer else 0)
+            try:
+                response['legal_analysis'] = deadline.run(
+                    'llm', run_legal_analysis, query, results,
+                    timeout=llm_timeout, cancel=not defer, executor=get_llm_executor()
+                )
+            except ExecutorFull:
+                # Every LLM worker is busy (often with deferred analyses); do not queue more
+                response['partial'] = True
+                response['legal_analysis'] = None
+                response['analysis_error'] = 'The analysis model is busy; try again shortly'
+            except DeadlineExceeded as overrun:
+                # Answer with what retrieval found rather than nothing at all
+                response['partial'] = True
+                response['legal_analysis'] = None
+                if defer:
+                    result_id = defer_result(overrun.future, budget['RESULT_TTL_SECONDS'])
+                    response['analysis_url'] = reverse('legal_analysis_result', args=[result_id])
+
+            response['timings_ms'] = deadline.timings
+            return JsonResponse(response)
+
+        except DeadlineExceeded as overrun:
+            return JsonResponse({
+                'error': f'Legal analysis timed out during the {overrun.stage} stage',
+                'timings_ms': deadline.timings
+            }, status=504)
 
         except Exception as search_error:
-            handler.close()
             return JsonResponse({
                 'error': f'Error during search or analysis: {str(search_error)}'
             }, status=500)
@@ -264,3 +669,24 @@ Ensure the advice is concise, precise, and devoid of extraneous details or unrel
             'error': f'Unexpected error: {str(e)}'
         }, status=500)
 
+@require_http_methods(["GET"])
+def legal_analysis_result_view(request, result_id):
+    """
+    View to fetch an analysis that finished after its request's deadline.
+    """
+    deferred = get_deferred_result(result_id)
+    if deferred is None:
+        return JsonResponse({'error': 'Unknown or expired analysis id'}, status=404)
+
+    if deferred['status'] == 'pending':
+        return JsonResponse({'status': 'pending'}, status=202)
+    if deferred['status'] == 'failed':
+        return JsonResponse({'status': 'failed', 'error': deferred['error']}, status=500)
+    return JsonResponse({'status': 'done', 'legal_analysis': deferred['result']})
+
+@require_http_methods(["GET"])
+def llm_metrics_view(request):
+    """
+    View to report per-model request and reload counts, to spot Ollama model thrashing.
+    """
+    return JsonResponse(llm_metrics())
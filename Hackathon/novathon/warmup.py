@@ -0,0 +1,96 @@
+"""
+Optional start-up warm-up for server processes
+
+With STARTUP_WARMUP['ENABLED'], Hackathon/wsgi.py connects to Milvus, loads
+the collections, builds the IPC section index, opens the on-disk indexes and
+makes Ollama load the embedding and chat models before the process serves its
+first request.
+Only processes that load the WSGI application warm up: WSGI server workers,
+and runserver in the process that serves (not its autoreloader). Management
+commands, tests and shells never import it.
+"""
+import logging
+import time
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+def should_warm_up():
+    """Whether warm-up is enabled; only called while loading the WSGI application"""
+    return settings.STARTUP_WARMUP['ENABLED']
+
+
+def warm_milvus():
+    from .case_searcher import get_case_searcher
+    from .field_stats import stats_path
+    from .name_index import get_name_index
+    from .views import get_ipc_handler
+
+    # Connects and loads the preloaded case_files partitions and ipc_sections
+    case_files = get_case_searcher().collection
+    get_ipc_handler()
+
+    # Built from a scan of case_files, which the first fuzzy name search would otherwise pay for
+    get_name_index(case_files, stats_path(settings.CASE_FILES_VECTOR_STORE))
+
+
+def warm_indexes():
+    from .facets import get_facet_index
+    from .ipc_index import get_ipc_index
+    from .knn_graph import open_knn_graph
+    from .vector_store import open_vector_store
+
+    # Parsed from the IPC CSV; other processes build it on their first exact lookup
+    get_ipc_index()
+    open_vector_store(settings.CASE_FILES_VECTOR_STORE)
+    get_facet_index(settings.CASE_FILES_VECTOR_STORE)
+    open_knn_graph(settings.CASE_FILES_VECTOR_STORE)
+
+
+def warm_embedder():
+    from .embedders import get_embedder
+
+    get_embedder().encode('warm up', dim=None)
+
+
+def warm_chat_models():
+    from .llm import model_for, warm_up
+
+    warm_up(sorted({model_for(task) for task in settings.LLM['MODELS']}))
+
+
+STEPS = {
+    'MILVUS': warm_milvus,
+    'INDEXES': warm_indexes,
+    'EMBEDDER': warm_embedder,
+    'CHAT_MODELS': warm_chat_models,
+}
+
+
+def warm_up_process():
+    """
+    Run the warm-up steps enabled in STARTUP_WARMUP
+
+    A failing step is logged and skipped: a process whose Milvus or Ollama is
+    still starting comes up anyway and warms that path on first use.
+
+    :return: {step: seconds, or None if the step failed}
+    """
+    config = settings.STARTUP_WARMUP
+    timings = {}
+    for name, step in STEPS.items():
+        if not config.get(name, True):
+            continue
+        started = time.monotonic()
+        try:
+            step()
+        except Exception:
+            logger.exception('Start-up warm-up step %s failed', name)
+            timings[name] = None
+            continue
+        timings[name] = round(time.monotonic() - started, 3)
+
+    logger.info('Start-up warm-up finished: %s', timings)
+    return timings
@@ -0,0 +1,304 @@
+"""
+Watch the case PDF folders and index new or changed files incrementally
+
+New originals in CASE_FILES_DIR are renamed into RENAMED_DIR, registered in
+RenamedCaseFile and upserted into Milvus, the vector store and the field
+stats one batch at a time, so a new FIR is searchable seconds after it lands
+instead of after a full CaseFileRAG rebuild.
+"""
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import time
+
+from django.db import transaction
+
+from .catalog import (
+    RENAMED_FILE_PATTERN, SOURCE_FILE_PATTERN, catalog_path, load_case_metadata, plan_renames, scan_directory
+)
+from .models import RenamedCaseFile
+from .pdf_text import extract_text_from_pdf
+from .vector_store import open_vector_store
+
+# inotify(7) event bits
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_Q_OVERFLOW = 0x00004000
+WATCH_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+
+EVENT_HEADER = struct.Struct('iIII')
+
+# Longest case_details Milvus accepts (VARCHAR max_length in the schema)
+MAX_DETAILS_LENGTH = 5000
+
+
+def list_pdfs(folder):
+    """{file name: (size, mtime_ns)} for the PDFs in a folder"""
+    state = {}
+    if not os.path.isdir(folder):
+        return state
+    with os.scandir(folder) as entries:
+        for entry in entries:
+            if entry.name.endswith('.pdf') and entry.is_file():
+                stat = entry.stat()
+                state[entry.name] = (stat.st_size, stat.st_mtime_ns)
+    return state
+
+
+class PollingWatcher:
+    """Finds changes by comparing (size, mtime) snapshots of each folder; works everywhere"""
+
+    def __init__(self, folders, interval=2.0):
+        self.folders = list(folders)
+        self.interval = interval
+        self.snapshots = {folder: list_pdfs(folder) for folder in self.folders}
+
+    def poll(self, timeout):
+        """
+        Wait up to timeout seconds and return the PDFs that changed
+
+        :return: Set of (folder, file name) pairs created, modified or removed
+        """
+        time.sleep(min(timeout, self.interval))
+        changed = set()
+        for folder in self.folders:
+            current = list_pdfs(folder)
+            previous = self.snapshots[folder]
+            changed.update((folder, name) for name in current.keys() | previous.keys()
+                           if current.get(name) != previous.get(name))
+            self.snapshots[folder] = current
+        return changed
+
+    def close(self):
+        pass
+
+
+class InotifyWatcher:
+    """Kernel change notifications through libc's inotify calls (Linux only)"""
+
+    def __init__(self, folders):
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        if not hasattr(libc, 'inotify_init1'):
+            raise OSError('inotify is not available')
+
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+
+        self.folders = {}
+        for folder in folders:
+            os.makedirs(folder, exist_ok=True)
+            wd = libc.inotify_add_watch(self.fd, os.fsencode(folder), WATCH_MASK)
+            if wd < 0:
+                os.close(self.fd)
+                raise OSError(ctypes.get_errno(), f'Cannot watch {folder}')
+            self.folders[wd] = folder
+
+    def poll(self, timeout):
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        changed = set()
+        if not ready:
+            return changed
+
+        while True:
+            try:
+                data = os.read(self.fd, 64 * 1024)
+            except BlockingIOError:
+                break
+
+            offset = 0
+            while offset < len(data):
+                wd, mask, _, length = EVENT_HEADER.unpack_from(data, offset)
+                offset += EVENT_HEADER.size
+                name = os.fsdecode(data[offset:offset + length].rstrip(b'\0'))
+                offset += length
+
+                if mask & IN_Q_OVERFLOW:
+                    # Events were lost; treat every file as changed
+                    for folder in self.folders.values():
+                        changed.update((folder, pdf) for pdf in list_pdfs(folder))
+                elif wd in self.folders and name.endswith('.pdf'):
+                    changed.add((self.folders[wd], name))
+        return changed
+
+    def close(self):
+        os.close(self.fd)
+
+
+def open_watcher(folders, polling=False, interval=2.0):
+    """inotify where available, polling otherwise (or when asked for)"""
+    if not polling:
+        try:
+            return InotifyWatcher(folders)
+        except (OSError, AttributeError):
+            pass
+    return PollingWatcher(folders, interval)
+
+
+class Debouncer:
+    """
+    Holds changed files until they have been quiet for a while
+
+    A PDF being copied produces a stream of events; it is only picked up once
+    no event arrived for `delay` seconds, so half-written files are skipped.
+    """
+
+    def __init__(self, delay):
+        self.delay = delay
+        self.pending = {}
+
+    def add(self, paths, now=None):
+        now = time.monotonic() if now is None else now
+        for path in paths:
+            self.pending[path] = now
+
+    def ready(self, limit=None, now=None):
+        now = time.monotonic() if now is None else now
+        ready = [path for path, seen in self.pending.items() if now - seen >= self.delay][:limit]
+        for path in ready:
+            del self.pending[path]
+        return ready
+
+    def __len__(self):
+        return len(self.pending)
+
+
+class CaseFileIndexer:
+    """
+    Applies a batch of file changes to the catalog table and the search index
+
+    :param rag: CaseFileRAG opened with recreate=False
+    :param source_dir: Folder new originals arrive in
+    :param renamed_dir: Catalog folder
+    :param csv_path: Case CSV with each case's metadata
+    :param vector_store_path: Store used to find cases that are already indexed
+    """
+
+    def __init__(self, rag, source_dir, renamed_dir, csv_path, vector_store_path=None):
+        self.rag = rag
+        self.source_dir = source_dir
+        self.renamed_dir = renamed_dir
+        self.csv_path = csv_path
+        self.vector_store_path = vector_store_path
+        self.metadata_mtime = None
+        self.cached_metadata = {}
+        # Malformed CSV rows found by the last reload, reported with the next batch
+        self.bad_rows = []
+        # Files this indexer moved into the catalog; their own events are ignored once
+        self.moved = set()
+
+    def metadata(self):
+        """Case CSV rows, re-read only when the CSV changes"""
+        mtime = os.path.getmtime(self.csv_path)
+        if mtime != self.metadata_mtime:
+            self.cached_metadata, self.bad_rows = load_case_metadata(self.csv_path)
+            self.metadata_mtime = mtime
+        return self.cached_metadata
+
+    def pending_on_start(self):
+        """Originals waiting to be renamed and catalogued PDFs missing from the index"""
+        indexed = set()
+        store = open_vector_store(self.vector_store_path) if self.vector_store_path else None
+        if store is not None:
+            indexed = {str(case_id) for case_id in store.ids}
+
+        paths = {(self.source_dir, name) for name in scan_directory(self.source_dir, SOURCE_FILE_PATTERN).values()}
+        paths.update(
+            (self.renamed_dir, name)
+            for case_id, name in scan_directory(self.renamed_dir, RENAMED_FILE_PATTERN).items()
+            if case_id not in indexed
+        )
+        return paths
+
+    def case_row(self, case_id, file_path, metadata):
+        """Milvus row for a case; falls back to the PDF text when the CSV has no details"""
+        details = metadata.get('case_details')
+        if not details:
+            text, error = extract_text_from_pdf(file_path)
+            if error:
+                raise ValueError(error)
+            details = text[:MAX_DETAILS_LENGTH]
+        return {
+            'case_file_id': int(case_id),
+            'year': int(metadata['year']),
+            'criminal_name': metadata['criminal_name'],
+            'police_station': metadata['police_station'],
+            'crime_type': metadata['crime_type'],
+            'case_details': details,
+            'keywords': metadata.get('keywords', ''),
+        }
+
+    def process(self, paths):
+        """
+        Rename, register and index a batch of changed files
+
+        :param paths: Iterable of (folder, file name)
+        :return: Dict of counts and a list of (case_id, reason) for skipped files
+        """
+        metadata = self.metadata()
+        catalog = scan_directory(self.renamed_dir, RENAMED_FILE_PATTERN)
+
+        sources, changed, removed = {}, {}, set()
+        for folder, name in paths:
+            if folder == self.source_dir:
+                match = SOURCE_FILE_PATTERN.match(name)
+                if match and os.path.isfile(os.path.join(folder, name)):
+                    sources[match.group(1)] = name
+            elif folder == self.renamed_dir:
+                match = RENAMED_FILE_PATTERN.match(name)
+                if not match:
+                    continue
+                if name in self.moved:
+                    self.moved.discard(name)
+                    if os.path.isfile(os.path.join(folder, name)):
+                        continue
+                case_id = match.group(1)
+                # A rename inside the folder is a removal plus an addition for the same case
+                if case_id in catalog:
+                    changed[case_id] = catalog[case_id]
+                else:
+                    removed.add(case_id)
+
+        # New originals are moved into the catalog folder first
+        moves, skipped = plan_renames(sources, catalog, metadata)
+        skipped = self.bad_rows + skipped
+        self.bad_rows = []
+        for case_id, old_name, new_name in moves:
+            new_path = os.path.join(self.renamed_dir, new_name)
+            if os.path.exists(new_path):
+                skipped.append((case_id, f'{new_name} already exists'))
+                continue
+            os.makedirs(self.renamed_dir, exist_ok=True)
+            os.replace(os.path.join(self.source_dir, old_name), new_path)
+            changed[case_id] = new_name
+            self.moved.add(new_name)
+
+        rows, registered = [], {}
+        for case_id, name in sorted(changed.items()):
+            file_path = catalog_path(self.renamed_dir, name)
+            if case_id not in metadata:
+                skipped.append((case_id, 'no row in the case CSV'))
+                continue
+            try:
+                rows.append(self.case_row(case_id, file_path, metadata[case_id]))
+            except (KeyError, ValueError) as e:
+                skipped.append((case_id, str(e)))
+                continue
+            registered[case_id] = file_path
+
+        # Search index first: a catalog row without a vector is harmless, the reverse is not
+        self.rag.delete_case_files(sorted(removed))
+        self.rag.upsert_case_files(rows)
+
+        with transaction.atomic():
+            for case_id, file_path in registered.items():
+                RenamedCaseFile.objects.update_or_create(case_id=case_id, defaults={'file_path': file_path})
+            RenamedCaseFile.objects.filter(case_id__in=removed).delete()
+
+        return {'renamed': len(moves), 'indexed': len(rows), 'removed': len(removed), 'skipped': skipped}